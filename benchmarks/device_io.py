@@ -0,0 +1,80 @@
+"""
+Compares capturing the screens of all configured devices one after another
+with capturing them concurrently on one event loop.
+
+    python -m benchmarks.device_io --captures 10
+"""
+import argparse
+import asyncio
+import os
+from time import perf_counter
+
+import dotenv
+
+from emulator import async_adb
+from emulator.adb_integration import AdbDevice
+from emulator.adb_integration import AdbTransport
+from emulator.adb_integration import CaptureMode
+from emulator.adb_integration import get_grayscale_screen
+from emulator.adb_integration import use_device
+
+
+def benchmark_sequential(devices: list[AdbDevice], captures: int) -> float:
+    """
+    Captures every device in turn with the blocking helpers.
+
+    Returns:
+        The elapsed seconds.
+    """
+    start = perf_counter()
+    for _ in range(captures):
+        for device in devices:
+            with use_device(device):
+                get_grayscale_screen()
+    return perf_counter() - start
+
+
+async def benchmark_concurrent(devices: list[AdbDevice], captures: int) -> float:
+    """
+    Captures all devices at the same time with the asyncio helpers.
+
+    Returns:
+        The elapsed seconds.
+    """
+    start = perf_counter()
+    for _ in range(captures):
+        await asyncio.gather(
+            *(async_adb.get_grayscale_screen(device) for device in devices)
+        )
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--captures", type=int, default=10)
+    arguments = parser.parse_args()
+
+    dotenv.load_dotenv(".env")
+    adb_path = os.getenv("ADB_BINARY")
+    all_devices = [
+        AdbDevice(
+            adb_path=adb_path,
+            device_name=device_name.strip(),
+            shell=f"{adb_path} -s {device_name.strip()} shell",
+            capture_mode=CaptureMode(os.getenv("ADB_CAPTURE_MODE") or CaptureMode.PNG),
+            transport=AdbTransport(
+                os.getenv("ADB_TRANSPORT") or AdbTransport.EXECUTABLE
+            ),
+        )
+        for device_name in (os.getenv("ADB_DEVICE_NAME") or "emulator-5554").split(",")
+    ]
+
+    capture_count = arguments.captures * len(all_devices)
+    for name, elapsed in (
+        ("sequential", benchmark_sequential(all_devices, arguments.captures)),
+        ("asyncio", asyncio.run(benchmark_concurrent(all_devices, arguments.captures))),
+    ):
+        print(
+            f"{name}: {elapsed / capture_count * 1000:.1f} ms per capture, "
+            f"{capture_count / elapsed:.1f} captures/s over {len(all_devices)} devices"
+        )
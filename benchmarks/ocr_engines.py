@@ -0,0 +1,113 @@
+"""
+Compares the per call latency of the OCR engines on saved crops.
+
+Cut the profile number fields out of recorded profile screencaps first:
+    python -m benchmarks.ocr_engines --extract captures
+Benchmark the crops in captures/crops:
+    python -m benchmarks.ocr_engines
+"""
+import argparse
+import os
+from pathlib import Path
+from time import perf_counter
+
+import cv2
+import dotenv
+from pytesseract import pytesseract
+
+import constants
+from emulator.adb_integration import decode_png_screen
+from emulator.adb_integration import decode_raw_screen
+from readers.ocr import get_ocr_engine
+from readers.ocr import OcrEngineType
+from readers.ocr import PytesseractEngine
+
+
+def extract_crops(screens_directory: Path, crops_directory: Path) -> None:
+    """
+    Saves the number fields of every recorded profile screencap as crops.
+
+    Args:
+        screens_directory: The folder containing *.png and *.raw screencap dumps.
+        crops_directory: The folder to save the crops to.
+    """
+    crops_directory.mkdir(parents=True, exist_ok=True)
+    fields = {
+        "power": constants.BoundingBoxes.POWER,
+        "lord_id": constants.BoundingBoxes.LORD_ID,
+    }
+    for extension, decode in (("png", decode_png_screen), ("raw", decode_raw_screen)):
+        for path in sorted(screens_directory.glob(f"*.{extension}")):
+            image = decode(path.read_bytes())
+            for name, bounding_box in fields.items():
+                cv2.imwrite(
+                    str(crops_directory / f"{path.stem}_{extension}_{name}.png"),
+                    image[
+                        bounding_box.min_y : bounding_box.max_y,
+                        bounding_box.min_x : bounding_box.max_x,
+                    ],
+                )
+
+
+def benchmark_engines(crops_directory: Path, iterations: int) -> None:
+    """
+    Reads every crop with every available engine and prints the latency per call.
+
+    Args:
+        crops_directory: The folder containing the crops as PNG.
+        iterations: How often every crop is read per engine.
+    """
+    crops = [
+        cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        for path in sorted(crops_directory.glob("*.png"))
+    ]
+    if not crops:
+        print(f"No crops found in {crops_directory}")
+        return
+
+    for engine_type in OcrEngineType:
+        try:
+            engine = get_ocr_engine(engine_type, os.getenv("TESSDATA_PATH") or None)
+        except ImportError as error:
+            print(f"Skipping {engine_type}: {error}")
+            continue
+        if engine_type != OcrEngineType.PYTESSERACT and isinstance(
+            engine, PytesseractEngine
+        ):
+            continue
+
+        # The first call may load the model, which happens once per run.
+        start = perf_counter()
+        engine.read_line(crops[0], character_whitelist="0123456789")
+        first_call = perf_counter() - start
+
+        start = perf_counter()
+        for _ in range(iterations):
+            for crop in crops:
+                engine.read_line(crop, character_whitelist="0123456789")
+        elapsed = perf_counter() - start
+        print(
+            f"{engine_type}: {elapsed / (iterations * len(crops)) * 1000:.2f} ms "
+            f"per call, first call {first_call * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--directory", type=Path, default=Path("captures/crops"))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument(
+        "--extract",
+        type=Path,
+        default=None,
+        help="Cut crops out of the screencap dumps in this folder first.",
+    )
+    arguments = parser.parse_args()
+
+    dotenv.load_dotenv(".env")
+    pytesseract.tesseract_cmd = os.getenv("TESSERACT_BINARY")
+
+    if arguments.extract:
+        extract_crops(arguments.extract, arguments.directory)
+
+    benchmark_engines(arguments.directory, arguments.iterations)
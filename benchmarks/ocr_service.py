@@ -0,0 +1,84 @@
+"""
+Measures the profile read throughput of the OCR service per worker count,
+replaying the recorded profile screencaps in the captures folder:
+    python -m benchmarks.ocr_service --workers 1 2 4 8
+"""
+import argparse
+import os
+from pathlib import Path
+from time import perf_counter
+
+import dotenv
+from pytesseract import pytesseract
+
+from emulator.adb_integration import decode_png_screen
+from emulator.adb_integration import decode_raw_screen
+from logic.logic import read_profile
+from readers.ocr import OcrEngineType
+from readers.ocr_service import OcrService
+
+
+def benchmark_workers(directory: Path, workers: list[int], reads: int) -> None:
+    """
+    Reads the recorded frames on services of different sizes
+    and prints the throughput of each.
+
+    Args:
+        directory: The folder containing *.png and *.raw profile screencaps.
+        workers: The worker counts to measure.
+        reads: The amount of profile reads per worker count.
+    """
+    frames = [
+        decode(path.read_bytes())
+        for extension, decode in (
+            ("png", decode_png_screen),
+            ("raw", decode_raw_screen),
+        )
+        for path in sorted(directory.glob(f"*.{extension}"))
+    ]
+    if not frames:
+        print(f"No screencaps found in {directory}")
+        return
+
+    single_throughput = None
+    for worker_count in workers:
+        service = OcrService(
+            workers=worker_count,
+            engine_type=OcrEngineType(os.getenv("OCR_ENGINE") or "pytesseract"),
+            tessdata_path=os.getenv("TESSDATA_PATH") or None,
+            digit_atlas_path=os.getenv("DIGIT_ATLAS") or None,
+        )
+        # Start and warm up every worker before measuring.
+        for future in [
+            service.read(frames[0], read_profile) for _ in range(worker_count)
+        ]:
+            future.result()
+
+        start = perf_counter()
+        futures = [
+            service.read(frames[index % len(frames)], read_profile)
+            for index in range(reads)
+        ]
+        for future in futures:
+            future.result()
+        throughput = reads / (perf_counter() - start)
+        service.close()
+
+        single_throughput = single_throughput or throughput / worker_count
+        print(
+            f"{worker_count} workers: {throughput:.1f} profiles/s, "
+            f"{throughput / (single_throughput * worker_count):.0%} of linear scaling"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--directory", type=Path, default=Path("captures"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--reads", type=int, default=50)
+    arguments = parser.parse_args()
+
+    dotenv.load_dotenv(".env")
+    pytesseract.tesseract_cmd = os.getenv("TESSERACT_BINARY")
+
+    benchmark_workers(arguments.directory, arguments.workers, arguments.reads)
@@ -0,0 +1,164 @@
+"""
+Compares OCR on raw crops with OCR on crops prepared by their preprocessing profile.
+
+Reads the number fields of every distinct profile frame of a recorded session,
+once as they are on screen and once preprocessed:
+    python -m benchmarks.preprocessing captures/sessions/emulator-5554
+It prints the preprocessing and engine latency per crop and, with a
+`ground_truth.json` in the recording's folder (see benchmarks/replay.py),
+the misreads per field.
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+from time import perf_counter
+
+import cv2
+import dotenv
+from numpy import ndarray
+from pytesseract import pytesseract
+
+from benchmarks.replay import format_latency
+from benchmarks.replay import GROUND_TRUTH_FILE
+import constants
+from emulator.recording import load_events
+from readers.frame_cache import FRAME_CACHE
+from readers.image_hash import get_exact_hash
+from readers.ocr import get_ocr_engine
+from readers.ocr import OCR
+from readers.ocr import OcrEngineType
+from readers.screen import crop
+from readers.screen import get_on_screen
+from readers.screen import prepare_for_ocr
+
+FIELDS = {
+    "lord_id": constants.BoundingBoxes.LORD_ID,
+    "power": constants.BoundingBoxes.POWER,
+    "merit": constants.BoundingBoxes.MERIT,
+}
+
+
+def load_profile_frames(directory: Path) -> list[ndarray]:
+    """
+    Loads the recorded frames showing a profile, every distinct frame once.
+
+    Args:
+        directory: The folder of the recording.
+
+    Returns:
+        The grayscale profile frames.
+    """
+    frames = []
+    seen = set()
+    for event in load_events(directory):
+        if event["type"] != "frame":
+            continue
+        image = cv2.imread(str(directory / event["file"]), cv2.IMREAD_GRAYSCALE)
+        fingerprint = get_exact_hash(image)
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        if get_on_screen(image=image, template=constants.Images.COPY_NAME):
+            frames.append(image)
+    return frames
+
+
+def read_fields(
+    frames: list[ndarray],
+) -> tuple[list[dict[str, int]], list[float], list[float]]:
+    """
+    Reads the number fields of every frame with the engine, as OCR is configured.
+
+    Args:
+        frames: The profile frames.
+
+    Returns:
+        The numbers read per frame, by field, the preprocessing durations
+        and the engine durations per crop.
+    """
+    readings = []
+    preprocessing_durations = []
+    engine_durations = []
+    for image in frames:
+        numbers = {}
+        for name, bounding_box in FIELDS.items():
+            start = perf_counter()
+            prepared_image = prepare_for_ocr(crop(image, bounding_box), bounding_box)
+            preprocessing_durations.append(perf_counter() - start)
+
+            start = perf_counter()
+            text = OCR.engine.read_line(
+                prepared_image, character_whitelist="0123456789"
+            )
+            engine_durations.append(perf_counter() - start)
+            numbers[name] = int("".join(filter(str.isdigit, text)) or 0)
+        readings.append(numbers)
+    return readings, preprocessing_durations, engine_durations
+
+
+def count_misreads(
+    readings: list[dict[str, int]], ground_truth: dict[int, dict[str, int | str]]
+) -> dict[str, int]:
+    """
+    Counts the fields which differ from the ground truth. Power and merit are
+    only checked on frames whose lord ID was read correctly.
+
+    Args:
+        readings: The numbers read per frame, by field.
+        ground_truth: The correct name, power and merit by lord ID.
+
+    Returns:
+        The misreads by field.
+    """
+    misreads = dict.fromkeys(FIELDS, 0)
+    for numbers in readings:
+        member = ground_truth.get(numbers["lord_id"])
+        if member is None:
+            misreads["lord_id"] += 1
+            continue
+        for name in ("power", "merit"):
+            misreads[name] += numbers[name] != member[name]
+    return misreads
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("recording", type=Path)
+    arguments = parser.parse_args()
+
+    dotenv.load_dotenv(".env")
+    pytesseract.tesseract_cmd = os.getenv("TESSERACT_BINARY")
+    OCR.engine = get_ocr_engine(
+        OcrEngineType(os.getenv("OCR_ENGINE") or OcrEngineType.PYTESSERACT),
+        tessdata_path=os.getenv("TESSDATA_PATH") or None,
+    )
+    # Every crop has to reach the engine.
+    FRAME_CACHE.enabled = False
+
+    profile_frames = load_profile_frames(arguments.recording)
+    if not profile_frames:
+        raise SystemExit(f"No profile frames found in {arguments.recording}")
+    print(f"{len(profile_frames)} profile frames, {len(FIELDS)} fields each")
+
+    ground_truth_path = arguments.recording / GROUND_TRUTH_FILE
+    truth = None
+    if ground_truth_path.is_file():
+        with open(ground_truth_path, encoding="utf-8") as ground_truth_file:
+            truth = {
+                int(lord_id): member
+                for lord_id, member in json.load(ground_truth_file).items()
+            }
+
+    for preprocess in (False, True):
+        OCR.preprocess = preprocess
+        field_readings, preprocessing_latency, engine_latency = read_fields(
+            profile_frames
+        )
+        print("Preprocessed crops:" if preprocess else "Raw crops:")
+        if preprocess:
+            print(f"  {'preprocess':12} {format_latency(preprocessing_latency)}")
+        print(f"  {'engine':12} {format_latency(engine_latency)}")
+        if truth is not None:
+            for field_name, count in count_misreads(field_readings, truth).items():
+                print(f"  {field_name} misreads: {count}/{len(field_readings)}")
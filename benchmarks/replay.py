@@ -0,0 +1,267 @@
+"""
+Replays a recorded device session without an emulator and reports the latency
+per stage, the members read per minute and the accuracy against ground truth.
+
+Record a session of a profile crawl first, in a folder per device:
+    ADB_RECORDING=captures/sessions python main.py
+Replay it:
+    python -m benchmarks.replay captures/sessions/emulator-5554
+A `ground_truth.json` in the recording's folder, the correct name, power and merit
+by lord ID, enables the accuracy report. Replay list scans recorded with
+`--list-scan --refresh` with `--list-scan`.
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+import tempfile
+from time import perf_counter
+from typing import Any
+
+import cv2
+import dotenv
+import numpy
+from pytesseract import pytesseract
+
+import constants
+from emulator.adb_integration import AdbDevice
+from emulator.adb_integration import AdbTransport
+from emulator.adb_integration import use_device
+from emulator.recording import load_events
+from emulator.recording import ReplayError
+from emulator.recording import SessionReplay
+from logic.checkpoint import CheckpointJournal
+from logic.crawl import crawl_profiles
+from logic.crawl import open_rankings_interface
+from logic.crawl import read_own_position
+from logic.list_scan import read_visible_rows
+from logic.list_scan import scan_rankings_list
+from logic.logic import CLASSIFICATION_SCALE
+from logic.logic import read_profile
+from logic.session import DeviceSession
+from readers.digits import DigitReader
+from readers.digits import GlyphAtlas
+from readers.frame_cache import FRAME_CACHE
+from readers.ocr import get_ocr_engine
+from readers.ocr import OCR
+from readers.ocr import OcrEngineType
+from readers.screen import get_on_screen
+from readers.templates import TEMPLATES
+
+GROUND_TRUTH_FILE = "ground_truth.json"
+
+
+def format_latency(durations: list[float]) -> str:
+    """
+    Returns:
+        The mean, median and 95th percentile of the durations in milliseconds.
+    """
+    milliseconds = numpy.array(durations) * 1000
+    median, percentile_95 = numpy.percentile(milliseconds, (50, 95))
+    return (
+        f"mean {milliseconds.mean():7.1f} ms, p50 {median:7.1f} ms, "
+        f"p95 {percentile_95:7.1f} ms, n={len(durations)}"
+    )
+
+
+def get_recorded_latency(events: list[dict[str, Any]]) -> dict[str, list[float]]:
+    """
+    Groups the device round-trips of a recording, as they were on the device.
+
+    Args:
+        events: The events of the recording.
+
+    Returns:
+        The durations of the captures and of the commands by program.
+    """
+    stages: dict[str, list[float]] = {}
+    for event in events:
+        stage = (
+            "capture"
+            if event["type"] == "frame"
+            else f"shell {event['command'].split()[0]}"
+        )
+        stages.setdefault(stage, []).append(event["duration"])
+    return stages
+
+
+def get_processing_latency(
+    directory: Path, events: list[dict[str, Any]], frame_count: int
+) -> dict[str, list[float]]:
+    """
+    Runs the screen processing stages on recorded frames, one after another.
+
+    Args:
+        directory: The folder of the recording.
+        events: The events of the recording.
+        frame_count: The amount of frames to sample evenly from the recording.
+
+    Returns:
+        The durations of every stage.
+    """
+    files = [event["file"] for event in events if event["type"] == "frame"]
+    if not files:
+        return {}
+    files = [
+        files[index]
+        for index in sorted(
+            set(numpy.linspace(0, len(files) - 1, frame_count).astype(int))
+        )
+    ]
+
+    stages: dict[str, list[float]] = {
+        "decode": [],
+        "get_on_screen": [],
+        "read_profile": [],
+        "read_visible_rows": [],
+    }
+    for file in files:
+        start = perf_counter()
+        image = cv2.imread(str(directory / file), cv2.IMREAD_GRAYSCALE)
+        stages["decode"].append(perf_counter() - start)
+
+        for template in constants.Images.get_all():
+            start = perf_counter()
+            get_on_screen(image=image, template=template)
+            stages["get_on_screen"].append(perf_counter() - start)
+
+        if get_on_screen(image=image, template=constants.Images.COPY_NAME):
+            start = perf_counter()
+            read_profile(image)
+            stages["read_profile"].append(perf_counter() - start)
+        elif get_on_screen(image=image, template=constants.Images.RANKINGS_INTERFACE):
+            start = perf_counter()
+            read_visible_rows(image)
+            stages["read_visible_rows"].append(perf_counter() - start)
+    return {stage: durations for stage, durations in stages.items() if durations}
+
+
+def replay_session(
+    directory: Path, list_scan: bool
+) -> tuple[dict[int, dict[str, int | str]], float]:
+    """
+    Reads the members of the alliance from the recording, as main.py would.
+
+    Args:
+        directory: The folder of the recording.
+        list_scan: Whether a list scan was recorded instead of a profile crawl.
+
+    Raises:
+        ReplayError: If the replayed code deviates from the recording.
+
+    Returns:
+        The members by lord ID and the elapsed seconds.
+    """
+    session = DeviceSession(
+        AdbDevice(
+            device_name=directory.name,
+            transport=AdbTransport.REPLAY,
+            replay=SessionReplay(directory),
+        )
+    )
+    start = perf_counter()
+    with use_device(session.device), tempfile.TemporaryDirectory() as temporary:
+        if not open_rankings_interface(session):
+            raise ReplayError("The recording does not reach the rankings.")
+
+        if list_scan:
+            members = scan_rankings_list(
+                member_count=session.alliance.current_members,
+                tracker=session.tracker,
+                own_position=read_own_position(ask=False),
+            ).members
+        else:
+            members = crawl_profiles(
+                session, CheckpointJournal(os.path.join(temporary, "journal.jsonl"))
+            )
+    return members, perf_counter() - start
+
+
+def print_accuracy(
+    members: dict[int, dict[str, int | str]],
+    ground_truth: dict[int, dict[str, int | str]],
+) -> None:
+    """
+    Compares the read members field by field with the correct ones.
+
+    Args:
+        members: The read name, power and merit by lord ID.
+        ground_truth: The correct name, power and merit by lord ID.
+    """
+    found = [lord_id for lord_id in ground_truth if lord_id in members]
+    print(f"lord_id: {len(found)}/{len(ground_truth)} members found")
+    for field in ("name", "power", "merit"):
+        correct = sum(
+            members[lord_id][field] == ground_truth[lord_id][field] for lord_id in found
+        )
+        print(f"{field}: {correct}/{len(ground_truth)} correct")
+    unknown = len(members.keys() - ground_truth.keys())
+    if unknown:
+        print(f"{unknown} lord IDs were read which are not in the ground truth")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--list-scan", action="store_true")
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=200,
+        help="The amount of frames to run the processing stages on.",
+    )
+    arguments = parser.parse_args()
+
+    dotenv.load_dotenv(".env")
+    pytesseract.tesseract_cmd = os.getenv("TESSERACT_BINARY")
+    OCR.engine = get_ocr_engine(
+        OcrEngineType(os.getenv("OCR_ENGINE") or OcrEngineType.PYTESSERACT),
+        tessdata_path=os.getenv("TESSDATA_PATH") or None,
+    )
+    if digit_atlas_path := os.getenv("DIGIT_ATLAS"):
+        OCR.digit_reader = DigitReader(GlyphAtlas.load(digit_atlas_path))
+    # Crops are prepared for the engines unless turned off with 0.
+    OCR.preprocess = os.getenv("OCR_PREPROCESSING") != "0"
+    # Names are read from the profile with these languages instead of being copied.
+    if name_languages := os.getenv("OCR_NAME_LANGUAGES"):
+        OCR.name_engine = get_ocr_engine(
+            OcrEngineType(os.getenv("OCR_ENGINE") or OcrEngineType.PYTESSERACT),
+            tessdata_path=os.getenv("TESSDATA_PATH") or None,
+            language=name_languages,
+        )
+    TEMPLATES.preload(
+        (template.path for template in constants.Images.get_all()),
+        scales=(1.0, CLASSIFICATION_SCALE),
+    )
+
+    recorded_events = load_events(arguments.recording)
+    print("Recorded device latency:")
+    for stage_name, stage_durations in get_recorded_latency(recorded_events).items():
+        print(f"  {stage_name:20} {format_latency(stage_durations)}")
+    print("Processing latency:")
+    for stage_name, stage_durations in get_processing_latency(
+        arguments.recording, recorded_events, arguments.frames
+    ).items():
+        print(f"  {stage_name:20} {format_latency(stage_durations)}")
+
+    # The replay should not reuse what the processing stages read.
+    FRAME_CACHE.clear()
+    read_members, elapsed = replay_session(arguments.recording, arguments.list_scan)
+    recorded_minutes = (recorded_events[-1]["time"] - recorded_events[0]["time"]) / 60
+    print(
+        f"Read {len(read_members)} members, {len(read_members) / elapsed * 60:.1f} "
+        f"members/min replayed, {len(read_members) / recorded_minutes:.1f} "
+        "members/min recorded"
+    )
+    print(f"Frame cache: {FRAME_CACHE}")
+
+    ground_truth_path = arguments.recording / GROUND_TRUTH_FILE
+    if ground_truth_path.is_file():
+        with open(ground_truth_path, encoding="utf-8") as ground_truth_file:
+            print_accuracy(
+                read_members,
+                {
+                    int(lord_id): member
+                    for lord_id, member in json.load(ground_truth_file).items()
+                },
+            )
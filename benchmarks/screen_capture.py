@@ -0,0 +1,87 @@
+"""
+Compares the PNG and raw screen capture paths on recorded screencap dumps.
+
+Record dumps from the configured device:
+    python -m benchmarks.screen_capture --record 5
+Benchmark the dumps in the captures folder:
+    python -m benchmarks.screen_capture
+"""
+import argparse
+import os
+from pathlib import Path
+from time import perf_counter
+
+import dotenv
+
+from emulator.adb_integration import ADB
+from emulator.adb_integration import decode_png_screen
+from emulator.adb_integration import decode_raw_screen
+from emulator.adb_integration import read_png_screen
+from emulator.adb_integration import read_raw_screen
+
+
+def record_dumps(directory: Path, count: int) -> None:
+    """
+    Saves screencaps of both capture modes and prints their transfer time.
+
+    Args:
+        directory: The folder to save the dumps to.
+        count: The amount of dumps per capture mode.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for extension, read_screen in (("png", read_png_screen), ("raw", read_raw_screen)):
+        total = 0.0
+        for index in range(count):
+            start = perf_counter()
+            screen_bytes = read_screen()
+            total += perf_counter() - start
+            (directory / f"screen_{index}.{extension}").write_bytes(screen_bytes)
+        print(f"{extension}: {total / count * 1000:.1f} ms per capture (transfer)")
+
+
+def benchmark_decoding(directory: Path, iterations: int) -> None:
+    """
+    Decodes every dump in the folder and prints the average time per mode.
+
+    Args:
+        directory: The folder containing *.png and *.raw dumps.
+        iterations: How often every dump is decoded.
+    """
+    for extension, decode in (("png", decode_png_screen), ("raw", decode_raw_screen)):
+        dumps = [path.read_bytes() for path in sorted(directory.glob(f"*.{extension}"))]
+        if not dumps:
+            print(f"{extension}: no dumps found in {directory}")
+            continue
+
+        start = perf_counter()
+        for _ in range(iterations):
+            for screen_bytes in dumps:
+                decode(screen_bytes)
+        elapsed = perf_counter() - start
+        average_size = sum(len(screen_bytes) for screen_bytes in dumps) / len(dumps)
+        print(
+            f"{extension}: {elapsed / (iterations * len(dumps)) * 1000:.2f} ms "
+            f"per decode, {average_size / 1024:.0f} KiB per capture"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--directory", type=Path, default=Path("captures"))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--record", type=int, default=0, help="Record this many dumps per mode first."
+    )
+    arguments = parser.parse_args()
+
+    if arguments.record:
+        dotenv.load_dotenv(".env")
+        ADB.adb_path = os.getenv("ADB_BINARY")
+        # Only the first device is recorded if several are configured.
+        ADB.device_name = (os.getenv("ADB_DEVICE_NAME") or "emulator-5554").split(",")[
+            0
+        ]
+        ADB.shell = f"{ADB.adb_path} -s {ADB.device_name} shell"
+        record_dumps(arguments.directory, arguments.record)
+
+    benchmark_decoding(arguments.directory, arguments.iterations)
@@ -1,25 +1,115 @@
+from readers.preprocessing import PreprocessingProfile
+from readers.preprocessing import Threshold
 from readers.screen import BoundingBox
 from readers.screen import Coordinate
+from readers.screen import Template
 
 
 class Images:
-    MENU = "images/menu.png"
-    ALLIANCE = "images/menu_alliance.png"
-    ALLIANCE_SETTINGS = "images/menu_alliance_settings.png"
-    ALLIANCE_RANKINGS = "images/menu_alliance_rankings.png"
-    COPY_NAME = "images/copy_name.png"
-    RANKINGS_INTERFACE = "images/rankings.png"
-    INFO_BUTTON = "images/info_top_right.png"
-    OWN_POSITION = "images/rankings_own_entry.png"
+    # The navigation buttons are searched around the coordinates they are clicked at.
+    MENU = Template(
+        "images/menu.png",
+        search_region=BoundingBox(min_x=1180, min_y=600, max_x=1280, max_y=720),
+        padding=40,
+    )
+    ALLIANCE = Template(
+        "images/menu_alliance.png",
+        search_region=BoundingBox(min_x=920, min_y=600, max_x=1050, max_y=720),
+        padding=40,
+    )
+    ALLIANCE_SETTINGS = Template(
+        "images/menu_alliance_settings.png",
+        search_region=BoundingBox(min_x=930, min_y=20, max_x=1060, max_y=130),
+        padding=40,
+    )
+    ALLIANCE_RANKINGS = Template(
+        "images/menu_alliance_rankings.png",
+        search_region=BoundingBox(min_x=880, min_y=160, max_x=1010, max_y=290),
+        padding=40,
+    )
+    # The profile header, above the lord ID.
+    COPY_NAME = Template(
+        "images/copy_name.png",
+        search_region=BoundingBox(min_x=100, min_y=150, max_x=1180, max_y=330),
+        padding=20,
+    )
+    RANKINGS_INTERFACE = Template("images/rankings.png")
+    # Left of the list entries, from the first entry down to the end of the list.
+    INFO_BUTTON = Template(
+        "images/info_top_right.png",
+        search_region=BoundingBox(min_x=300, min_y=300, max_x=560, max_y=720),
+        padding=20,
+    )
+    OWN_POSITION = Template("images/rankings_own_entry.png")
+
+    @classmethod
+    def get_all(cls) -> list[Template]:
+        """
+        Get all images.
+
+        Returns:
+            A list of all templates defined on this class.
+        """
+        return [value for value in vars(cls).values() if isinstance(value, Template)]
+
+
+class Preprocessing:
+    # Digits on a plain background.
+    NUMBERS = PreprocessingProfile(threshold=Threshold.OTSU)
+    # Digits less than 25 pixels high, which Tesseract reads better enlarged.
+    SMALL_NUMBERS = PreprocessingProfile(threshold=Threshold.OTSU, upscale=2)
+    # Names in any script, whose thin strokes a global threshold breaks up.
+    NAMES = PreprocessingProfile(threshold=Threshold.ADAPTIVE)
 
 
 class BoundingBoxes:
-    POWER = BoundingBox(min_x=115, min_y=515, max_x=355, max_y=550)
-    MERIT = BoundingBox(min_x=800, min_y=560, max_x=1020, max_y=590)
-    LORD_ID = BoundingBox(min_x=910, min_y=268, max_x=1019, max_y=288)
-    ALLIANCE_MEMBERS = BoundingBox(min_x=360, min_y=610, max_x=455, max_y=635)
-    ALLIANCE_NAME = BoundingBox(min_x=120, min_y=450, max_x=450, max_y=485)
-    OWN_POSITION = BoundingBox(min_x=0, min_y=0, max_x=69, max_y=69)
+    POWER = BoundingBox(
+        min_x=115, min_y=515, max_x=355, max_y=550, preprocessing=Preprocessing.NUMBERS
+    )
+    MERIT = BoundingBox(
+        min_x=800, min_y=560, max_x=1020, max_y=590, preprocessing=Preprocessing.NUMBERS
+    )
+    LORD_ID = BoundingBox(
+        min_x=910,
+        min_y=268,
+        max_x=1019,
+        max_y=288,
+        preprocessing=Preprocessing.SMALL_NUMBERS,
+    )
+    ALLIANCE_MEMBERS = BoundingBox(
+        min_x=360,
+        min_y=610,
+        max_x=455,
+        max_y=635,
+        preprocessing=Preprocessing.SMALL_NUMBERS,
+    )
+    ALLIANCE_NAME = BoundingBox(
+        min_x=120, min_y=450, max_x=450, max_y=485, preprocessing=Preprocessing.NAMES
+    )
+    OWN_POSITION = BoundingBox(
+        min_x=0, min_y=0, max_x=69, max_y=69, preprocessing=Preprocessing.NUMBERS
+    )
+    # The name on a profile, left of the copy name button and relative to it.
+    PROFILE_NAME = BoundingBox(
+        min_x=-400, min_y=-6, max_x=-8, max_y=38, preprocessing=Preprocessing.NAMES
+    )
+    # The fields of the first visible entry in the rankings list. Estimated for
+    # 1280 x 720, check them on a capture with `python -m logic.list_scan`.
+    LIST_ROW_RANK = BoundingBox(
+        min_x=150, min_y=330, max_x=220, max_y=370, preprocessing=Preprocessing.NUMBERS
+    )
+    LIST_ROW_NAME = BoundingBox(
+        min_x=290, min_y=322, max_x=640, max_y=352, preprocessing=Preprocessing.NAMES
+    )
+    LIST_ROW_POWER = BoundingBox(
+        min_x=860,
+        min_y=330,
+        max_x=1080,
+        max_y=370,
+        preprocessing=Preprocessing.NUMBERS,
+    )
+    # The scrolling part of the rankings list, from the first visible entry down.
+    LIST = BoundingBox(min_x=150, min_y=300, max_x=1080, max_y=715)
 
 
 class Coordinates:
@@ -27,6 +117,7 @@ class Coordinates:
     OPEN_ALLIANCE = Coordinate(983, 667)
     OPEN_ALLIANCE_SETTINGS = Coordinate(992, 73)
     OPEN_ALLIANCE_RANKINGS = Coordinate(945, 225)
+    # The positions of the first visible entry in the rankings list.
     LIST_ENTRY = Coordinate(500, 350)
     INFO_BUTTON = Coordinate(478, 415)
     LIST_ENTRY_MIDDLE = Coordinate(800, 351)
@@ -37,15 +128,4 @@ class Offsets:
     ENTRY_DISTANCE = 75
     INFO_BUTTON_X = 90
     INFO_BUTTON_Y = 30
-
-
-def increase_list_entry_constants_by_one_entry() -> None:
-    """
-    Increases constants where the y position is a specific entry position in the
-    rankings list by one entry.
-    This is needed to skip the own entry and to reach entries at the bottom of the list.
-    """
-    Coordinates.LIST_ENTRY.y += Offsets.ENTRY_DISTANCE
-    Coordinates.INFO_BUTTON.y += Offsets.ENTRY_DISTANCE
-    Coordinates.LIST_ENTRY_MIDDLE.y += Offsets.ENTRY_DISTANCE
-    Coordinates.LIST_ENTRY_MIDDLE_UP.y += Offsets.ENTRY_DISTANCE
+    VISIBLE_LIST_ENTRIES = 5
@@ -0,0 +1,445 @@
+"""
+A client for the host protocol of the adb server, to talk to devices over its
+socket instead of starting an adb process per command.
+
+Every request is a 4 digit hex length followed by the payload, answered by OKAY
+or by FAIL with a length prefixed message. After host:transport:<serial> the
+connection is bound to the device, and the next request opens a service on it
+(shell:, exec:, sync:) whose output streams until the device closes it.
+"""
+import os
+import socket
+import struct
+import subprocess
+import threading
+
+from emulator.shell_session import frame_command
+from emulator.shell_session import FramedOutput
+
+# The maximum size of a DATA chunk of the sync protocol.
+SYNC_DATA_MAX = 64 * 1024
+
+
+class AdbProtocolError(Exception):
+    """
+    The adb server or device refused a request or answered unexpectedly.
+    """
+
+
+class AdbConnection:
+    """
+    A socket to the adb server with the helpers of the host protocol framing.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.socket = sock
+
+    def send_request(self, payload: str) -> None:
+        """
+        Sends a length prefixed request and checks that it is accepted.
+
+        Args:
+            payload: The request, e.g. "host:transport:emulator-5554".
+
+        Raises:
+            AdbProtocolError: If the request is answered with FAIL.
+        """
+        data = payload.encode("UTF-8")
+        self.socket.sendall(b"%04x" % len(data) + data)
+        self.read_status()
+
+    def read_status(self) -> None:
+        """
+        Reads an OKAY or FAIL status.
+
+        Raises:
+            AdbProtocolError: If the status is FAIL or unknown.
+        """
+        status = self.read_exactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(self.read_length_prefixed().decode("UTF-8"))
+        raise AdbProtocolError(f"Unexpected status {status!r}.")
+
+    def read_length_prefixed(self) -> bytes:
+        """
+        Reads a 4 digit hex length and as many bytes.
+        """
+        return self.read_exactly(int(self.read_exactly(4), 16))
+
+    def read_exactly(self, size: int) -> bytes:
+        """
+        Reads a given amount of bytes.
+
+        Raises:
+            EOFError: If the connection closes before.
+        """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.socket.recv_into(view[received:])
+            if not count:
+                raise EOFError(f"Connection closed after {received}/{size} bytes.")
+            received += count
+        return bytes(buffer)
+
+    def read_all(self) -> bytes:
+        """
+        Reads until the connection is closed by the other side.
+        """
+        chunks = []
+        while chunk := self.socket.recv(SYNC_DATA_MAX):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def read_all_into(self, buffer: bytearray) -> memoryview:
+        """
+        Reads until the connection is closed, into a preallocated buffer.
+        The buffer is grown if it is too small.
+
+        Args:
+            buffer: The buffer to read into, reused between reads.
+
+        Returns:
+            A view of the read bytes in the buffer.
+        """
+        received = 0
+        while True:
+            if received == len(buffer):
+                buffer.extend(bytes(max(len(buffer), SYNC_DATA_MAX)))
+            with memoryview(buffer) as view:
+                count = self.socket.recv_into(view[received:])
+            if not count:
+                return memoryview(buffer)[:received]
+            received += count
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+class SocketShellSession:
+    """
+    A long-lived shell on a device over the adb server socket,
+    with the same sentinel framing as ShellSession.
+    The shell is opened raw, so the device does not echo the commands.
+    """
+
+    def __init__(self, client: "AdbClient", serial: str, max_reconnects: int = 3):
+        """
+        Args:
+            client: The client to open the shell with.
+            serial: The serial of the device.
+            max_reconnects: How often a command is retried on a new shell
+                before giving up.
+        """
+        self.client = client
+        self.serial = serial
+        self.max_reconnects = max_reconnects
+        self.sentinel = f"__cod_ocr_{os.urandom(16).hex()}__"
+        self._connection: AdbConnection | None = None
+        self._output = None
+        self._lock = threading.Lock()
+
+    def run(self, command: str) -> str:
+        """
+        Runs a command in the shell and waits for its output.
+        Reconnects if the shell was closed in between.
+
+        Args:
+            command: The shell command to run on the device.
+
+        Raises:
+            subprocess.CalledProcessError: If the command exited with a status not 0.
+            CommandInterruptedError: If the shell was lost while the command ran.
+            subprocess.TimeoutExpired: If the device did not answer within the
+                client's timeout.
+            ConnectionError: If the shell could not be (re-)opened.
+
+        Returns:
+            The output of the command, stdout and stderr combined.
+        """
+        with self._lock:
+            for _ in range(self.max_reconnects + 1):
+                try:
+                    if self._connection is None:
+                        self._connection = self.client.open_service(
+                            self.serial, "shell,raw:"
+                        )
+                        self._output = self._connection.socket.makefile("rb")
+                        # Like ShellSession, stderr is part of the output.
+                        self._connection.socket.sendall(b"exec 2>&1\n")
+                    status, output = self._run_framed(command)
+                except TimeoutError:
+                    # The command may hang on the device, it is not sent again.
+                    self.close()
+                    raise subprocess.TimeoutExpired(
+                        command, self.client.timeout
+                    ) from None
+                except (OSError, EOFError):
+                    # The command did not start, so it is safe to send it again.
+                    self.close()
+                    continue
+                except subprocess.SubprocessError:
+                    self.close()
+                    raise
+
+                if status != 0:
+                    raise subprocess.CalledProcessError(status, command, output)
+                return output
+
+        raise ConnectionError(
+            f"Lost the shell to {self.serial} {self.max_reconnects + 1} times."
+        )
+
+    def close(self) -> None:
+        """
+        Closes the shell. The next command opens a new one.
+        """
+        if self._output:
+            self._output.close()
+            self._output = None
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def _run_framed(self, command: str) -> tuple[int, str]:
+        self._connection.socket.sendall(frame_command(command, self.sentinel))
+        output = FramedOutput(command, self.sentinel)
+        while True:
+            result = output.feed(self._output.readline())
+            if result is not None:
+                return result
+
+
+class SyncConnection:
+    """
+    A sync: service connection for file transfers, reusable until closed.
+    """
+
+    def __init__(self, connection: AdbConnection):
+        self.connection = connection
+        self.closed = False
+
+    def stat(self, path: str) -> tuple[int, int, int]:
+        """
+        Get the mode, size and modification time of a file on the device.
+        All are 0 if the file does not exist.
+        """
+        self._send(b"STAT", path.encode("UTF-8"))
+        response = self.connection.read_exactly(16)
+        if response[:4] != b"STAT":
+            raise AdbProtocolError(f"Unexpected sync response {response[:4]!r}.")
+        return struct.unpack("<3I", response[4:])
+
+    def pull(self, path: str) -> bytes:
+        """
+        Reads a file from the device.
+
+        Raises:
+            AdbProtocolError: If the file cannot be read.
+        """
+        self._send(b"RECV", path.encode("UTF-8"))
+        chunks = []
+        while True:
+            response_id, length = self._read_header()
+            if response_id == b"DONE":
+                return b"".join(chunks)
+            if response_id == b"DATA":
+                chunks.append(self.connection.read_exactly(length))
+                continue
+            self._raise(response_id, length)
+
+    def push(self, data: bytes, path: str, mode: int = 0o644, mtime: int = 0) -> None:
+        """
+        Writes a file to the device.
+
+        Raises:
+            AdbProtocolError: If the file cannot be written.
+        """
+        self._send(b"SEND", f"{path},{mode}".encode("UTF-8"))
+        for offset in range(0, len(data), SYNC_DATA_MAX):
+            self._send(b"DATA", data[offset : offset + SYNC_DATA_MAX])
+        self.connection.socket.sendall(b"DONE" + struct.pack("<I", mtime))
+        response_id, length = self._read_header()
+        if response_id != b"OKAY":
+            self._raise(response_id, length)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self._send(b"QUIT", b"")
+        except OSError:
+            pass
+        self.connection.close()
+        self.closed = True
+
+    def _send(self, request_id: bytes, data: bytes) -> None:
+        self.connection.socket.sendall(request_id + struct.pack("<I", len(data)) + data)
+
+    def _read_header(self) -> tuple[bytes, int]:
+        header = self.connection.read_exactly(8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    def _raise(self, response_id: bytes, length: int) -> None:
+        message = (
+            self.connection.read_exactly(length).decode("UTF-8")
+            if response_id == b"FAIL"
+            else f"Unexpected sync response {response_id!r}."
+        )
+        # The device ends the sync service after a failure.
+        self.connection.close()
+        self.closed = True
+        raise AdbProtocolError(message)
+
+
+class AdbClient:
+    """
+    Talks to devices through the adb server.
+    The shell and sync connections of every device are kept open and reused,
+    exec: commands get a new connection each, which the device closes when done.
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int | None = None, timeout: float = 30
+    ):
+        """
+        Args:
+            host: The host of the adb server.
+            port (optional): The port of the adb server.
+                Defaults to ANDROID_ADB_SERVER_PORT or 5037, like adb does.
+            timeout: The seconds a connection may wait for the server or device,
+                so a dead transport can not hang the crawl. Defaults to 30.
+        """
+        self.host = host
+        self.port = port or int(os.getenv("ANDROID_ADB_SERVER_PORT") or 5037)
+        self.timeout = timeout
+        self._shells: dict[str, SocketShellSession] = {}
+        self._syncs: dict[str, SyncConnection] = {}
+        self._screen_buffers: dict[str, bytearray] = {}
+        self._lock = threading.Lock()
+
+    def connect(self) -> AdbConnection:
+        """
+        Opens a new connection to the adb server, whose reads and writes
+        raise TimeoutError after the client's timeout.
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return AdbConnection(sock)
+
+    def host_command(self, command: str) -> str:
+        """
+        Runs a command of the server itself, e.g. host:version or host:devices.
+
+        Returns:
+            The server's answer.
+        """
+        connection = self.connect()
+        try:
+            connection.send_request(command)
+            return connection.read_length_prefixed().decode("UTF-8")
+        finally:
+            connection.close()
+
+    def devices(self) -> list[str]:
+        """
+        Get the serials of all devices in the device state.
+        """
+        return [
+            line.split("\t")[0]
+            for line in self.host_command("host:devices").splitlines()
+            if line.endswith("\tdevice")
+        ]
+
+    def open_service(self, serial: str, service: str) -> AdbConnection:
+        """
+        Opens a service on a device.
+
+        Args:
+            serial: The serial of the device.
+            service: The service, e.g. "exec:screencap".
+
+        Returns:
+            The connection, streaming the service's output.
+        """
+        connection = self.connect()
+        try:
+            connection.send_request(f"host:transport:{serial}")
+            connection.send_request(service)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def exec_out(self, serial: str, command: str) -> bytes:
+        """
+        Runs a command without a terminal, so its output is binary safe.
+
+        Returns:
+            The output of the command.
+        """
+        connection = self.open_service(serial, f"exec:{command}")
+        try:
+            return connection.read_all()
+        finally:
+            connection.close()
+
+    def read_raw_screen(self, serial: str) -> memoryview:
+        """
+        Captures the screen as raw framebuffer into a buffer kept per device,
+        so no memory is allocated per capture once the buffer has grown.
+        The view is only valid until the next capture of the same device,
+        and must be released before it.
+
+        Returns:
+            A view of the raw screencap bytes, header included.
+        """
+        buffer = self._screen_buffers.setdefault(serial, bytearray())
+        connection = self.open_service(serial, "exec:screencap")
+        try:
+            return connection.read_all_into(buffer)
+        finally:
+            connection.close()
+
+    def shell(self, serial: str, command: str) -> str:
+        """
+        Runs a command in the pooled shell of a device.
+
+        Returns:
+            The output of the command.
+        """
+        return self.get_shell(serial).run(command)
+
+    def get_shell(self, serial: str) -> SocketShellSession:
+        """
+        Get the pooled shell of a device, opened on first use.
+        """
+        with self._lock:
+            if serial not in self._shells:
+                self._shells[serial] = SocketShellSession(self, serial)
+            return self._shells[serial]
+
+    def get_sync(self, serial: str) -> SyncConnection:
+        """
+        Get the pooled sync connection of a device, opened on first use
+        and again after a failure closed it.
+        """
+        with self._lock:
+            if serial not in self._syncs or self._syncs[serial].closed:
+                self._syncs[serial] = SyncConnection(self.open_service(serial, "sync:"))
+            return self._syncs[serial]
+
+    def close(self) -> None:
+        """
+        Closes all pooled connections.
+        """
+        with self._lock:
+            for shell in self._shells.values():
+                shell.close()
+            for sync in self._syncs.values():
+                sync.close()
+            self._shells.clear()
+            self._syncs.clear()
@@ -1,45 +1,295 @@
+import asyncio
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
+from dataclasses import field
+from enum import StrEnum
 import re
+import struct
 import subprocess
+from time import monotonic
+from time import perf_counter
 from time import sleep
+from typing import Iterator
 
 import cv2
 import numpy
 from numpy import ndarray
 
+from emulator.adb_client import AdbClient
+from emulator.adb_client import SocketShellSession
+from emulator.gestures import compile_swipe
+from emulator.gestures import DEFAULT_TOUCH_DEVICE_PATH
+from emulator.gestures import parse_touch_device
+from emulator.gestures import to_shell_command
+from emulator.gestures import TouchDevice
+from emulator.recording import SessionRecorder
+from emulator.recording import SessionReplay
+from emulator.shell_session import AsyncShellSession
+from emulator.shell_session import ShellSession
+from emulator.waiting import wait_for_screen_settled
+from instrumentation import PROFILER
 from readers.screen import Coordinate
 
 
+class CaptureMode(StrEnum):
+    PNG = "png"
+    RAW = "raw"
+
+
+class AdbTransport(StrEnum):
+    # Starts the adb executable per capture and keeps one shell process open.
+    EXECUTABLE = "executable"
+    # Talks to the adb server's socket directly, see emulator.adb_client.
+    SOCKET = "socket"
+    # Plays back the grayscale frames and shell commands of a recording,
+    # see emulator.recording.
+    REPLAY = "replay"
+
+
 @dataclass
-class ADB:
+class AdbDevice:
     adb_path: str = ""
     device_name: str = ""
     shell: str = ""
+    capture_mode: CaptureMode = CaptureMode.PNG
+    transport: AdbTransport = AdbTransport.EXECUTABLE
+    session: ShellSession | SocketShellSession | None = None
+    # The shell sessions of the asyncio helpers in emulator.async_adb, by event
+    # loop, as a session only works on the loop that started it.
+    async_sessions: dict[asyncio.AbstractEventLoop, AsyncShellSession] = field(
+        default_factory=dict
+    )
+    # The touch screen, detected on the first gesture.
+    touch_device: TouchDevice | None = None
+    # Records every frame and shell command of the device, if set.
+    recorder: SessionRecorder | None = None
+    # The recording played back by the replay transport.
+    replay: SessionReplay | None = None
+
+
+# The device used unless another one is selected with use_device().
+ADB = AdbDevice()
+
+_CURRENT_DEVICE: ContextVar[AdbDevice] = ContextVar("current_device")
 
+# The client of all devices using the socket transport, created on first use.
+_ADB_CLIENT: AdbClient | None = None
+
+
+def get_device() -> AdbDevice:
+    """
+    Gets the device the helpers of this module talk to in the current thread.
+
+    Returns:
+        The device selected with use_device(), or else ADB.
+    """
+    return _CURRENT_DEVICE.get(ADB)
 
-ADB = ADB()
+
+@contextmanager
+def use_device(device: AdbDevice) -> Iterator[AdbDevice]:
+    """
+    Directs the helpers of this module to a device, for the current thread only.
+    Every thread can drive another device this way.
+
+    Args:
+        device: The device to talk to.
+
+    Yields:
+        The device.
+    """
+    token = _CURRENT_DEVICE.set(device)
+    try:
+        yield device
+    finally:
+        _CURRENT_DEVICE.reset(token)
+
+
+def get_adb_client() -> AdbClient:
+    """
+    Gets the client of the adb server, creating it on first use.
+
+    Returns:
+        The client shared by all devices using the socket transport.
+    """
+    global _ADB_CLIENT
+    if _ADB_CLIENT is None:
+        _ADB_CLIENT = AdbClient()
+        atexit.register(_ADB_CLIENT.close)
+    return _ADB_CLIENT
+
+
+def get_shell_session() -> ShellSession | SocketShellSession | SessionReplay:
+    """
+    Gets the shell session of the current device, creating it on first use.
+
+    Returns:
+        The shell session of the current device.
+    """
+    device = get_device()
+    if device.transport == AdbTransport.REPLAY:
+        return device.replay
+
+    if device.session is None:
+        if device.transport == AdbTransport.SOCKET:
+            device.session = get_adb_client().get_shell(device.device_name)
+        else:
+            device.session = ShellSession(
+                adb_path=device.adb_path, device_name=device.device_name
+            )
+            atexit.register(device.session.close)
+    return device.session
+
+
+def run_shell(command: str) -> str:
+    """
+    Runs a command on the current device through its shell session.
+
+    Args:
+        command: The shell command to run on the device.
+
+    Returns:
+        The output of the command.
+    """
+    with PROFILER.span("shell"):
+        recorder = get_device().recorder
+        if recorder is None:
+            return get_shell_session().run(command)
+
+        start = perf_counter()
+        try:
+            output = get_shell_session().run(command)
+        except subprocess.CalledProcessError as error:
+            recorder.record_command(
+                command, error.output or "", error.returncode, start
+            )
+            raise
+        recorder.record_command(command, output, 0, start)
+        return output
+
+
+# screencap formats, see android.graphics.PixelFormat.
+RAW_FORMAT_TO_GRAY = {
+    1: cv2.COLOR_RGBA2GRAY,  # RGBA_8888
+    2: cv2.COLOR_RGBA2GRAY,  # RGBX_8888
+    5: cv2.COLOR_BGRA2GRAY,  # BGRA_8888
+}
 
 
 def get_grayscale_screen() -> ndarray:
     """
     Gets a ndarray which contains the values of the gray-scaled pixels
     currently on the screen, through ADB.
+    Depending on the device's capture_mode, the screen is transferred as PNG
+    or raw pixels. The frame is recorded if the device has a recorder,
+    and comes from the recording with the replay transport.
 
     Returns:
         The ndarray containing the gray-scaled pixels.
     """
+    device = get_device()
+    with PROFILER.span("capture"):
+        if device.transport == AdbTransport.REPLAY:
+            return device.replay.capture()
+
+        start = perf_counter()
+        raw = device.capture_mode == CaptureMode.RAW
+        with PROFILER.span("screencap"):
+            screen = read_raw_screen() if raw else read_png_screen()
+        with PROFILER.span("decode"):
+            image = decode_raw_screen(screen) if raw else decode_png_screen(screen)
+        if device.recorder:
+            device.recorder.record_frame(image, start)
+        return image
+
+
+def read_png_screen() -> bytes:
+    """
+    Captures the screen as PNG through the adb shell.
+
+    Returns:
+        The PNG bytes, with the shell's line ending conversion undone.
+    """
+    device = get_device()
+    if device.transport == AdbTransport.SOCKET:
+        # exec: does not convert line endings.
+        return get_adb_client().exec_out(device.device_name, "screencap -p")
+
     with subprocess.Popen(
-        f"{ADB.shell} screencap -p",
+        f"{device.shell} screencap -p",
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         shell=True,
     ) as adb_shell:
-        image_bytes_str = adb_shell.stdout.read().replace(b"\r\n", b"\n")
+        return adb_shell.stdout.read().replace(b"\r\n", b"\n")
 
-    raw_image = numpy.frombuffer(image_bytes_str, dtype=numpy.uint8)
+
+def read_raw_screen() -> bytes | memoryview:
+    """
+    Captures the screen as raw framebuffer through adb exec-out.
+    exec-out does not convert line endings, so the bytes are usable as they are.
+    Over the socket transport, the bytes are read into a buffer reused per device.
+
+    Returns:
+        The raw screencap bytes, header included.
+    """
+    device = get_device()
+    if device.transport == AdbTransport.SOCKET:
+        return get_adb_client().read_raw_screen(device.device_name)
+
+    return subprocess.check_output(
+        [device.adb_path, "-s", device.device_name, "exec-out", "screencap"]
+    )
+
+
+def decode_png_screen(png_bytes: bytes) -> ndarray:
+    """
+    Decodes a PNG screencap to grayscale.
+
+    Args:
+        png_bytes: The bytes returned by `screencap -p`.
+
+    Returns:
+        The ndarray containing the gray-scaled pixels.
+    """
+    raw_image = numpy.frombuffer(png_bytes, dtype=numpy.uint8)
     return cv2.imdecode(raw_image, cv2.IMREAD_GRAYSCALE)
 
 
+def decode_raw_screen(raw_bytes: bytes | memoryview) -> ndarray:
+    """
+    Converts a raw screencap to grayscale.
+    The header is width, height and pixel format as little endian uint32,
+    followed by the color space since Android 9. The pixels are viewed in place
+    and only the grayscale result is allocated.
+
+    Args:
+        raw_bytes: The bytes returned by `screencap` without `-p`.
+
+    Raises:
+        ValueError: If the header does not match the amount of bytes
+            or the pixel format is not supported.
+
+    Returns:
+        The ndarray containing the gray-scaled pixels.
+    """
+    width, height, pixel_format = struct.unpack_from("<3I", raw_bytes)
+    header_size = len(raw_bytes) - width * height * 4
+    if header_size not in (12, 16):
+        raise ValueError(
+            f"Screencap of {len(raw_bytes)} bytes does not fit {width}x{height}."
+        )
+    if pixel_format not in RAW_FORMAT_TO_GRAY:
+        raise ValueError(f"Screencap pixel format {pixel_format} is not supported.")
+
+    pixels = numpy.frombuffer(raw_bytes, dtype=numpy.uint8, offset=header_size).reshape(
+        height, width, 4
+    )
+    return cv2.cvtColor(pixels, RAW_FORMAT_TO_GRAY[pixel_format])
+
+
 def click(coordinate: Coordinate):
     """
     Tap a specific coordinate through ADB.
@@ -47,7 +297,7 @@ def click(coordinate: Coordinate):
     Args:
         coordinate: The coordinate where to tap/click.
     """
-    subprocess.check_output(f"{ADB.shell} input tap {coordinate.x} {coordinate.y}")
+    run_shell(f"input tap {coordinate.x} {coordinate.y}")
 
 
 def go_back():
@@ -55,41 +305,71 @@ def go_back():
     Utility method to fulfill the action which goes back one screen,
     however the current app might interpret that.
     """
-    subprocess.check_output(f"{ADB.shell} input keyevent KEYCODE_BACK")
+    run_shell("input keyevent KEYCODE_BACK")
+
+
+def get_touch_device() -> TouchDevice:
+    """
+    Gets the touch screen of the current device, detecting it on first use.
+
+    Returns:
+        The input device to send touch events to.
+    """
+    device = get_device()
+    if device.touch_device is None:
+        try:
+            device.touch_device = parse_touch_device(
+                run_shell("getevent -pl"), run_shell("wm size")
+            )
+        except subprocess.CalledProcessError:
+            device.touch_device = TouchDevice(path=DEFAULT_TOUCH_DEVICE_PATH)
+    return device.touch_device
+
+
+# The least seconds the finger is held before the release, even if the screen
+# looks settled, so the list can not scroll on with the momentum of the swipe.
+MIN_SCROLL_HOLD = 0.3
 
 
 def scroll_low_level(
-    coordinate_from: Coordinate, coordinate_to: Coordinate, steps: int = 5
+    coordinate_from: Coordinate,
+    coordinate_to: Coordinate,
+    steps: int = 5,
+    previous: ndarray | None = None,
 ):
     """
     Swipe from a given coordinate to a given coordinate within a given duration.
     This takes a low level approach and sends raw input events.
     Enables us to hold before releasing and disables the game's "smooth scroll".
+    The events up to the hold and the release are sent in one command each.
 
     Args:
         coordinate_from: The coordinate from where to begin swiping.
         coordinate_to: The coordinate where to stop swiping.
         steps: The steps taken to go from one to the other.
+        previous (optional): The screen before the swipe, if it was already
+            captured. Defaults to capturing it.
     """
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 3 53 {coordinate_from.x}")
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 3 54 {coordinate_from.y}")
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 1 330 1")
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 0 0 0")
-
-    y_per_step = abs(coordinate_from.y - coordinate_to.y) // steps
-    for i in range(1, steps):
-        subprocess.run(
-            f"{ADB.shell} sendevent /dev/input/event2 3 54 "
-            f"{coordinate_from.y - (y_per_step * i)}"
+    with PROFILER.span("scroll"):
+        touch_device = get_touch_device()
+        press, release = compile_swipe(
+            touch_device, coordinate_from, coordinate_to, steps
         )
-        subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 0 0 0")
-
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 3 54 {coordinate_to.y}")
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 0 0 0")
+        if previous is None:
+            previous = get_grayscale_screen()
+        run_shell(to_shell_command(touch_device, press))
+        pressed = monotonic()
 
-    sleep(1)
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 1 330 0")
-    subprocess.run(f"{ADB.shell} sendevent /dev/input/event2 0 0 0")
+        # Hold until the list moved and stopped following the finger,
+        # so it does not scroll on. Two equal captures from before the list
+        # started moving do not count, as they equal the previous screen.
+        wait_for_screen_settled(
+            get_grayscale_screen, previous=previous, timeout=1, replaces=1
+        )
+        if (remaining := MIN_SCROLL_HOLD - (monotonic() - pressed)) > 0:
+            with PROFILER.span("sleep"):
+                sleep(remaining)
+        run_shell(to_shell_command(touch_device, release))
 
 
 class ClipBoardResponse(object):
@@ -113,9 +393,21 @@ def get_clipboard() -> str:
     Returns:
         The content of the clipboard or an empty string.
     """
-    clipboard_response = subprocess.check_output(
-        f"{ADB.shell} am broadcast -n ch.pete.adbclipboard/.ReadReceiver"
-    ).decode("UTF-8")
+    return parse_clipboard_response(
+        run_shell("am broadcast -n ch.pete.adbclipboard/.ReadReceiver")
+    )
+
+
+def parse_clipboard_response(clipboard_response: str) -> str:
+    """
+    Extracts the clipboard content from the response of the AdbClipboard app.
+
+    Args:
+        clipboard_response: The output of the broadcast to the app.
+
+    Returns:
+        The content of the clipboard or an empty string.
+    """
     content = ""
     if "result=-1" in clipboard_response:
         data_match = data_matcher.search(clipboard_response)
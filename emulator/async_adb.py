@@ -0,0 +1,400 @@
+"""
+The asyncio counterparts of the device helpers in emulator.adb_integration.
+One event loop can drive many devices with them, and a screencap can be in flight
+while a tap is sent. Synchronous code runs them with run_sync().
+Devices on the executable transport get an asyncio shell session. The socket
+transport runs the blocking helpers on the default executor, and the replay
+transport plays its recording back in place.
+"""
+import asyncio
+import contextvars
+import subprocess
+import threading
+from time import monotonic
+from time import perf_counter
+from typing import Any, Awaitable, Callable, TypeVar
+
+from numpy import ndarray
+
+from emulator import adb_integration
+from emulator.adb_integration import AdbDevice
+from emulator.adb_integration import AdbTransport
+from emulator.adb_integration import CaptureMode
+from emulator.adb_integration import decode_png_screen
+from emulator.adb_integration import decode_raw_screen
+from emulator.adb_integration import get_device
+from emulator.adb_integration import MIN_SCROLL_HOLD
+from emulator.adb_integration import parse_clipboard_response
+from emulator.adb_integration import use_device
+from emulator.gestures import compile_swipe
+from emulator.gestures import DEFAULT_TOUCH_DEVICE_PATH
+from emulator.gestures import parse_touch_device
+from emulator.gestures import to_shell_command
+from emulator.gestures import TouchDevice
+from emulator.shell_session import AsyncShellSession
+from emulator.waiting import wait_for_screen_settled_async
+from instrumentation import PROFILER
+from readers.screen import Coordinate
+
+T = TypeVar("T")
+
+
+async def get_shell_session(device: AdbDevice | None = None) -> AsyncShellSession:
+    """
+    Gets the asynchronous shell session of a device on the running event loop,
+    creating it on first use. Sessions of closed loops are killed.
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+
+    Raises:
+        ValueError: If the device does not use the executable transport,
+            whose helpers run_shell() calls instead.
+
+    Returns:
+        The shell session of the device.
+    """
+    device = device or get_device()
+    if device.transport != AdbTransport.EXECUTABLE:
+        raise ValueError(
+            f"The {device.transport} transport has no asynchronous shell session."
+        )
+
+    for loop in [loop for loop in device.async_sessions if loop.is_closed()]:
+        device.async_sessions.pop(loop).kill()
+    loop = asyncio.get_running_loop()
+    if loop not in device.async_sessions:
+        device.async_sessions[loop] = AsyncShellSession(
+            adb_path=device.adb_path, device_name=device.device_name
+        )
+    return device.async_sessions[loop]
+
+
+async def close_shell_session(device: AdbDevice | None = None) -> None:
+    """
+    Closes the shell session of a device on the running event loop, which should
+    be done before the loop closes, e.g. at the end of asyncio.run().
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+    """
+    device = device or get_device()
+    session = device.async_sessions.pop(asyncio.get_running_loop(), None)
+    if session:
+        await session.close()
+
+
+async def run_shell(command: str, device: AdbDevice | None = None) -> str:
+    """
+    Runs a command on a device, recorded if the device has a recorder.
+
+    Args:
+        command: The shell command to run on the device.
+        device (optional): The device. Defaults to the current device.
+
+    Returns:
+        The output of the command.
+    """
+    device = device or get_device()
+    if device.transport == AdbTransport.REPLAY:
+        with use_device(device):
+            return adb_integration.run_shell(command)
+    if device.transport == AdbTransport.SOCKET:
+        return await _run_blocking(device, adb_integration.run_shell, command)
+
+    with PROFILER.span("shell"):
+        session = await get_shell_session(device)
+        start = perf_counter()
+        try:
+            output = await session.run(command)
+        except subprocess.CalledProcessError as error:
+            if device.recorder:
+                device.recorder.record_command(
+                    command, error.output or "", error.returncode, start
+                )
+            raise
+        if device.recorder:
+            device.recorder.record_command(command, output, 0, start)
+        return output
+
+
+async def get_grayscale_screen(device: AdbDevice | None = None) -> ndarray:
+    """
+    Captures the screen of a device in gray-scale, recorded if the device has
+    a recorder. The decoding runs on the default executor, so the event loop
+    is not blocked.
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+
+    Returns:
+        The ndarray containing the gray-scaled pixels.
+    """
+    device = device or get_device()
+    if device.transport == AdbTransport.REPLAY:
+        with use_device(device):
+            return adb_integration.get_grayscale_screen()
+    if device.transport == AdbTransport.SOCKET:
+        # Captured and decoded together, the raw buffer is reused per device.
+        return await _run_blocking(device, adb_integration.get_grayscale_screen)
+
+    with PROFILER.span("capture"):
+        start = perf_counter()
+        raw = device.capture_mode == CaptureMode.RAW
+        with PROFILER.span("screencap"):
+            screen = await (read_raw_screen(device) if raw else read_png_screen(device))
+        with PROFILER.span("decode"):
+            image = await _run_in_executor(
+                decode_raw_screen if raw else decode_png_screen, screen
+            )
+        if device.recorder:
+            device.recorder.record_frame(image, start)
+        return image
+
+
+async def read_png_screen(device: AdbDevice | None = None) -> bytes:
+    """
+    Captures the screen as PNG through the adb shell.
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+
+    Raises:
+        ValueError: If the device replays a recording, which has no PNGs.
+
+    Returns:
+        The PNG bytes, with the shell's line ending conversion undone.
+    """
+    device = device or get_device()
+    _check_capturable(device)
+    if device.transport == AdbTransport.SOCKET:
+        return await _run_blocking(device, adb_integration.read_png_screen)
+
+    png_bytes = await _check_output(
+        device.adb_path, "-s", device.device_name, "shell", "screencap", "-p"
+    )
+    return png_bytes.replace(b"\r\n", b"\n")
+
+
+async def read_raw_screen(device: AdbDevice | None = None) -> bytes:
+    """
+    Captures the screen as raw framebuffer through adb exec-out.
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+
+    Raises:
+        ValueError: If the device replays a recording, which has no raw screens.
+
+    Returns:
+        The raw screencap bytes, header included.
+    """
+    device = device or get_device()
+    _check_capturable(device)
+    if device.transport == AdbTransport.SOCKET:
+        # A copy, the socket transport reads into a buffer reused per device.
+        return bytes(await _run_blocking(device, adb_integration.read_raw_screen))
+
+    return await _check_output(
+        device.adb_path, "-s", device.device_name, "exec-out", "screencap"
+    )
+
+
+async def click(coordinate: Coordinate, device: AdbDevice | None = None) -> None:
+    """
+    Tap a specific coordinate.
+
+    Args:
+        coordinate: The coordinate where to tap/click.
+        device (optional): The device. Defaults to the current device.
+    """
+    await run_shell(f"input tap {coordinate.x} {coordinate.y}", device)
+
+
+async def go_back(device: AdbDevice | None = None) -> None:
+    """
+    Goes back one screen, however the current app might interpret that.
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+    """
+    await run_shell("input keyevent KEYCODE_BACK", device)
+
+
+async def get_touch_device(device: AdbDevice | None = None) -> TouchDevice:
+    """
+    Gets the touch screen of a device, detecting it on first use.
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+
+    Returns:
+        The input device to send touch events to.
+    """
+    device = device or get_device()
+    if device.touch_device is None:
+        try:
+            device.touch_device = parse_touch_device(
+                await run_shell("getevent -pl", device),
+                await run_shell("wm size", device),
+            )
+        except subprocess.CalledProcessError:
+            device.touch_device = TouchDevice(path=DEFAULT_TOUCH_DEVICE_PATH)
+    return device.touch_device
+
+
+async def scroll_low_level(
+    coordinate_from: Coordinate,
+    coordinate_to: Coordinate,
+    steps: int = 5,
+    device: AdbDevice | None = None,
+    previous: ndarray | None = None,
+) -> None:
+    """
+    Swipe from a given coordinate to a given coordinate with raw input events,
+    holding until the list moved and stopped following before releasing,
+    see emulator.adb_integration.scroll_low_level().
+
+    Args:
+        coordinate_from: The coordinate from where to begin swiping.
+        coordinate_to: The coordinate where to stop swiping.
+        steps: The steps taken to go from one to the other.
+        device (optional): The device. Defaults to the current device.
+        previous (optional): The screen before the swipe, if it was already
+            captured. Defaults to capturing it.
+    """
+    device = device or get_device()
+    touch_device = await get_touch_device(device)
+    press, release = compile_swipe(touch_device, coordinate_from, coordinate_to, steps)
+    if previous is None:
+        previous = await get_grayscale_screen(device)
+    await run_shell(to_shell_command(touch_device, press), device)
+    pressed = monotonic()
+
+    await wait_for_screen_settled_async(
+        lambda: get_grayscale_screen(device), previous=previous, timeout=1, replaces=1
+    )
+    if (remaining := MIN_SCROLL_HOLD - (monotonic() - pressed)) > 0:
+        await asyncio.sleep(remaining)
+    await run_shell(to_shell_command(touch_device, release), device)
+
+
+async def get_clipboard(device: AdbDevice | None = None) -> str:
+    """
+    Reads the clipboard through the AdbClipboard app, see
+    emulator.adb_integration.get_clipboard().
+
+    Args:
+        device (optional): The device. Defaults to the current device.
+
+    Returns:
+        The content of the clipboard or an empty string.
+    """
+    return parse_clipboard_response(
+        await run_shell("am broadcast -n ch.pete.adbclipboard/.ReadReceiver", device)
+    )
+
+
+def _check_capturable(device: AdbDevice) -> None:
+    if device.transport == AdbTransport.REPLAY:
+        raise ValueError(
+            "A replayed recording only has grayscale frames, "
+            "use get_grayscale_screen()."
+        )
+
+
+async def _run_in_executor(function: Callable[..., T], *args: Any) -> T:
+    # The context carries the profiler's open spans into the executor thread.
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        None, context.run, function, *args
+    )
+
+
+async def _run_blocking(device: AdbDevice, function: Callable[..., T], *args: Any) -> T:
+    """
+    Runs a helper of emulator.adb_integration for a device on the default executor.
+    """
+
+    def run_on_device() -> T:
+        with use_device(device):
+            return function(*args)
+
+    return await _run_in_executor(run_on_device)
+
+
+async def _check_output(*command: str) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE
+    )
+    output, _ = await process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, output)
+    return output
+
+
+class EventLoopThread:
+    """
+    An event loop running on a daemon thread, which synchronous code of any
+    thread hands coroutines to. All devices share it, so their I/O overlaps.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="adb-event-loop", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coroutine: Awaitable[T], timeout: float | None = None) -> T:
+        """
+        Runs a coroutine on the loop and waits for its result.
+        The coroutine sees the context of the calling thread,
+        e.g. the device selected with use_device().
+
+        Args:
+            coroutine: The coroutine to run.
+            timeout (optional): The seconds after which to give up waiting.
+
+        Returns:
+            The result of the coroutine.
+        """
+        context = contextvars.copy_context()
+
+        async def run_in_context() -> T:
+            return await asyncio.create_task(coroutine, context=context)
+
+        return asyncio.run_coroutine_threadsafe(run_in_context(), self._loop).result(
+            timeout
+        )
+
+    def close(self) -> None:
+        """
+        Stops the loop and its thread.
+        """
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+_EVENT_LOOP_THREAD: EventLoopThread | None = None
+_EVENT_LOOP_THREAD_LOCK = threading.Lock()
+
+
+def run_sync(coroutine: Awaitable[T], timeout: float | None = None) -> T:
+    """
+    Runs a coroutine of this module from synchronous code, on a shared event loop.
+    Must not be called from a coroutine running on that loop.
+
+    Args:
+        coroutine: The coroutine to run, e.g. click(coordinate, device).
+        timeout (optional): The seconds after which to give up waiting.
+
+    Returns:
+        The result of the coroutine.
+    """
+    global _EVENT_LOOP_THREAD
+    with _EVENT_LOOP_THREAD_LOCK:
+        if _EVENT_LOOP_THREAD is None:
+            _EVENT_LOOP_THREAD = EventLoopThread()
+    return _EVENT_LOOP_THREAD.run(coroutine, timeout)
@@ -0,0 +1,145 @@
+"""
+Compiles touch gestures to raw input events, which are sent to the device's
+touch screen in one shell command instead of one command per event.
+"""
+from dataclasses import dataclass
+import re
+
+from readers.screen import Coordinate
+
+# Event types and codes, see linux/input-event-codes.h.
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 330
+ABS_MT_POSITION_X = 53
+ABS_MT_POSITION_Y = 54
+
+# Used if no device reports multi-touch positions, which is where we started.
+DEFAULT_TOUCH_DEVICE_PATH = "/dev/input/event2"
+
+_DEVICE_MATCHER = re.compile(r"^add device \d+: (\S+)", re.MULTILINE)
+_AXIS_MAX_MATCHER = re.compile(r"(ABS_MT_POSITION_[XY])\s*:.*?max (\d+)")
+_SCREEN_SIZE_MATCHER = re.compile(r"(\d+)x(\d+)")
+
+
+@dataclass
+class InputEvent:
+    type: int
+    code: int
+    value: int
+
+
+@dataclass
+class TouchDevice:
+    """
+    The input device of the touch screen and how its axes map to screen pixels.
+    """
+
+    path: str
+    # The touch positions per screen pixel, 1 if the axes use pixels.
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+
+
+def parse_touch_device(
+    getevent_output: str, screen_size_output: str = ""
+) -> TouchDevice:
+    """
+    Finds the touch screen in the device list of `getevent -pl`.
+
+    Args:
+        getevent_output: The output of `getevent -pl`.
+        screen_size_output (optional): The output of `wm size`, to scale positions
+            if the touch axes do not use pixels.
+
+    Returns:
+        The first device reporting multi-touch positions,
+        or the default device if there is none.
+    """
+    starts = list(_DEVICE_MATCHER.finditer(getevent_output))
+    for index, start in enumerate(starts):
+        end = starts[index + 1].start() if index + 1 < len(starts) else None
+        block = getevent_output[start.end() : end]
+        axis_max = dict(_AXIS_MAX_MATCHER.findall(block))
+        if "ABS_MT_POSITION_X" not in axis_max or "ABS_MT_POSITION_Y" not in axis_max:
+            continue
+
+        touch_device = TouchDevice(path=start.group(1))
+        axis_x = int(axis_max["ABS_MT_POSITION_X"]) + 1
+        axis_y = int(axis_max["ABS_MT_POSITION_Y"]) + 1
+        screen_size = _SCREEN_SIZE_MATCHER.search(screen_size_output)
+        # wm size reports the natural orientation, so axes in pixels match it
+        # either way round and are left as they are.
+        if screen_size and sorted((axis_x, axis_y)) != sorted(
+            int(size) for size in screen_size.groups()
+        ):
+            width, height = (int(size) for size in screen_size.groups())
+            touch_device.scale_x = axis_x / width
+            touch_device.scale_y = axis_y / height
+        return touch_device
+
+    return TouchDevice(path=DEFAULT_TOUCH_DEVICE_PATH)
+
+
+def compile_swipe(
+    touch_device: TouchDevice,
+    coordinate_from: Coordinate,
+    coordinate_to: Coordinate,
+    steps: int = 5,
+) -> tuple[list[InputEvent], list[InputEvent]]:
+    """
+    Compiles a vertical swipe which holds at its end.
+
+    Args:
+        touch_device: The touch screen, to scale the positions.
+        coordinate_from: The coordinate from where to begin swiping.
+        coordinate_to: The coordinate where to stop swiping.
+        steps: The steps taken to go from one to the other.
+
+    Returns:
+        The events pressing and moving, and the events releasing the finger.
+    """
+
+    def move_y(y: int) -> list[InputEvent]:
+        return [
+            InputEvent(EV_ABS, ABS_MT_POSITION_Y, round(y * touch_device.scale_y)),
+            InputEvent(EV_SYN, SYN_REPORT, 0),
+        ]
+
+    press = [
+        InputEvent(
+            EV_ABS, ABS_MT_POSITION_X, round(coordinate_from.x * touch_device.scale_x)
+        ),
+        InputEvent(
+            EV_ABS, ABS_MT_POSITION_Y, round(coordinate_from.y * touch_device.scale_y)
+        ),
+        InputEvent(EV_KEY, BTN_TOUCH, 1),
+        InputEvent(EV_SYN, SYN_REPORT, 0),
+    ]
+    y_per_step = abs(coordinate_from.y - coordinate_to.y) // steps
+    for i in range(1, steps):
+        press += move_y(coordinate_from.y - (y_per_step * i))
+    press += move_y(coordinate_to.y)
+
+    release = [InputEvent(EV_KEY, BTN_TOUCH, 0), InputEvent(EV_SYN, SYN_REPORT, 0)]
+    return press, release
+
+
+def to_shell_command(touch_device: TouchDevice, events: list[InputEvent]) -> str:
+    """
+    Joins events to one shell command, so they are sent without a round-trip
+    to the host in between.
+
+    Args:
+        touch_device: The touch screen to send the events to.
+        events: The events in order.
+
+    Returns:
+        The shell command sending all events.
+    """
+    return " && ".join(
+        f"sendevent {touch_device.path} {event.type} {event.code} {event.value}"
+        for event in events
+    )
@@ -0,0 +1,217 @@
+"""
+Records the frames and shell commands of a device session to a folder,
+and replays such a recording in place of the device, without an emulator.
+
+A recording is a `session.jsonl` with one event per line, in the order they
+happened, and the captured frames as grayscale PNGs in `frames/`.
+"""
+import json
+import os
+from pathlib import Path
+import re
+import subprocess
+import threading
+from time import perf_counter
+from typing import Any
+
+import cv2
+from numpy import ndarray
+
+SESSION_FILE = "session.jsonl"
+FRAMES_DIRECTORY = "frames"
+
+
+class ReplayError(Exception):
+    """
+    The replayed code asked for something the recording does not contain.
+    """
+
+
+def get_device_directory(directory: str | os.PathLike, device_name: str) -> Path:
+    """
+    Get the folder of a device's recording, as several devices record at once.
+
+    Args:
+        directory: The folder of all recordings.
+        device_name: The name of the device.
+
+    Returns:
+        The folder named after the device.
+    """
+    return Path(directory) / re.sub(r"[^\w.-]", "-", device_name)
+
+
+class SessionRecorder:
+    """
+    Writes every captured frame and shell command of a device to a folder.
+    Times are seconds since the recorder was created.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        """
+        Args:
+            directory: The folder to record to, an existing recording is replaced.
+        """
+        self.directory = Path(directory)
+        (self.directory / FRAMES_DIRECTORY).mkdir(parents=True, exist_ok=True)
+        self._file = open(self.directory / SESSION_FILE, "w", encoding="utf-8")
+        self._frames = 0
+        self._start = perf_counter()
+        self._lock = threading.Lock()
+
+    def record_frame(self, image: ndarray, start: float) -> None:
+        """
+        Records a captured frame.
+
+        Args:
+            image: The grayscale frame.
+            start: The perf_counter() when the capture started.
+        """
+        end = perf_counter()
+        with self._lock:
+            self._frames += 1
+            file_name = f"{FRAMES_DIRECTORY}/{self._frames:06d}.png"
+            # Fast compression, recording should barely slow down the session.
+            cv2.imwrite(
+                str(self.directory / file_name),
+                image,
+                [cv2.IMWRITE_PNG_COMPRESSION, 1],
+            )
+            self._append(
+                {
+                    "type": "frame",
+                    "time": start - self._start,
+                    "duration": end - start,
+                    "file": file_name,
+                }
+            )
+
+    def record_command(
+        self, command: str, output: str, status: int, start: float
+    ) -> None:
+        """
+        Records a shell command and its result.
+
+        Args:
+            command: The shell command.
+            output: The output of the command.
+            status: The exit status of the command.
+            start: The perf_counter() when the command was sent.
+        """
+        end = perf_counter()
+        with self._lock:
+            self._append(
+                {
+                    "type": "command",
+                    "time": start - self._start,
+                    "duration": end - start,
+                    "command": command,
+                    "output": output,
+                    "status": status,
+                }
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _append(self, record: dict[str, Any]) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+
+def load_events(directory: str | os.PathLike) -> list[dict[str, Any]]:
+    """
+    Reads the events of a recording.
+
+    Args:
+        directory: The folder of the recording.
+
+    Returns:
+        The frame and command events in the order they were recorded.
+    """
+    with open(Path(directory) / SESSION_FILE, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class SessionReplay:
+    """
+    Plays a recording back in place of a device.
+    Every shell command has to be the next recorded one, frames recorded before
+    it which were not asked for are skipped. If more frames are asked for than
+    were recorded before the next command, e.g. because a wait polls faster,
+    the last frame is repeated. So the same code reads the same frames every time.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        """
+        Args:
+            directory: The folder of the recording.
+        """
+        self.directory = Path(directory)
+        self.events = load_events(directory)
+        self._position = 0
+        self._frame: ndarray | None = None
+        self._lock = threading.Lock()
+
+    def capture(self) -> ndarray:
+        """
+        Get the next recorded frame.
+
+        Raises:
+            ReplayError: If no frame was recorded before the next command.
+
+        Returns:
+            The next frame, or the last one again if the next event is a command.
+        """
+        with self._lock:
+            if (
+                self._position < len(self.events)
+                and self.events[self._position]["type"] == "frame"
+            ):
+                self._frame = cv2.imread(
+                    str(self.directory / self.events[self._position]["file"]),
+                    cv2.IMREAD_GRAYSCALE,
+                )
+                self._position += 1
+
+            if self._frame is None:
+                raise ReplayError("No frame was recorded before the first command.")
+            return self._frame
+
+    def run(self, command: str) -> str:
+        """
+        Plays back the next recorded shell command.
+
+        Args:
+            command: The shell command, which has to match the recorded one.
+
+        Raises:
+            ReplayError: If the command is not the next one recorded.
+            subprocess.CalledProcessError: If the recorded command failed.
+
+        Returns:
+            The recorded output.
+        """
+        with self._lock:
+            while (
+                self._position < len(self.events)
+                and self.events[self._position]["type"] != "command"
+            ):
+                self._position += 1
+            if self._position == len(self.events):
+                raise ReplayError(f"The recording ended before `{command}`.")
+
+            event = self.events[self._position]
+            if event["command"] != command:
+                raise ReplayError(
+                    f"Expected `{event['command']}` at event {self._position}, "
+                    f"got `{command}`."
+                )
+            self._position += 1
+
+        if event["status"] != 0:
+            raise subprocess.CalledProcessError(
+                event["status"], command, event["output"]
+            )
+        return event["output"]
@@ -0,0 +1,413 @@
+"""A long-lived ADB shell which commands are piped through."""
+import asyncio
+import queue
+import subprocess
+import threading
+import time
+from typing import IO
+import uuid
+
+
+class CommandInterruptedError(subprocess.SubprocessError):
+    """
+    The shell was lost after a command started. The command may have taken effect,
+    so it is not run again, e.g. to not tap twice.
+    """
+
+    def __init__(self, command: str, output: str):
+        self.cmd = command
+        self.output = output
+
+    def __str__(self):
+        return f"The shell was lost while running `{self.cmd}`."
+
+
+class ShellSession:
+    """
+    Keeps one `adb -s <device> shell` process open and sends every command through
+    its stdin instead of starting a new adb process per command.
+    The end of a command's output is detected by a sentinel line echoed after it,
+    which also carries the exit status of the command.
+    The output is read on a thread, so a hung command times out instead of
+    blocking the crawl.
+    """
+
+    def __init__(
+        self,
+        adb_path: str,
+        device_name: str,
+        max_reconnects: int = 3,
+        timeout: float = 30,
+    ):
+        """
+        Args:
+            adb_path: The path to the adb binary.
+            device_name: The serial of the device, as shown by `adb devices`.
+            max_reconnects: How often a command is retried on a new shell process
+                before giving up.
+            timeout: The seconds a command may take. Defaults to 30.
+        """
+        self.adb_path = adb_path
+        self.device_name = device_name
+        self.max_reconnects = max_reconnects
+        self.timeout = timeout
+        self.sentinel = f"__cod_ocr_{uuid.uuid4().hex}__"
+        self._process: subprocess.Popen | None = None
+        self._lines: queue.Queue[bytes] = queue.Queue()
+        self._lock = threading.Lock()
+
+    def is_alive(self) -> bool:
+        """
+        Check if the shell process is running.
+
+        Returns:
+            Whether the shell process is running.
+        """
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        """
+        Starts the shell process, if it is not running already.
+        """
+        if self.is_alive():
+            return
+
+        self._process = subprocess.Popen(
+            [self.adb_path, "-s", self.device_name, "shell"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        # Every process gets its own queue, so no line of a lost shell is read.
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=_pump_lines, args=(self._process.stdout, self._lines), daemon=True
+        ).start()
+
+    def close(self) -> None:
+        """
+        Ends the shell process. The next command will start a new one.
+        """
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+        try:
+            process.stdin.write(b"exit\n")
+            process.stdin.flush()
+            process.wait(timeout=2)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        finally:
+            # stdout is closed by the thread reading it, once it ends.
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def run(self, command: str) -> str:
+        """
+        Runs a command in the shell and waits for its output.
+        Reconnects if the shell process died in between.
+
+        Args:
+            command: The shell command to run on the device.
+
+        Raises:
+            subprocess.CalledProcessError: If the command exited with a status not 0.
+            subprocess.TimeoutExpired: If the command did not finish in time.
+            CommandInterruptedError: If the shell was lost while the command ran.
+            ConnectionError: If the shell could not be (re-)started.
+
+        Returns:
+            The output of the command, stdout and stderr combined.
+        """
+        with self._lock:
+            for _ in range(self.max_reconnects + 1):
+                self.start()
+                try:
+                    status, output = self._run_framed(command)
+                except (OSError, EOFError, ValueError):
+                    # The command did not start, so it is safe to send it again.
+                    self.close()
+                    continue
+                except subprocess.SubprocessError:
+                    self.close()
+                    raise
+
+                if status != 0:
+                    raise subprocess.CalledProcessError(status, command, output)
+                return output
+
+        raise ConnectionError(
+            f"Lost the shell to {self.device_name} {self.max_reconnects + 1} times."
+        )
+
+    def _run_framed(self, command: str) -> tuple[int, str]:
+        """
+        Writes a command followed by the sentinel and reads until the sentinel.
+
+        Args:
+            command: The shell command to run on the device.
+
+        Raises:
+            EOFError: If the shell process closed its output before the command
+                started.
+            CommandInterruptedError: If it closed its output after the command
+                started.
+            subprocess.TimeoutExpired: If the sentinel was not read in time.
+
+        Returns:
+            The exit status and output of the command.
+        """
+        self._process.stdin.write(frame_command(command, self.sentinel))
+        self._process.stdin.flush()
+
+        output = FramedOutput(command, self.sentinel)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired(
+                    command, self.timeout, output.get_text()
+                ) from None
+            result = output.feed(line)
+            if result is not None:
+                return result
+
+
+class AsyncShellSession:
+    """
+    The asyncio counterpart of ShellSession, for one event loop to drive many
+    devices. Commands to the same device are still run one after another.
+    """
+
+    def __init__(
+        self,
+        adb_path: str,
+        device_name: str,
+        max_reconnects: int = 3,
+        timeout: float = 30,
+    ):
+        """
+        Args:
+            adb_path: The path to the adb binary.
+            device_name: The serial of the device, as shown by `adb devices`.
+            max_reconnects: How often a command is retried on a new shell process
+                before giving up.
+            timeout: The seconds a command may take. Defaults to 30.
+        """
+        self.adb_path = adb_path
+        self.device_name = device_name
+        self.max_reconnects = max_reconnects
+        self.timeout = timeout
+        self.sentinel = f"__cod_ocr_{uuid.uuid4().hex}__"
+        self._process: asyncio.subprocess.Process | None = None
+        self._lock = asyncio.Lock()
+
+    def is_alive(self) -> bool:
+        """
+        Check if the shell process is running.
+
+        Returns:
+            Whether the shell process is running.
+        """
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self) -> None:
+        """
+        Starts the shell process, if it is not running already.
+        """
+        if self.is_alive():
+            return
+
+        self._process = await asyncio.create_subprocess_exec(
+            self.adb_path,
+            "-s",
+            self.device_name,
+            "shell",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+
+    async def close(self) -> None:
+        """
+        Ends the shell process. The next command will start a new one.
+        """
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+        try:
+            process.stdin.write(b"exit\n")
+            await process.stdin.drain()
+            await asyncio.wait_for(process.wait(), timeout=2)
+        except (OSError, asyncio.TimeoutError):
+            process.kill()
+            await process.wait()
+
+    def kill(self) -> None:
+        """
+        Kills the shell process without waiting for it, e.g. after the event loop
+        that started it was closed.
+        """
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+    async def run(self, command: str) -> str:
+        """
+        Runs a command in the shell and waits for its output.
+        Reconnects if the shell process died in between.
+
+        Args:
+            command: The shell command to run on the device.
+
+        Raises:
+            subprocess.CalledProcessError: If the command exited with a status not 0.
+            subprocess.TimeoutExpired: If the command did not finish in time.
+            CommandInterruptedError: If the shell was lost while the command ran.
+            ConnectionError: If the shell could not be (re-)started.
+
+        Returns:
+            The output of the command, stdout and stderr combined.
+        """
+        async with self._lock:
+            for _ in range(self.max_reconnects + 1):
+                await self.start()
+                try:
+                    status, output = await self._run_framed(command)
+                except (OSError, EOFError):
+                    # The command did not start, so it is safe to send it again.
+                    await self.close()
+                    continue
+                except subprocess.SubprocessError:
+                    await self.close()
+                    raise
+
+                if status != 0:
+                    raise subprocess.CalledProcessError(status, command, output)
+                return output
+
+        raise ConnectionError(
+            f"Lost the shell to {self.device_name} {self.max_reconnects + 1} times."
+        )
+
+    async def _run_framed(self, command: str) -> tuple[int, str]:
+        self._process.stdin.write(frame_command(command, self.sentinel))
+        await self._process.stdin.drain()
+
+        output = FramedOutput(command, self.sentinel)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                line = await asyncio.wait_for(
+                    self._process.stdout.readline(),
+                    max(0.0, deadline - time.monotonic()),
+                )
+            except asyncio.TimeoutError:
+                raise subprocess.TimeoutExpired(
+                    command, self.timeout, output.get_text()
+                ) from None
+            result = output.feed(line)
+            if result is not None:
+                return result
+
+
+def frame_command(command: str, sentinel: str) -> bytes:
+    """
+    Wraps a command in the printing of a start line and of the sentinel with
+    the exit status, so it is known whether the command started and when it ended.
+
+    Args:
+        command: The shell command to run on the device.
+        sentinel: The line prefix marking the start and end of the command's output.
+
+    Returns:
+        The bytes to write to the shell's stdin.
+    """
+    return (
+        f"printf '%s start\\n' {sentinel}\n"
+        f"{command}\n"
+        f"printf '\\n%s %d\\n' {sentinel} $?\n"
+    ).encode("UTF-8")
+
+
+class FramedOutput:
+    """
+    Collects the output of a framed command, line by line, see frame_command.
+    """
+
+    def __init__(self, command: str, sentinel: str):
+        """
+        Args:
+            command: The shell command, for errors.
+            sentinel: The line prefix marking the start and end of the output.
+        """
+        self.command = command
+        self.sentinel = sentinel
+        self.started = False
+        self.lines: list[str] = []
+
+    def feed(self, line: bytes) -> tuple[int, str] | None:
+        """
+        Adds a line read from the shell.
+
+        Args:
+            line: The line as read, empty at the end of the shell's output.
+
+        Raises:
+            EOFError: If the shell ended before the command started.
+            CommandInterruptedError: If the shell ended after the command started.
+
+        Returns:
+            The exit status and output of the command once its sentinel was read,
+            otherwise None.
+        """
+        if not line:
+            if self.started:
+                raise CommandInterruptedError(self.command, self.get_text())
+            raise EOFError("The shell closed before the command started.")
+
+        text = line.decode("UTF-8", errors="replace").rstrip("\r\n")
+        if not self.started:
+            # Anything before the start line is left over from earlier commands.
+            self.started = text == f"{self.sentinel} start"
+            return None
+        if text.startswith(self.sentinel):
+            # The sentinel is printed on a new line, which adds one empty line.
+            if self.lines and not self.lines[-1]:
+                self.lines.pop()
+            return int(text.split(" ")[-1]), self.get_text()
+        self.lines.append(text)
+        return None
+
+    def get_text(self) -> str:
+        """
+        Returns:
+            The output read so far.
+        """
+        return "\n".join(self.lines)
+
+
+def _pump_lines(output: IO[bytes], lines: queue.Queue) -> None:
+    """
+    Moves the lines of a shell's output to a queue, which can be waited on with
+    a timeout, and an empty line once the output ends.
+    """
+    try:
+        for line in iter(output.readline, b""):
+            lines.put(line)
+    except (OSError, ValueError):
+        pass
+    finally:
+        lines.put(b"")
+        output.close()
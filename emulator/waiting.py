@@ -0,0 +1,269 @@
+"""Waits for the screen to be ready instead of sleeping for a fixed time."""
+import asyncio
+from dataclasses import dataclass
+import logging
+from time import monotonic
+from time import sleep
+from typing import Awaitable, Callable
+
+import cv2
+import numpy
+from numpy import ndarray
+
+from instrumentation import PROFILER
+from readers.screen import get_on_screen
+from readers.screen import Template
+
+logger = logging.getLogger(__name__)
+
+# Frames are compared at this fraction of their size, which is enough to see motion.
+DIFF_SCALE = 0.25
+# Mean absolute pixel difference below which two frames count as equal.
+SETTLED_THRESHOLD = 1.0
+
+
+@dataclass
+class WaitStatistics:
+    waits: int = 0
+    timeouts: int = 0
+    time_waited: float = 0.0
+    time_saved: float = 0.0
+
+
+WAIT_STATISTICS = WaitStatistics()
+
+
+def wait_until(
+    predicate: Callable[[], bool],
+    timeout: float,
+    poll_interval: float = 0.05,
+    replaces: float | None = None,
+    description: str = "condition",
+) -> bool:
+    """
+    Polls a predicate until it is true or the timeout is reached.
+
+    Args:
+        predicate: The check to poll, it is called at least once.
+        timeout: The seconds after which to give up.
+        poll_interval: The seconds to sleep between two checks.
+        replaces (optional): The seconds of the fixed sleep this wait replaces,
+            to log the time saved. Defaults to the timeout.
+        description: What is waited for, for the log.
+
+    Returns:
+        Whether the predicate became true before the timeout.
+    """
+    start = monotonic()
+    with PROFILER.span("wait"):
+        while not (fulfilled := predicate()) and monotonic() - start < timeout:
+            with PROFILER.span("sleep"):
+                sleep(poll_interval)
+    _record_wait(monotonic() - start, fulfilled, timeout, replaces, description)
+    return fulfilled
+
+
+async def wait_until_async(
+    predicate: Callable[[], Awaitable[bool]],
+    timeout: float,
+    poll_interval: float = 0.05,
+    replaces: float | None = None,
+    description: str = "condition",
+) -> bool:
+    """
+    Polls an asynchronous predicate until it is true or the timeout is reached,
+    without blocking the event loop in between.
+
+    Args:
+        predicate: The check to poll, it is awaited at least once.
+        timeout: The seconds after which to give up.
+        poll_interval: The seconds to sleep between two checks.
+        replaces (optional): The seconds of the fixed sleep this wait replaces,
+            to log the time saved. Defaults to the timeout.
+        description: What is waited for, for the log.
+
+    Returns:
+        Whether the predicate became true before the timeout.
+    """
+    start = monotonic()
+    while not (fulfilled := await predicate()) and monotonic() - start < timeout:
+        await asyncio.sleep(poll_interval)
+    _record_wait(monotonic() - start, fulfilled, timeout, replaces, description)
+    return fulfilled
+
+
+def _record_wait(
+    elapsed: float,
+    fulfilled: bool,
+    timeout: float,
+    replaces: float | None,
+    description: str,
+) -> None:
+    saved = (timeout if replaces is None else replaces) - elapsed
+    WAIT_STATISTICS.waits += 1
+    WAIT_STATISTICS.timeouts += not fulfilled
+    WAIT_STATISTICS.time_waited += elapsed
+    WAIT_STATISTICS.time_saved += saved
+    logger.debug(
+        "Waited %.3fs for %s (%s), saved %.3fs.",
+        elapsed,
+        description,
+        "done" if fulfilled else "timed out",
+        saved,
+    )
+
+
+def wait_for_template(
+    capture: Callable[[], ndarray],
+    template: Template,
+    present: bool = True,
+    timeout: float = 2.0,
+    poll_interval: float = 0.05,
+    replaces: float | None = None,
+) -> ndarray | None:
+    """
+    Captures the screen until a template appears or disappears.
+
+    Args:
+        capture: Captures the current screen.
+        template: The image to look for.
+        present: Whether to wait for the template to appear or to disappear.
+        timeout: The seconds after which to give up.
+        poll_interval: The seconds to sleep between two captures.
+        replaces (optional): The seconds of the fixed sleep this wait replaces.
+
+    Returns:
+        The first screen fulfilling the condition, or None on timeout.
+    """
+    frames = []
+
+    def check() -> bool:
+        frames.append(capture())
+        del frames[:-1]
+        return (get_on_screen(image=frames[-1], template=template) is not None) == (
+            present
+        )
+
+    if wait_until(
+        check,
+        timeout=timeout,
+        poll_interval=poll_interval,
+        replaces=replaces,
+        description=f"{template.path} to {'appear' if present else 'disappear'}",
+    ):
+        return frames[-1]
+    return None
+
+
+def wait_for_screen_settled(
+    capture: Callable[[], ndarray],
+    previous: ndarray | None = None,
+    timeout: float = 2.0,
+    poll_interval: float = 0.05,
+    replaces: float | None = None,
+) -> ndarray:
+    """
+    Captures the screen until two consecutive captures are equal.
+    If the screen before an action is given, the screen first has to change
+    compared to it, so a capture from before the action took effect does not count.
+
+    Args:
+        capture: Captures the current screen.
+        previous (optional): The screen before the action that is waited for.
+        timeout: The seconds after which to give up.
+        poll_interval: The seconds to sleep between two captures.
+        replaces (optional): The seconds of the fixed sleep this wait replaces.
+
+    Returns:
+        The last captured screen, settled or not.
+    """
+    check = ScreenSettledCheck(previous)
+    wait_until(
+        lambda: check(capture()),
+        timeout=timeout,
+        poll_interval=poll_interval,
+        replaces=replaces,
+        description="the screen to settle",
+    )
+    return check.frame
+
+
+async def wait_for_screen_settled_async(
+    capture: Callable[[], Awaitable[ndarray]],
+    previous: ndarray | None = None,
+    timeout: float = 2.0,
+    poll_interval: float = 0.05,
+    replaces: float | None = None,
+) -> ndarray:
+    """
+    The asynchronous counterpart of wait_for_screen_settled().
+
+    Args:
+        capture: Captures the current screen.
+        previous (optional): The screen before the action that is waited for.
+        timeout: The seconds after which to give up.
+        poll_interval: The seconds to sleep between two captures.
+        replaces (optional): The seconds of the fixed sleep this wait replaces.
+
+    Returns:
+        The last captured screen, settled or not.
+    """
+    check = ScreenSettledCheck(previous)
+
+    async def check_capture() -> bool:
+        return check(await capture())
+
+    await wait_until_async(
+        check_capture,
+        timeout=timeout,
+        poll_interval=poll_interval,
+        replaces=replaces,
+        description="the screen to settle",
+    )
+    return check.frame
+
+
+class ScreenSettledCheck:
+    """
+    Checks captures one by one, until two consecutive ones are equal.
+    If the screen before an action is given, a capture first has to differ from it.
+    """
+
+    def __init__(self, previous: ndarray | None = None):
+        """
+        Args:
+            previous (optional): The screen before the action that is waited for.
+        """
+        self.frame: ndarray | None = None
+        self._small: ndarray | None = None
+        self._changed = previous is None
+        self._previous = None if previous is None else _shrink(previous)
+
+    def __call__(self, frame: ndarray) -> bool:
+        """
+        Args:
+            frame: The next capture.
+
+        Returns:
+            Whether the screen settled with this capture.
+        """
+        self.frame = frame
+        small = _shrink(frame)
+        if not self._changed:
+            self._changed = not _is_equal(small, self._previous)
+            self._small = small
+            return False
+
+        settled = self._small is not None and _is_equal(small, self._small)
+        self._small = small
+        return settled
+
+
+def _shrink(image: ndarray) -> ndarray:
+    return cv2.resize(
+        image, None, fx=DIFF_SCALE, fy=DIFF_SCALE, interpolation=cv2.INTER_AREA
+    )
+
+
+def _is_equal(image: ndarray, other: ndarray) -> bool:
+    return float(numpy.mean(cv2.absdiff(image, other))) < SETTLED_THRESHOLD
@@ -4,5 +4,5 @@ from abc import abstractmethod
 
 class AbstractExporter(ABC):
     @abstractmethod
-    def export(self, user_data: dict[int, dict[str, int | str]]):
+    def export(self, user_data: dict[int, dict[str, int | str]], alliance_name: str):
         pass
@@ -1,14 +1,13 @@
 from datetime import datetime
 
 from exporters import AbstractExporter
-from logic.logic import ALLIANCE_INFORMATION
 
 
 class CsvExporter(AbstractExporter):
-    def export(self, user_data: dict[int, dict[str, int | str]]):
+    def export(self, user_data: dict[int, dict[str, int | str]], alliance_name: str):
         file_name = (
             f"{datetime.now().strftime('%Y-%m-%d_%H-%M')}_"
-            f"{ALLIANCE_INFORMATION.alliance_name.replace(' ', '-')}"
+            f"{alliance_name.replace(' ', '-')}"
         )
         with open(file_name + ".csv", "w", encoding="utf-8") as csv:
             csv.write("Lord ID,Name,Power,Merit\n")
@@ -7,16 +7,15 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from exporters import AbstractExporter
-from logic.logic import ALLIANCE_INFORMATION
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
 
 class GoogleSheetsExporter(AbstractExporter):
-    def export(self, user_data: dict[int, dict[str, int | str]]):
+    def export(self, user_data: dict[int, dict[str, int | str]], alliance_name: str):
         """
-        Exports given user data to Google Sheets.
+        Exports given user data to Google Sheets, to the sheet named after the alliance.
         Currently, does not support creating sheets, but will support it in the future.
         """
         creds = None
@@ -44,7 +43,7 @@ class GoogleSheetsExporter(AbstractExporter):
                 spreadsheetId=spreadsheet_id
             ).execute()
             for sheet in spreadsheet["sheets"]:
-                if sheet["properties"]["title"] == ALLIANCE_INFORMATION.alliance_name:
+                if sheet["properties"]["title"] == alliance_name:
                     alliance_sheet_max_range = sheet["properties"]["gridProperties"][
                         "columnCount"
                     ]
@@ -62,7 +61,7 @@ class GoogleSheetsExporter(AbstractExporter):
                 .get(
                     spreadsheetId=spreadsheet_id,
                     range=(
-                        f"{ALLIANCE_INFORMATION.alliance_name}!"
+                        f"{alliance_name}!"
                         f"A2:{column_count_to_column_letter(alliance_sheet_max_range)}"
                     ),
                     valueRenderOption="UNFORMATTED_VALUE",
@@ -119,7 +118,7 @@ class GoogleSheetsExporter(AbstractExporter):
             spreadsheet_service.values().update(
                 spreadsheetId=spreadsheet_id,
                 range=(
-                    f"{ALLIANCE_INFORMATION.alliance_name}!"
+                    f"{alliance_name}!"
                     f"A2:{column_count_to_column_letter(alliance_sheet_max_range + 4)}"
                 ),
                 body={"values": new_values},
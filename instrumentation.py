@@ -0,0 +1,169 @@
+"""
+Times the stages of a run with nested spans, e.g. captures, template matching
+and OCR, and reports them as histograms per stage, as time per rank and as
+folded stacks for flame graph tools.
+While the profiler is disabled, a span costs one attribute check.
+"""
+from contextlib import contextmanager
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import field
+import json
+import threading
+from time import perf_counter_ns
+from typing import Any, ContextManager, Iterator
+
+_DISABLED = nullcontext()
+
+
+@dataclass
+class _Frame:
+    name: str
+    # The time spent in nested spans, which is not the frame's own time.
+    children_ns: int = 0
+
+
+# The open spans of the current thread, innermost last.
+_FRAMES: ContextVar[tuple[_Frame, ...]] = ContextVar("profiler_frames", default=())
+# The rank the current thread works on, if any.
+_RANK: ContextVar[int | None] = ContextVar("profiler_rank", default=None)
+
+
+@dataclass
+class StageStatistics:
+    count: int = 0
+    total_ns: int = 0
+    max_ns: int = 0
+    # The count of durations by the power of two microseconds they are below.
+    histogram: dict[int, int] = field(default_factory=dict)
+
+    def add(self, duration_ns: int) -> None:
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+        bucket = 1 << (duration_ns // 1000).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns / 1e6,
+            "mean_ms": self.total_ns / self.count / 1e6,
+            "max_ms": self.max_ns / 1e6,
+            "histogram_us": {
+                f"<{bucket}": count for bucket, count in sorted(self.histogram.items())
+            },
+        }
+
+
+class Profiler:
+    """
+    Collects the durations of spans from all threads.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages: dict[str, StageStatistics] = {}
+        # The time of every stage within a rank, by rank.
+        self.ranks: dict[int, dict[str, int]] = {}
+        # The own time of every stack of span names, for flame graphs.
+        self.stacks: dict[tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str) -> ContextManager[None]:
+        """
+        Times the code in the with block as a stage, nested in the open spans.
+
+        Args:
+            name: The stage, e.g. "decode".
+
+        Returns:
+            The context manager, which does nothing while disabled.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._span(name)
+
+    def rank(self, rank: int) -> ContextManager[None]:
+        """
+        Attributes the spans in the with block to a rank, on the current thread.
+
+        Args:
+            rank: The rank that is worked on.
+
+        Returns:
+            The context manager, which does nothing while disabled.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._rank(rank)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns:
+            The statistics of every stage and the milliseconds per stage by rank.
+        """
+        with self._lock:
+            return {
+                "stages": {
+                    name: statistics.to_dict()
+                    for name, statistics in sorted(self.stages.items())
+                },
+                "ranks": {
+                    rank: {name: total / 1e6 for name, total in stages.items()}
+                    for rank, stages in sorted(self.ranks.items())
+                },
+            }
+
+    def write_report(self, path: str) -> None:
+        """
+        Writes the statistics as JSON to <path>.json and the stacks in the folded
+        format of flamegraph.pl and speedscope, in microseconds, to <path>.folded.
+
+        Args:
+            path: The path of the report without extension.
+        """
+        with open(f"{path}.json", "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        with self._lock, open(f"{path}.folded", "w", encoding="utf-8") as file:
+            for stack, own_ns in sorted(self.stacks.items()):
+                file.write(f"{';'.join(stack)} {own_ns // 1000}\n")
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        frames = _FRAMES.get() + (_Frame(name),)
+        token = _FRAMES.set(frames)
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = perf_counter_ns() - start
+            _FRAMES.reset(token)
+            if len(frames) > 1:
+                frames[-2].children_ns += duration
+            self._record(frames, duration)
+
+    @contextmanager
+    def _rank(self, rank: int) -> Iterator[None]:
+        token = _RANK.set(rank)
+        try:
+            yield
+        finally:
+            _RANK.reset(token)
+
+    def _record(self, frames: tuple[_Frame, ...], duration: int) -> None:
+        name = frames[-1].name
+        stack = tuple(frame.name for frame in frames)
+        rank = _RANK.get()
+        with self._lock:
+            self.stages.setdefault(name, StageStatistics()).add(duration)
+            self.stacks[stack] = (
+                self.stacks.get(stack, 0) + duration - frames[-1].children_ns
+            )
+            if rank is not None:
+                stages = self.ranks.setdefault(rank, {})
+                stages[name] = stages.get(name, 0) + duration
+
+
+PROFILER = Profiler()
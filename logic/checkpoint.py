@@ -0,0 +1,180 @@
+"""
+An append-only journal of a profile crawl, so an interrupted crawl can resume
+from its last committed rank instead of starting over.
+"""
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+import json
+import os
+import threading
+from typing import Any
+
+
+@dataclass
+class CrawlPosition:
+    """
+    Where the crawl is, right before it opens the profile of a rank.
+    """
+
+    rank: int
+    # The amount of scroll gestures since the top of the list.
+    scrolls: int
+    # The positions of the session's ListEntryCoordinates by name.
+    coordinates: dict[str, tuple[int, int]]
+
+
+@dataclass
+class Checkpoint:
+    """
+    The state of an interrupted crawl, read back from its journal.
+    """
+
+    own_position: int
+    # The last rank the crawl was assigned.
+    last_rank: int
+    position: CrawlPosition
+    # The fields read per rank.
+    rows: dict[int, dict[str, Any]] = field(default_factory=dict)
+
+
+class CheckpointJournal:
+    """
+    A JSON lines file of a crawl, written as the crawl goes on.
+    Every record is flushed to disk before the crawl continues, so a crash
+    loses at most the profiles which were still being read.
+    """
+
+    def __init__(self, path: str = "crawl_checkpoint.jsonl"):
+        """
+        Args:
+            path: The path of the journal file.
+        """
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(
+        self, alliance: str, own_position: int, last_rank: int, resume: bool = False
+    ) -> None:
+        """
+        Opens the journal for writing.
+
+        Args:
+            alliance: The name of the crawled alliance.
+            own_position: The rank of the current account, which is skipped.
+            last_rank: The last rank the crawl is assigned.
+            resume: Whether to append to the journal of an interrupted crawl
+                instead of starting a new one.
+        """
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if resume:
+            # Ends a line which was cut off, so the next record is readable.
+            self._file.write("\n")
+        else:
+            self._append(
+                {
+                    "type": "start",
+                    "alliance": alliance,
+                    "own_position": own_position,
+                    "last_rank": last_rank,
+                }
+            )
+
+    def record_position(self, position: CrawlPosition) -> None:
+        """
+        Records the position of the crawl before a rank is read.
+        """
+        self._append({"type": "position", **asdict(position)})
+
+    def record_row(self, rank: int, row: dict[str, Any]) -> None:
+        """
+        Records the fields read for a rank. Safe to call from worker threads.
+        """
+        self._append({"type": "row", "rank": rank, "row": row})
+
+    def complete(self) -> None:
+        """
+        Marks the crawl as finished, so it is not resumed, and closes the journal.
+        """
+        self._append({"type": "complete"})
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the journal, it can be resumed later.
+        """
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def load(self, alliance: str) -> Checkpoint | None:
+        """
+        Reads the journal of an interrupted crawl.
+        The crawl resumes at the first rank whose fields were not recorded,
+        or else at the last rank it reached.
+
+        Args:
+            alliance: The name of the alliance to crawl, other alliances'
+                journals are not resumed.
+
+        Returns:
+            The state to resume from, or None if there is nothing to resume.
+        """
+        if not os.path.isfile(self.path):
+            return None
+
+        own_position = last_rank = None
+        positions: dict[int, CrawlPosition] = {}
+        rows: dict[int, dict[str, Any]] = {}
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line is cut off if the crawl died while writing it.
+                    continue
+
+                match record.pop("type"):
+                    case "start":
+                        if record["alliance"] != alliance:
+                            return None
+                        own_position = record["own_position"]
+                        last_rank = record["last_rank"]
+                    case "position":
+                        # Retries of a rank record it again, but only the first
+                        # attempt has the coordinates the crawl expects.
+                        positions.setdefault(
+                            record["rank"],
+                            CrawlPosition(
+                                rank=record["rank"],
+                                scrolls=record["scrolls"],
+                                coordinates={
+                                    name: tuple(value)
+                                    for name, value in record["coordinates"].items()
+                                },
+                            ),
+                        )
+                    case "row":
+                        rows[record["rank"]] = record["row"]
+                    case "complete":
+                        return None
+
+        if own_position is None or not positions:
+            return None
+
+        missing = [rank for rank in sorted(positions) if rank not in rows]
+        position = positions[missing[0] if missing else max(positions)]
+        return Checkpoint(
+            own_position=own_position,
+            last_rank=last_rank,
+            position=position,
+            rows=rows,
+        )
+
+    def _append(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
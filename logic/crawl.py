@@ -0,0 +1,340 @@
+"""
+Opens the profile of every member in the rankings of the device's alliance.
+"""
+import constants
+from emulator.adb_integration import click
+from emulator.adb_integration import get_grayscale_screen
+from emulator.adb_integration import go_back
+from emulator.waiting import wait_for_screen_settled
+from emulator.waiting import wait_for_template
+from instrumentation import PROFILER
+from logic.checkpoint import Checkpoint
+from logic.checkpoint import CheckpointJournal
+from logic.checkpoint import CrawlPosition
+from logic.logic import copy_profile_name
+from logic.logic import go_to_rankings_interface_from_known_screens
+from logic.logic import leave_rankings_interface_return_current_screen
+from logic.logic import read_profile
+from logic.logic import read_profile_name
+from logic.logic import search_click_info_button
+from logic.session import DeviceSession
+from logic.session import ListEntryCoordinates
+from readers.ocr_service import OcrService
+from readers.pipeline import OcrPipeline
+from readers.screen import get_on_screen
+from readers.screen import read_numbers_at_bounding_box
+
+OCR_WORKERS = 2
+
+
+def open_rankings_interface(session: DeviceSession) -> bool:
+    """
+    Navigates to the alliance rankings on the current device,
+    reading the alliance's information on the way.
+
+    Args:
+        session: The session of the current device, its alliance is updated.
+
+    Returns:
+        Whether the device was on a known screen and the rankings opened.
+    """
+    image = get_grayscale_screen()
+    image, classification = leave_rankings_interface_return_current_screen(image=image)
+    if not go_to_rankings_interface_from_known_screens(
+        image=image,
+        classification=classification,
+        alliance_information=session.alliance,
+    ):
+        return False
+
+    wait_for_template(
+        get_grayscale_screen, constants.Images.RANKINGS_INTERFACE, replaces=0.5
+    )
+    return True
+
+
+def crawl_profiles(
+    session: DeviceSession,
+    journal: CheckpointJournal,
+    checkpoint: Checkpoint | None = None,
+    first_rank: int = 1,
+    last_rank: int | None = None,
+    ocr_service: OcrService | None = None,
+    own_position: int = 0,
+) -> dict[int, dict[str, int | str]]:
+    """
+    Opens the profile of every member in a range of the rankings,
+    one entry at a time, on the current device.
+
+    Args:
+        session: The session of the current device, on the rankings interface.
+        journal: Records the progress, to resume the crawl if it is interrupted.
+        checkpoint (optional): The state of an interrupted crawl to resume from.
+            Its rank range replaces the given one.
+        first_rank: The first rank to read.
+        last_rank (optional): The last rank to read. Defaults to the last member.
+        ocr_service (optional): Reads the profiles on its processes.
+            Defaults to reading them on threads of this process.
+        own_position (optional): The rank of the current account, which is
+            skipped. Defaults to reading it from the screen.
+
+    Raises:
+        ValueError: If the rank of the current account is not given
+            and can not be read.
+
+    Returns:
+        The name, power and merit of every member by lord ID.
+        Ranks whose profile could not be read are added to the session's
+        failed_ranks.
+    """
+    data = {}
+    member_count = session.alliance.current_members
+    if checkpoint:
+        own_position = checkpoint.own_position
+        last_rank = checkpoint.last_rank
+        position = checkpoint.position
+        print(
+            f"{session.name}: Resuming at rank {position.rank} "
+            f"with {len(checkpoint.rows)} members already read."
+        )
+    else:
+        # This may run on a device's thread, so it must not ask on stdin.
+        own_position = own_position or read_own_position(ask=False)
+        if not own_position:
+            raise ValueError("Could not read the rank of the current account.")
+        last_rank = last_rank or member_count
+        position = get_start_position(first_rank, own_position, member_count)
+
+    session.coordinates = ListEntryCoordinates.from_dict(position.coordinates)
+    replay_scrolls(session, position)
+    journal.start(
+        alliance=session.alliance.alliance_name,
+        own_position=own_position,
+        last_rank=last_rank,
+        resume=checkpoint is not None,
+    )
+
+    if ocr_service:
+        ocr_pipeline = OcrPipeline(
+            read_screen=lambda screen: ocr_service.read(screen, read_profile).result(),
+            workers=ocr_service.workers,
+            on_result=journal.record_row,
+        )
+    else:
+        ocr_pipeline = OcrPipeline(
+            read_screen=read_profile,
+            workers=OCR_WORKERS,
+            on_result=journal.record_row,
+        )
+    coordinates = session.coordinates
+    repeated_fail_count = 0
+    # Unknown until the first copy, the clipboard is read before it.
+    previous_name: str | None = None
+    current_rank = position.rank
+    scrolls = position.scrolls
+    completed = True
+    while current_rank <= last_rank:
+        # Everything timed in an iteration is attributed to its rank.
+        with PROFILER.rank(current_rank), PROFILER.span("rank"):
+            bottom_of_list = is_bottom_of_list(current_rank, own_position, member_count)
+
+            if current_rank == own_position:
+                current_rank += 1
+                coordinates.increase_by_one_entry()
+                continue
+
+            journal.record_position(
+                CrawlPosition(
+                    rank=current_rank,
+                    scrolls=scrolls,
+                    coordinates=coordinates.to_dict(),
+                )
+            )
+
+            if bottom_of_list and repeated_fail_count == 0:
+                coordinates.increase_by_one_entry()
+
+            click(coordinates.list_entry)
+            list_image = wait_for_template(
+                get_grayscale_screen,
+                constants.Images.INFO_BUTTON,
+                timeout=2,
+                replaces=1,
+            )
+
+            if bottom_of_list:
+                search_click_info_button(
+                    image=list_image, fallback=coordinates.info_button
+                )
+            else:
+                click(coordinates.info_button)
+
+            image = wait_for_template(
+                get_grayscale_screen, constants.Images.COPY_NAME, timeout=2, replaces=1
+            )
+            copy_name_position = (
+                get_on_screen(image, template=constants.Images.COPY_NAME)
+                if image is not None
+                else None
+            )
+            if not copy_name_position:
+                # TODO Make more effort to re-jump into the rankings,
+                #   depending on INFO button or profile on screen.
+                if repeated_fail_count == 5:
+                    print(f"Failed to read rank {current_rank} 5 times, exiting.")
+                    completed = False
+                    break
+
+                print(
+                    "Could not read the name of the user "
+                    f"at rank {current_rank}. Retrying."
+                )
+                repeated_fail_count += 1
+                continue
+
+            repeated_fail_count = 0
+            # Only names the OCR is unsure about are copied, which takes three
+            # more round-trips to the device.
+            name = read_profile_name(image, copy_name_position)
+            if name is None:
+                name = previous_name = copy_profile_name(
+                    copy_name_position, previous_name
+                )
+
+            # The profile is read on a worker while we continue with the next rank.
+            ocr_pipeline.submit(current_rank, image, name=name)
+
+            go_back()
+            list_image = wait_for_template(
+                get_grayscale_screen,
+                constants.Images.COPY_NAME,
+                present=False,
+                timeout=1,
+                replaces=0.1,
+            )
+
+            if bottom_of_list:
+                current_rank += 1
+                continue
+
+            # The tracker measures each scroll and corrects the next one,
+            # so the list does not drift away from the entry positions.
+            session.tracker.scroll(
+                rows=1, start=coordinates.list_entry_middle, before=list_image
+            )
+            scrolls += 1
+            current_rank += 1
+
+    profiles = {**(checkpoint.rows if checkpoint else {}), **ocr_pipeline.close()}
+    session.failed_ranks.update(ocr_pipeline.failures)
+    if completed:
+        journal.complete()
+    else:
+        journal.close()
+    for profile in profiles.values():
+        data[profile["lord_id"]] = {
+            "name": profile["name"],
+            "power": profile["power"],
+            "merit": profile["merit"],
+        }
+
+    return data
+
+
+def is_bottom_of_list(rank: int, own_position: int, member_count: int) -> bool:
+    """
+    Checks if a rank is in the last entries, which cannot be scrolled to the top.
+
+    Args:
+        rank: The rank to check.
+        own_position: The rank of the current account.
+        member_count: The amount of members in the alliance.
+
+    Returns:
+        Whether the list entry has to be found further down instead of scrolling.
+    """
+    last = own_position >= member_count - 5
+    return rank >= member_count - (3 if last else 4)
+
+
+def get_start_position(
+    rank: int, own_position: int, member_count: int
+) -> CrawlPosition:
+    """
+    Calculates where a crawl starting at the top would be when it reaches a rank.
+
+    Args:
+        rank: The rank to start at.
+        own_position: The rank of the current account.
+        member_count: The amount of members in the alliance.
+
+    Returns:
+        The scrolls and coordinates needed to read the rank.
+    """
+    coordinates = ListEntryCoordinates()
+    scrolls = 0
+    for passed_rank in range(1, rank):
+        if passed_rank == own_position or is_bottom_of_list(
+            passed_rank, own_position, member_count
+        ):
+            coordinates.increase_by_one_entry()
+            continue
+
+        scrolls += 1
+
+    return CrawlPosition(
+        rank=rank,
+        scrolls=scrolls,
+        coordinates=coordinates.to_dict(),
+    )
+
+
+def read_own_position(ask: bool = True) -> int:
+    """
+    Reads the rank of the current account from the rankings interface,
+    or asks for it if it cannot be read.
+
+    Args:
+        ask: Whether to ask for the rank on stdin if it can not be read.
+            Only the main thread should ask, prompts of several devices mix up.
+
+    Returns:
+        The rank of the current account, 0 if it could not be read and was not
+        asked for.
+    """
+    image = wait_for_screen_settled(get_grayscale_screen, replaces=0)
+    own_position = 0
+    own_entry_coordinates = get_on_screen(
+        image=image, template=constants.Images.OWN_POSITION
+    )
+    if own_entry_coordinates:
+        own_position = read_numbers_at_bounding_box(
+            image=image,
+            bounding_box=constants.BoundingBoxes.OWN_POSITION.clone().add(
+                own_entry_coordinates.x, own_entry_coordinates.y
+            ),
+        )
+        print(f"Position in the rankings of the current account is {own_position}.")
+
+    if own_position == 0 and ask:
+        own_position = int(
+            input("Could not read the current rank of the account. Please enter it: ")
+        )
+    return own_position
+
+
+def replay_scrolls(session: DeviceSession, position: CrawlPosition) -> None:
+    """
+    Scrolls the rankings list from the top to a position of a crawl,
+    a page at a time.
+
+    Args:
+        session: The session of the current device.
+        position: The position to scroll to.
+    """
+    page = constants.Offsets.VISIBLE_LIST_ENTRIES - 1
+    remaining = position.scrolls
+    while remaining:
+        rows = min(page, remaining)
+        session.tracker.scroll(rows=rows)
+        remaining -= rows
@@ -0,0 +1,301 @@
+"""
+A local store of known members, to find a list row's lord ID without opening
+the member's profile again on the next run.
+"""
+from dataclasses import dataclass
+import sqlite3
+from time import time
+
+from readers.image_hash import get_hash_distance
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+@dataclass
+class Identity:
+    lord_id: int
+    name: str
+    rank: int
+    power: int
+    # The difference hash of the name in the rankings list.
+    name_hash: int
+    last_seen: float
+    # The name as read from the rankings list, which may differ from the profile.
+    list_name: str = ""
+
+
+@dataclass
+class SnapshotRow:
+    """
+    A row of the rankings list as seen in a previous scan.
+    """
+
+    rank: int
+    lord_id: int
+    name: str
+    power: int
+    # The difference hash of the whole row's image.
+    row_hash: int
+
+
+class IdentityStore:
+    """
+    Members by lord ID in a SQLite database, matched to list rows by their name.
+    The hash of the name's image only tells apart members with the same name,
+    as the hashes of short names are alike.
+    """
+
+    def __init__(
+        self,
+        path: str = "identities.sqlite3",
+        ttl_days: float = 30,
+        max_hash_distance: int = 4,
+        force_refresh: bool = False,
+    ):
+        """
+        Args:
+            path: The path of the database file, created if it does not exist.
+            ttl_days: Members not seen for this long are removed.
+            max_hash_distance: How many bits a name hash may differ to tell
+                apart members with the same name.
+            force_refresh: Find no members, so every profile is opened again.
+                Members are still stored.
+        """
+        self.max_hash_distance = max_hash_distance
+        self.force_refresh = force_refresh
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS identities ("
+            "lord_id INTEGER PRIMARY KEY, "
+            "name TEXT NOT NULL, "
+            "rank INTEGER NOT NULL, "
+            "power INTEGER NOT NULL, "
+            "name_hash TEXT NOT NULL, "
+            "last_seen REAL NOT NULL, "
+            "list_name TEXT NOT NULL DEFAULT '')"
+        )
+        columns = {
+            column[1]
+            for column in self._connection.execute("PRAGMA table_info(identities)")
+        }
+        if "list_name" not in columns:
+            self._connection.execute(
+                "ALTER TABLE identities "
+                "ADD COLUMN list_name TEXT NOT NULL DEFAULT ''"
+            )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "alliance TEXT NOT NULL, "
+            "rank INTEGER NOT NULL, "
+            "lord_id INTEGER NOT NULL, "
+            "name TEXT NOT NULL, "
+            "power INTEGER NOT NULL, "
+            "row_hash TEXT NOT NULL, "
+            "PRIMARY KEY (alliance, rank))"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS departures ("
+            "alliance TEXT NOT NULL, "
+            "lord_id INTEGER NOT NULL, "
+            "departed_at REAL NOT NULL, "
+            "PRIMARY KEY (alliance, lord_id))"
+        )
+        self._identities = {
+            identity.lord_id: identity for identity in self._load_identities()
+        }
+        self.evict_older_than(ttl_days)
+
+    def find(self, name: str, name_hash: int) -> Identity | None:
+        """
+        Finds the only member with the name read from the list. If several members
+        have that name, the only one whose name hash is close enough is taken.
+        A close name hash alone is no match, short names hash alike.
+
+        Args:
+            name: The name as read from the list.
+            name_hash: The difference hash of the name's image.
+
+        Returns:
+            The member or None if there is no unambiguous match.
+        """
+        if self.force_refresh:
+            return None
+
+        matches = [
+            identity
+            for identity in self._identities.values()
+            if name and name in (identity.name, identity.list_name)
+        ]
+        if len(matches) > 1:
+            matches = [
+                identity
+                for identity in matches
+                if get_hash_distance(identity.name_hash, name_hash)
+                <= self.max_hash_distance
+            ]
+
+        if len(matches) != 1:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return matches[0]
+
+    def remember(
+        self,
+        lord_id: int,
+        name: str,
+        rank: int,
+        power: int,
+        name_hash: int,
+        list_name: str = "",
+    ) -> None:
+        """
+        Stores a member or updates it, as seen now.
+
+        Args:
+            lord_id: The member's lord ID.
+            name: The member's name.
+            rank: The member's rank in the alliance.
+            power: The member's power.
+            name_hash: The difference hash of the name's image in the list.
+            list_name (optional): The name as read from the list.
+        """
+        identity = Identity(
+            lord_id=lord_id,
+            name=name,
+            rank=rank,
+            power=power,
+            name_hash=name_hash,
+            last_seen=time(),
+            list_name=list_name,
+        )
+        self._identities[lord_id] = identity
+        self._connection.execute(
+            "INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                identity.lord_id,
+                identity.name,
+                identity.rank,
+                identity.power,
+                f"{identity.name_hash:x}",
+                identity.last_seen,
+                identity.list_name,
+            ),
+        )
+        self._connection.commit()
+
+    def evict_older_than(self, days: float) -> int:
+        """
+        Removes members that were not seen for the given time.
+
+        Args:
+            days: The time in days.
+
+        Returns:
+            The amount of removed members.
+        """
+        oldest_last_seen = time() - days * SECONDS_PER_DAY
+        self._identities = {
+            lord_id: identity
+            for lord_id, identity in self._identities.items()
+            if identity.last_seen >= oldest_last_seen
+        }
+        cursor = self._connection.execute(
+            "DELETE FROM identities WHERE last_seen < ?", (oldest_last_seen,)
+        )
+        self._connection.commit()
+        return cursor.rowcount
+
+    def get_snapshot(self, alliance: str) -> dict[int, SnapshotRow]:
+        """
+        Get the rankings list of an alliance as saved by the last scan.
+
+        Args:
+            alliance: The name of the alliance.
+
+        Returns:
+            The rows by rank, empty if the alliance was not scanned yet.
+        """
+        return {
+            rank: SnapshotRow(
+                rank=rank,
+                lord_id=lord_id,
+                name=name,
+                power=power,
+                row_hash=int(row_hash, 16),
+            )
+            for rank, lord_id, name, power, row_hash in self._connection.execute(
+                "SELECT rank, lord_id, name, power, row_hash "
+                "FROM snapshots WHERE alliance = ?",
+                (alliance,),
+            )
+        }
+
+    def save_snapshot(self, alliance: str, rows: dict[int, SnapshotRow]) -> None:
+        """
+        Replaces the saved rankings list of an alliance.
+
+        Args:
+            alliance: The name of the alliance.
+            rows: The rows by rank.
+        """
+        self._connection.execute(
+            "DELETE FROM snapshots WHERE alliance = ?", (alliance,)
+        )
+        self._connection.executemany(
+            "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    alliance,
+                    row.rank,
+                    row.lord_id,
+                    row.name,
+                    row.power,
+                    f"{row.row_hash:x}",
+                )
+                for row in rows.values()
+            ],
+        )
+        self._connection.commit()
+
+    def mark_departed(self, alliance: str, lord_ids: list[int]) -> None:
+        """
+        Records members which are not in the alliance anymore.
+
+        Args:
+            alliance: The name of the alliance.
+            lord_ids: The lord IDs of the departed members.
+        """
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO departures VALUES (?, ?, ?)",
+            [(alliance, lord_id, time()) for lord_id in lord_ids],
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database.
+        """
+        self._connection.close()
+
+    def _load_identities(self) -> list[Identity]:
+        return [
+            Identity(
+                lord_id=lord_id,
+                name=name,
+                rank=rank,
+                power=power,
+                name_hash=int(name_hash, 16),
+                last_seen=last_seen,
+                list_name=list_name,
+            )
+            for lord_id, name, rank, power, name_hash, last_seen, list_name in (
+                self._connection.execute(
+                    "SELECT lord_id, name, rank, power, name_hash, last_seen, "
+                    "list_name FROM identities"
+                )
+            )
+        ]
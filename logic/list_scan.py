@@ -0,0 +1,499 @@
+"""
+Reads the rankings list page by page, instead of opening every member's profile.
+Profiles are only opened for members whose lord ID is not known yet.
+
+Check the row bounding boxes on a recorded frame of the rankings list with
+    python -m logic.list_scan <frame.png> <output.png>
+which draws them on the frame and prints the rows read with them.
+"""
+import argparse
+from dataclasses import dataclass
+from dataclasses import field
+import os
+
+import cv2
+import dotenv
+from numpy import ndarray
+from pytesseract import pytesseract
+
+import constants
+from emulator.adb_integration import click
+from emulator.adb_integration import get_grayscale_screen
+from emulator.adb_integration import go_back
+from emulator.waiting import wait_for_screen_settled
+from emulator.waiting import wait_for_template
+from logic.identity_store import IdentityStore
+from logic.identity_store import SnapshotRow
+from logic.list_tracker import ListTracker
+from logic.logic import copy_profile_name
+from logic.logic import read_profile
+from logic.logic import read_profile_name
+from logic.logic import search_click_info_button
+from readers.image_hash import get_difference_hash
+from readers.image_hash import get_hash_distance
+from readers.screen import BoundingBox
+from readers.screen import Coordinate
+from readers.screen import crop
+from readers.screen import get_on_screen
+from readers.screen import read_at_bounding_boxes
+from readers.screen import read_numbers_at_bounding_boxes
+
+
+@dataclass
+class ListRow:
+    """
+    A member as shown in the rankings list.
+    """
+
+    rank: int
+    name: str
+    power: int
+    # The position of the row on the current page, 0 being the top.
+    index: int
+    # The difference hash of the name's image, to recognize the member again.
+    name_hash: int = 0
+    # The difference hash of the whole row's image, to notice changes.
+    row_hash: int = 0
+
+
+@dataclass
+class ListScanStatistics:
+    pages: int = 0
+    rows: int = 0
+    profiles_opened: int = 0
+    profiles_avoided: int = 0
+
+
+@dataclass
+class ListScanResult:
+    # The name, power and merit of every member by lord ID.
+    members: dict[int, dict[str, int | str]] = field(default_factory=dict)
+    # The rows seen, by rank.
+    snapshot: dict[int, SnapshotRow] = field(default_factory=dict)
+    # The lord IDs of the previous snapshot which were not seen anymore.
+    # Only known if the scan is complete.
+    departed: list[int] = field(default_factory=list)
+    # The ranks that were not read, e.g. as their profile did not open.
+    missing_ranks: list[int] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        """
+        Returns:
+            Whether every rank of the alliance was read.
+        """
+        return not self.missing_ranks
+
+
+# How many bits the hash of an unchanged row may differ by, e.g. due to highlights.
+MAX_ROW_HASH_DISTANCE = 2
+# How often back is pressed to close what covers the rankings list.
+MAX_BACK_PRESSES = 3
+
+
+class ListLostError(Exception):
+    """
+    The rankings list could not be brought back, e.g. after a profile
+    did not open.
+    """
+
+
+def get_row_bounding_box(bounding_box: BoundingBox, index: int) -> BoundingBox:
+    """
+    Moves a bounding box of the first visible row to another visible row.
+
+    Args:
+        bounding_box: The bounding box in the first visible row.
+        index: The position of the row on the page, 0 being the top.
+
+    Returns:
+        A new bounding box in the given row.
+    """
+    return bounding_box.clone().add(0, index * constants.Offsets.ENTRY_DISTANCE)
+
+
+def get_row_coordinate(coordinate: Coordinate, index: int) -> Coordinate:
+    """
+    Moves a coordinate of the first visible row to another visible row.
+
+    Args:
+        coordinate: The coordinate in the first visible row.
+        index: The position of the row on the page, 0 being the top.
+
+    Returns:
+        A new coordinate in the given row.
+    """
+    return coordinate.clone().add(0, index * constants.Offsets.ENTRY_DISTANCE)
+
+
+def get_row_area() -> BoundingBox:
+    """
+    Get the area of the first visible row that contains its fields.
+
+    Returns:
+        The bounding box around rank, name and power of the first row.
+    """
+    fields = (
+        constants.BoundingBoxes.LIST_ROW_RANK,
+        constants.BoundingBoxes.LIST_ROW_NAME,
+        constants.BoundingBoxes.LIST_ROW_POWER,
+    )
+    return BoundingBox(
+        min_x=min(bounding_box.min_x for bounding_box in fields),
+        min_y=min(bounding_box.min_y for bounding_box in fields),
+        max_x=max(bounding_box.max_x for bounding_box in fields),
+        max_y=max(bounding_box.max_y for bounding_box in fields),
+    )
+
+
+def read_visible_rows(image: ndarray, y_offset: int = 0) -> list[ListRow]:
+    """
+    Reads all rows visible in the rankings list,
+    with one OCR call for the numbers and one for the names.
+
+    Args:
+        image: Image of the rankings list.
+        y_offset: The pixels the rows are moved down from their usual positions.
+
+    Returns:
+        The rows whose rank could be read, from top to bottom.
+    """
+    indices = range(constants.Offsets.VISIBLE_LIST_ENTRIES)
+    numbers = read_numbers_at_bounding_boxes(
+        image,
+        {
+            f"{field}_{index}": get_row_bounding_box(bounding_box, index).add(
+                0, y_offset
+            )
+            for index in indices
+            for field, bounding_box in (
+                ("rank", constants.BoundingBoxes.LIST_ROW_RANK),
+                ("power", constants.BoundingBoxes.LIST_ROW_POWER),
+            )
+        },
+    )
+    name_bounding_boxes = {
+        f"name_{index}": get_row_bounding_box(
+            constants.BoundingBoxes.LIST_ROW_NAME, index
+        ).add(0, y_offset)
+        for index in indices
+    }
+    names = read_at_bounding_boxes(image, name_bounding_boxes, character_whitelist=None)
+    return [
+        ListRow(
+            rank=numbers[f"rank_{index}"],
+            name=names[f"name_{index}"],
+            power=numbers[f"power_{index}"],
+            index=index,
+            name_hash=get_difference_hash(
+                crop(image, name_bounding_boxes[f"name_{index}"])
+            ),
+            row_hash=get_difference_hash(
+                crop(
+                    image,
+                    get_row_bounding_box(get_row_area(), index).add(0, y_offset),
+                )
+            ),
+        )
+        for index in indices
+        if numbers[f"rank_{index}"]
+    ]
+
+
+def open_profile(
+    row: ListRow, previous_name: str | None
+) -> tuple[dict[str, int | str] | None, str | None]:
+    """
+    Opens the profile of a visible row, reads it and returns to the list.
+
+    Args:
+        row: The row to open the profile of.
+        previous_name (optional): The name copied last, which may still be in the
+            clipboard, None if nothing was copied yet.
+
+    Raises:
+        ListLostError: If the rankings list was not shown again afterwards.
+
+    Returns:
+        The name, lord ID, power and merit of the member,
+        or None if the profile did not open, and the name copied last after it.
+    """
+    click(get_row_coordinate(constants.Coordinates.LIST_ENTRY, row.index))
+    list_image = wait_for_template(
+        get_grayscale_screen, constants.Images.INFO_BUTTON, timeout=2, replaces=1
+    )
+    search_click_info_button(
+        image=list_image,
+        fallback=get_row_coordinate(constants.Coordinates.INFO_BUTTON, row.index),
+    )
+
+    image = wait_for_template(
+        get_grayscale_screen, constants.Images.COPY_NAME, timeout=2, replaces=1
+    )
+    copy_name_position = (
+        get_on_screen(image, template=constants.Images.COPY_NAME)
+        if image is not None
+        else None
+    )
+    if not copy_name_position:
+        # A popup or a half open profile may cover the list.
+        return_to_rankings_list(image)
+        return None, previous_name
+
+    name = read_profile_name(image, copy_name_position)
+    if name is None:
+        name = previous_name = copy_profile_name(copy_name_position, previous_name)
+    profile = {"name": name or row.name, **read_profile(image)}
+
+    go_back()
+    list_image = wait_for_template(
+        get_grayscale_screen,
+        constants.Images.COPY_NAME,
+        present=False,
+        timeout=1,
+        replaces=0.1,
+    )
+    return_to_rankings_list(list_image)
+    return profile, previous_name
+
+
+def is_rankings_list(image: ndarray) -> bool:
+    """
+    Checks if the rankings list is shown without anything covering it.
+
+    Args:
+        image: Image of the current screen.
+
+    Returns:
+        Whether the list is shown, without a profile or the popup of a row.
+    """
+    return (
+        get_on_screen(image=image, template=constants.Images.RANKINGS_INTERFACE)
+        is not None
+        and get_on_screen(image=image, template=constants.Images.COPY_NAME) is None
+        and get_on_screen(image=image, template=constants.Images.INFO_BUTTON) is None
+    )
+
+
+def return_to_rankings_list(image: ndarray | None = None) -> ndarray:
+    """
+    Presses back until the rankings list is shown again.
+
+    Args:
+        image (optional): Image of the current screen. Captured if not given.
+
+    Raises:
+        ListLostError: If the list was not shown after MAX_BACK_PRESSES.
+
+    Returns:
+        Image of the rankings list.
+    """
+    if image is None:
+        image = get_grayscale_screen()
+    for _ in range(MAX_BACK_PRESSES):
+        if is_rankings_list(image):
+            return image
+        go_back()
+        image = wait_for_screen_settled(
+            get_grayscale_screen, previous=image, replaces=0.5
+        )
+    if is_rankings_list(image):
+        return image
+    raise ListLostError(
+        f"The rankings list was not shown after pressing back {MAX_BACK_PRESSES} "
+        "times."
+    )
+
+
+def scan_rankings_list(
+    member_count: int,
+    identity_store: IdentityStore | None = None,
+    previous_snapshot: dict[int, SnapshotRow] | None = None,
+    statistics: ListScanStatistics | None = None,
+    tracker: ListTracker | None = None,
+    own_position: int = 0,
+) -> ListScanResult:
+    """
+    Reads the rankings list from the top, a page at a time.
+    Rows seen on a previous page are skipped.
+    With a previous snapshot, unchanged rows keep the lord ID and name of the
+    snapshot. New or changed rows are looked up in the identity store, and only the
+    profiles of members found in neither are opened.
+
+    Args:
+        member_count: The amount of members in the alliance.
+        identity_store (optional): Known members, whose profiles are not opened.
+            Opened profiles are added to it. Defaults to opening every profile.
+        previous_snapshot (optional): The rows of the last scan by rank,
+            to not look up unchanged rows.
+        statistics (optional): Counts pages, rows and opened profiles.
+        tracker (optional): Scrolls the pages and corrects their drift.
+        own_position (optional): The rank of the current account, whose row
+            does not open a profile and is skipped.
+
+    Returns:
+        The members by lord ID, the rows seen by rank and the ranks not seen.
+        Departed members are only determined if every rank was seen.
+        The scan stops early if the list can not be brought back after a profile.
+    """
+    statistics = statistics or ListScanStatistics()
+    tracker = tracker or ListTracker()
+    result = ListScanResult()
+    previous_name: str | None = None
+    image = get_grayscale_screen()
+    list_lost = False
+    while not list_lost and len(result.snapshot) < member_count - (
+        1 if own_position else 0
+    ):
+        statistics.pages += 1
+        new_rows = [
+            row
+            for row in read_visible_rows(image, y_offset=-tracker.offset)
+            if row.rank not in result.snapshot and row.rank != own_position
+        ]
+        if not new_rows:
+            break
+
+        for row in new_rows:
+            statistics.rows += 1
+            member = find_unchanged_member(row, previous_snapshot)
+            # Rows below a member who moved change rank, so changed rows are
+            # looked up too, and only members neither unchanged nor known are
+            # opened.
+            if not member and identity_store:
+                identity = identity_store.find(name=row.name, name_hash=row.name_hash)
+                if identity:
+                    member = {
+                        "lord_id": identity.lord_id,
+                        "name": identity.name,
+                        "power": row.power,
+                        "merit": 0,
+                    }
+
+            if not member:
+                statistics.profiles_opened += 1
+                try:
+                    member, previous_name = open_profile(row, previous_name)
+                except ListLostError as error:
+                    # Tapping on whatever is shown would not read the list.
+                    print(f"{error} Stopping the scan.")
+                    list_lost = True
+                    break
+                if not member:
+                    print(
+                        f"Could not open the profile of rank {row.rank}, skipping it."
+                    )
+                    continue
+
+            result.members[member["lord_id"]] = {
+                "name": member["name"],
+                "power": member["power"],
+                "merit": member["merit"],
+            }
+            result.snapshot[row.rank] = SnapshotRow(
+                rank=row.rank,
+                lord_id=member["lord_id"],
+                name=member["name"],
+                power=row.power,
+                row_hash=row.row_hash,
+            )
+            if identity_store:
+                identity_store.remember(
+                    lord_id=member["lord_id"],
+                    name=member["name"],
+                    rank=row.rank,
+                    power=member["power"],
+                    name_hash=row.name_hash,
+                    list_name=row.name,
+                )
+
+        if list_lost:
+            break
+        # Consecutive pages overlap by one row, so none is skipped.
+        image = tracker.scroll(rows=constants.Offsets.VISIBLE_LIST_ENTRIES - 1)
+
+    statistics.profiles_avoided = statistics.rows - statistics.profiles_opened
+    result.missing_ranks = sorted(
+        set(range(1, member_count + 1)) - result.snapshot.keys() - {own_position}
+    )
+    # Members on ranks that were not seen may still be there.
+    if previous_snapshot and result.complete:
+        seen_lord_ids = {row.lord_id for row in result.snapshot.values()}
+        result.departed = sorted(
+            {row.lord_id for row in previous_snapshot.values()} - seen_lord_ids
+        )
+    return result
+
+
+def find_unchanged_member(
+    row: ListRow, previous_snapshot: dict[int, SnapshotRow] | None
+) -> dict[str, int | str] | None:
+    """
+    Checks if a row looks the same as in the previous scan.
+
+    Args:
+        row: The row as read now.
+        previous_snapshot (optional): The rows of the last scan by rank.
+
+    Returns:
+        The member of the unchanged row, or None if the row is new or changed.
+    """
+    previous_row = previous_snapshot.get(row.rank) if previous_snapshot else None
+    if (
+        not previous_row
+        or previous_row.power != row.power
+        or get_hash_distance(previous_row.row_hash, row.row_hash)
+        > MAX_ROW_HASH_DISTANCE
+    ):
+        return None
+
+    return {
+        "lord_id": previous_row.lord_id,
+        "name": previous_row.name,
+        "power": row.power,
+        "merit": 0,
+    }
+
+
+def draw_row_bounding_boxes(image: ndarray) -> ndarray:
+    """
+    Draws the bounding boxes of the fields of every visible row on a frame.
+
+    Args:
+        image: Image of the rankings list.
+
+    Returns:
+        A color copy of the image, with rank in red, name in green and power in blue.
+    """
+    annotated = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    for index in range(constants.Offsets.VISIBLE_LIST_ENTRIES):
+        for bounding_box, color in (
+            (constants.BoundingBoxes.LIST_ROW_RANK, (0, 0, 255)),
+            (constants.BoundingBoxes.LIST_ROW_NAME, (0, 255, 0)),
+            (constants.BoundingBoxes.LIST_ROW_POWER, (255, 0, 0)),
+        ):
+            row_bounding_box = get_row_bounding_box(bounding_box, index)
+            cv2.rectangle(
+                annotated,
+                (row_bounding_box.min_x, row_bounding_box.min_y),
+                (row_bounding_box.max_x - 1, row_bounding_box.max_y - 1),
+                color,
+            )
+    return annotated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("frame", help="A capture of the rankings list.")
+    parser.add_argument("output", help="Where to write the frame with the boxes.")
+    arguments = parser.parse_args()
+
+    dotenv.load_dotenv(".env")
+    pytesseract.tesseract_cmd = os.getenv("TESSERACT_BINARY")
+    frame = cv2.imread(arguments.frame, cv2.IMREAD_GRAYSCALE)
+    cv2.imwrite(arguments.output, draw_row_bounding_boxes(frame))
+    for visible_row in read_visible_rows(frame):
+        print(
+            f"{visible_row.index}: rank {visible_row.rank}, "
+            f"name {visible_row.name!r}, power {visible_row.power}"
+        )
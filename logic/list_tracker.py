@@ -0,0 +1,165 @@
+"""
+Measures how far the rankings list actually scrolled, from the frames before and
+after a gesture, and corrects the next gesture by the difference.
+"""
+import cv2
+import numpy
+from numpy import ndarray
+
+import constants
+from emulator.adb_integration import get_grayscale_screen
+from emulator.adb_integration import scroll_low_level
+from emulator.waiting import wait_for_screen_settled
+from readers.screen import BoundingBox
+from readers.screen import Coordinate
+from readers.screen import crop
+
+# The list rows repeat every entry, so the displacement is first searched only
+# this far around the expected one, less than half an entry.
+MEASURE_MARGIN = 35
+# The normalized correlation below which a measurement is not trusted,
+# e.g. when the end of the list was reached or a dialog covers it.
+MIN_CONFIDENCE = 0.5
+# The confidence of content that only moved, below it the whole scroll is searched.
+EXACT_CONFIDENCE = 0.99
+# How much of the difference to the last measurement is learned per scroll.
+SLOP_LEARNING_RATE = 0.5
+
+
+def get_edge_profile(image: ndarray, bounding_box: BoundingBox) -> ndarray:
+    """
+    Sums the horizontal edges of an area per row, e.g. row separators and text.
+
+    Args:
+        image: The grayscale image.
+        bounding_box: The area to profile.
+
+    Returns:
+        The edge strength per pixel row of the area, as float32.
+    """
+    area = crop(image, bounding_box).astype(numpy.int16)
+    return numpy.abs(numpy.diff(area, axis=0)).sum(axis=1, dtype=numpy.float32)
+
+
+def measure_scroll(
+    before: ndarray,
+    after: ndarray,
+    expected: int,
+    bounding_box: BoundingBox | None = None,
+    lowest: int | None = None,
+) -> tuple[int, float] | None:
+    """
+    Measures how many pixels the list content moved up between two frames,
+    by matching the edge profile of the later frame in the earlier one.
+
+    Args:
+        before: The frame before scrolling.
+        after: The frame after scrolling.
+        expected: The expected displacement in pixels.
+        bounding_box (optional): The list area. Defaults to BoundingBoxes.LIST.
+        lowest (optional): The smallest displacement searched, e.g. 0 at the end
+            of the list. Defaults to MEASURE_MARGIN below the expected one.
+
+    Returns:
+        The displacement and the confidence of the match,
+        or None if the displacement is outside of the searched range.
+    """
+    bounding_box = bounding_box or constants.BoundingBoxes.LIST
+    before_profile = get_edge_profile(before, bounding_box)
+    after_profile = get_edge_profile(after, bounding_box)
+
+    lowest = max(expected - MEASURE_MARGIN if lowest is None else lowest, 0)
+    highest = expected + MEASURE_MARGIN
+    # The top of the later frame was at most `highest` pixels further down before.
+    template_length = len(after_profile) - highest
+    if template_length < MEASURE_MARGIN:
+        return None
+
+    scores = cv2.matchTemplate(
+        before_profile[lowest:, numpy.newaxis],
+        after_profile[:template_length, numpy.newaxis],
+        cv2.TM_CCOEFF_NORMED,
+    )
+    _, confidence, _, (_, position) = cv2.minMaxLoc(scores)
+    return lowest + position, confidence
+
+
+class ListTracker:
+    """
+    Scrolls the rankings list by whole entries.
+    The list moves less than the finger by a roughly constant slop, which is
+    learned from the measured displacements. Any remaining error is added to the
+    next gesture, so it does not add up over many scrolls.
+    """
+
+    def __init__(self, slop: float | None = None):
+        """
+        Args:
+            slop (optional): The initial pixels the finger moves without the list
+                following. Defaults to the slop of the original one entry gesture.
+        """
+        self.slop = (
+            slop
+            if slop is not None
+            else (
+                constants.Coordinates.LIST_ENTRY_MIDDLE.y
+                - constants.Coordinates.LIST_ENTRY_MIDDLE_UP.y
+                - constants.Offsets.ENTRY_DISTANCE
+            )
+        )
+        # How many pixels the list is scrolled further than the entries asked for.
+        self.offset = 0
+        self.scrolls = 0
+        self.unmeasured = 0
+
+    def scroll(
+        self,
+        rows: int,
+        start: Coordinate | None = None,
+        before: ndarray | None = None,
+    ) -> ndarray:
+        """
+        Scrolls the list up by entries and measures where it ended up.
+
+        Args:
+            rows: The amount of entries to scroll, fewer than are visible.
+            start (optional): Where to begin swiping. Defaults to the middle of
+                the last entry that is scrolled out of view.
+            before (optional): The current frame, if it was already captured.
+
+        Returns:
+            The settled frame after scrolling.
+        """
+        desired = rows * constants.Offsets.ENTRY_DISTANCE - self.offset
+        travel = round(desired + self.slop)
+        start = start or constants.Coordinates.LIST_ENTRY_MIDDLE.clone().add(
+            0, (rows - 1) * constants.Offsets.ENTRY_DISTANCE
+        )
+
+        if before is None:
+            before = get_grayscale_screen()
+        scroll_low_level(start, start.clone().add(0, -travel), previous=before)
+        after = wait_for_screen_settled(get_grayscale_screen, previous=before)
+        self.scrolls += 1
+
+        measurement = measure_scroll(before, after, expected=desired)
+        if measurement is not None and measurement[1] < EXACT_CONFIDENCE:
+            # The end of the list stops it short of the expected displacement,
+            # where the repeating rows still match roughly.
+            measurement = measure_scroll(before, after, expected=desired, lowest=0)
+        if measurement is None or measurement[1] < MIN_CONFIDENCE:
+            self.unmeasured += 1
+            return after
+
+        moved = measurement[0]
+        self.offset += moved - rows * constants.Offsets.ENTRY_DISTANCE
+        # A stop at the end of the list says nothing about the slop.
+        if abs(moved - desired) <= MEASURE_MARGIN:
+            self.slop += SLOP_LEARNING_RATE * ((travel - moved) - self.slop)
+        return after
+
+    def __str__(self) -> str:
+        return (
+            f"{self.scrolls} scrolls, {self.unmeasured} not measured, "
+            f"slop {self.slop:.1f}px, offset {self.offset}px"
+        )
@@ -1,15 +1,25 @@
 from dataclasses import dataclass
-from time import sleep
+from enum import StrEnum
 
+import cv2
 from numpy import ndarray
 
 import constants
 from emulator.adb_integration import click
+from emulator.adb_integration import get_clipboard
 from emulator.adb_integration import get_grayscale_screen
 from emulator.adb_integration import go_back
+from emulator.waiting import wait_for_screen_settled
+from emulator.waiting import wait_until
+from instrumentation import PROFILER
+from readers.ocr import OCR
 from readers.screen import Coordinate
 from readers.screen import get_on_screen
+from readers.screen import ImageSearchResult
+from readers.screen import match_template
 from readers.screen import read_at_bounding_box
+from readers.screen import read_numbers_at_bounding_boxes
+from readers.screen import read_text_with_confidence
 
 
 @dataclass
@@ -20,15 +30,57 @@ class AllianceInformation:
     max_members: int = 200
 
 
-ALLIANCE_INFORMATION = AllianceInformation()
+class Screen(StrEnum):
+    RANKINGS_INTERFACE = "rankings_interface"
+    ALLIANCE_RANKINGS = "alliance_rankings"
+    ALLIANCE_SETTINGS = "alliance_settings"
+    ALLIANCE = "alliance"
+    MENU = "menu"
+    UNKNOWN = "unknown"
 
 
-def read_current_alliance_name(image: ndarray) -> None:
+# Ordered by priority, the first screen that is recognized wins.
+SCREEN_TEMPLATES = {
+    Screen.RANKINGS_INTERFACE: constants.Images.RANKINGS_INTERFACE,
+    Screen.ALLIANCE_RANKINGS: constants.Images.ALLIANCE_RANKINGS,
+    Screen.ALLIANCE_SETTINGS: constants.Images.ALLIANCE_SETTINGS,
+    Screen.ALLIANCE: constants.Images.ALLIANCE,
+    Screen.MENU: constants.Images.MENU,
+}
+CLASSIFICATION_SCALE = 0.5
+# Downscaled matches score lower, candidates below this are not verified.
+CLASSIFICATION_CANDIDATE_MARGIN = 0.15
+
+
+# Names read with less confidence are copied to the clipboard instead.
+NAME_MIN_CONFIDENCE = 85.0
+
+
+@dataclass
+class NameStatistics:
+    read: int = 0
+    copied: int = 0
+
+
+NAME_STATISTICS = NameStatistics()
+
+
+@dataclass
+class ScreenClassification:
+    screen: Screen
+    confidence: float
+    position: ImageSearchResult | None = None
+
+
+def read_current_alliance_name(
+    image: ndarray, alliance_information: AllianceInformation
+) -> None:
     """
     Caches the name the alliance currently has.
 
     Args:
         image: The image to get the name from.
+        alliance_information: Where to cache the name.
     """
     full_alliance_name = read_at_bounding_box(
         image=image,
@@ -47,16 +99,19 @@ def read_current_alliance_name(image: ndarray) -> None:
         return
 
     alliance_name_split = full_alliance_name.split("]")
-    ALLIANCE_INFORMATION.alliance_tag = alliance_name_split[0][1:]
-    ALLIANCE_INFORMATION.alliance_name = alliance_name_split[1].replace("\n", "")
+    alliance_information.alliance_tag = alliance_name_split[0][1:]
+    alliance_information.alliance_name = alliance_name_split[1].replace("\n", "")
 
 
-def read_current_alliance_members(image: ndarray) -> None:
+def read_current_alliance_members(
+    image: ndarray, alliance_information: AllianceInformation
+) -> None:
     """
     Caches the amount of members the alliance currently has.
 
     Args:
         image: The image to get the members from.
+        alliance_information: Where to cache the amount of members.
     """
     max_members = 200
     current_members = 200
@@ -71,22 +126,168 @@ def read_current_alliance_members(image: ndarray) -> None:
         current_members = int(member_details[0])
         max_members = int(member_details[1])
 
-    ALLIANCE_INFORMATION.current_members = current_members
-    ALLIANCE_INFORMATION.max_members = max_members
+    alliance_information.current_members = current_members
+    alliance_information.max_members = max_members
 
 
-def read_current_alliance_information(image: ndarray) -> None:
+def read_current_alliance_information(
+    image: ndarray, alliance_information: AllianceInformation
+) -> None:
     """
     Caches important information about the alliance we're reading out.
 
     Args:
         image: The image to get the information from.
+        alliance_information: Where to cache the information.
     """
-    read_current_alliance_members(image=image)
-    read_current_alliance_name(image=image)
+    with PROFILER.span("read_alliance_information"):
+        read_current_alliance_members(
+            image=image, alliance_information=alliance_information
+        )
+        read_current_alliance_name(
+            image=image, alliance_information=alliance_information
+        )
 
 
-def leave_rankings_interface_return_current_screen(image: ndarray):
+def classify_screen(image: ndarray, precision: float = 0.9) -> ScreenClassification:
+    """
+    Recognizes which of the known screens is shown.
+    All screen templates are scored in one pass over a downscaled copy of the image,
+    only the likely candidates are verified on the full image afterwards.
+
+    Args:
+        image: Image of the current screen.
+        precision: The precision a full size match needs. Defaults to 0.9.
+
+    Returns:
+        The recognized screen with the precision of its match,
+        or Screen.UNKNOWN with the best precision seen.
+    """
+    with PROFILER.span("classify_screen"):
+        small_image = cv2.resize(
+            image,
+            None,
+            fx=CLASSIFICATION_SCALE,
+            fy=CLASSIFICATION_SCALE,
+            interpolation=cv2.INTER_AREA,
+        )
+        candidates = []
+        for screen, template in SCREEN_TEMPLATES.items():
+            match = match_template(
+                image=small_image, template=template, scale=CLASSIFICATION_SCALE
+            )
+            if match and match[0] >= precision - CLASSIFICATION_CANDIDATE_MARGIN:
+                candidates.append(screen)
+
+        best_confidence = 0.0
+        for screen in candidates:
+            match = match_template(image=image, template=SCREEN_TEMPLATES[screen])
+            if not match:
+                continue
+
+            confidence, position = match
+            if confidence >= precision:
+                return ScreenClassification(
+                    screen=screen, confidence=confidence, position=position
+                )
+            best_confidence = max(best_confidence, confidence)
+
+        return ScreenClassification(screen=Screen.UNKNOWN, confidence=best_confidence)
+
+
+def read_profile(image: ndarray) -> dict[str, int]:
+    """
+    Reads the numbers of a member's profile.
+
+    Args:
+        image: Image of the profile screen.
+
+    Returns:
+        The lord ID, power and merit of the member.
+    """
+    with PROFILER.span("read_profile"):
+        numbers = read_numbers_at_bounding_boxes(
+            image,
+            {
+                "power": constants.BoundingBoxes.POWER,
+                # "merit": constants.BoundingBoxes.MERIT,
+                "lord_id": constants.BoundingBoxes.LORD_ID,
+            },
+        )
+    return {
+        "lord_id": numbers["lord_id"],
+        "power": numbers["power"],
+        "merit": numbers.get("merit", 0),
+    }
+
+
+def read_profile_name(image: ndarray, copy_name_position: Coordinate) -> str | None:
+    """
+    Reads the name of a member from the profile, with the name engine.
+
+    Args:
+        image: Image of the profile screen.
+        copy_name_position: The position of the copy name button.
+
+    Returns:
+        The name, or None if there is no name engine or it is not sure enough.
+    """
+    if OCR.name_engine is None:
+        return None
+
+    bounding_box = constants.BoundingBoxes.PROFILE_NAME.clone().add(
+        copy_name_position.x, copy_name_position.y
+    )
+    bounding_box.min_x = max(bounding_box.min_x, 0)
+    with PROFILER.span("read_profile_name"):
+        name, confidence = read_text_with_confidence(
+            image, bounding_box, OCR.name_engine
+        )
+    if not name or confidence < NAME_MIN_CONFIDENCE:
+        return None
+
+    NAME_STATISTICS.read += 1
+    return name
+
+
+def copy_profile_name(
+    copy_name_position: ImageSearchResult, previous_name: str | None = None
+) -> str:
+    """
+    Copies the name of a member on the profile screen and reads the clipboard,
+    see get_clipboard() for what that needs on the device.
+
+    Args:
+        copy_name_position: The position of the copy name button.
+        previous_name (optional): The name copied last, which may still be in the
+            clipboard. Defaults to reading the clipboard before copying, as it
+            may hold a name from before the crawl.
+
+    Returns:
+        The copied name, or whatever is in the clipboard after waiting for it.
+    """
+    if previous_name is None:
+        previous_name = get_clipboard()
+    click(copy_name_position.get_middle())
+    clipboard = {"name": ""}
+
+    def read_copied_name() -> bool:
+        clipboard["name"] = get_clipboard()
+        return clipboard["name"] not in ("", previous_name)
+
+    wait_until(
+        read_copied_name,
+        timeout=0.5,
+        poll_interval=0.02,
+        description="the name to be copied",
+    )
+    NAME_STATISTICS.copied += 1
+    return clipboard["name"]
+
+
+def leave_rankings_interface_return_current_screen(
+    image: ndarray,
+) -> tuple[ndarray, ScreenClassification]:
     """
     Leaves the ranking interface if it is on the screen.
     This is done to be able to read out the alliance members.
@@ -95,73 +296,94 @@ def leave_rankings_interface_return_current_screen(image: ndarray):
          image: Image of the current screen.
 
     Returns:
-        The new screen if the ranking interface was open, otherwise the current screen.
+        The new screen if the ranking interface was open, otherwise the current screen,
+        together with its classification.
     """
-    if get_on_screen(image=image, path=constants.Images.RANKINGS_INTERFACE):
+    classification = classify_screen(image=image)
+    if classification.screen == Screen.RANKINGS_INTERFACE:
         go_back()
-        sleep(0.5)
-        image = get_grayscale_screen()
+        image = wait_for_screen_settled(
+            get_grayscale_screen, previous=image, replaces=0.5
+        )
+        classification = classify_screen(image=image)
 
-    return image
+    return image, classification
 
 
-def go_to_rankings_interface_from_known_screens(image: ndarray) -> bool:
+def go_to_rankings_interface_from_known_screens(
+    image: ndarray,
+    classification: ScreenClassification,
+    alliance_information: AllianceInformation,
+) -> bool:
     """
     Performs steps to go to the alliance rankings interface from various known screens.
 
     Args:
         image: An image of the current screen.
+        classification: The classification of the current screen.
+        alliance_information: Where to cache the alliance's information,
+            which is read on the way.
 
     Returns:
         Whether we were on a known screen.
     """
 
-    def click_coordinates_with_delay(click_coordinates: tuple[Coordinate] | None):
+    def click_coordinates_with_delay(
+        screen: ndarray, click_coordinates: tuple[Coordinate] | None
+    ) -> ndarray:
         if not click_coordinates:
-            return
+            return screen
 
         for coordinate in click_coordinates:
             click(coordinate)
-            sleep(1)
+            screen = wait_for_screen_settled(
+                get_grayscale_screen, previous=screen, replaces=1
+            )
+        return screen
 
     known_screen_steps = {
-        constants.Images.ALLIANCE_RANKINGS: None,
-        constants.Images.ALLIANCE_SETTINGS: (
-            constants.Coordinates.OPEN_ALLIANCE_SETTINGS,
-        ),
-        constants.Images.ALLIANCE: (
+        Screen.ALLIANCE_RANKINGS: None,
+        Screen.ALLIANCE_SETTINGS: (constants.Coordinates.OPEN_ALLIANCE_SETTINGS,),
+        Screen.ALLIANCE: (
             constants.Coordinates.OPEN_ALLIANCE,
             constants.Coordinates.OPEN_ALLIANCE_SETTINGS,
         ),
-        constants.Images.MENU: (
+        Screen.MENU: (
             constants.Coordinates.MENU_TOGGLE,
             constants.Coordinates.OPEN_ALLIANCE,
             constants.Coordinates.OPEN_ALLIANCE_SETTINGS,
         ),
     }
 
-    for image_path, coordinates in known_screen_steps.items():
-        on_screen = get_on_screen(image=image, path=image_path)
-        if on_screen:
-            break
-    else:
+    if classification.screen not in known_screen_steps:
         return False
 
-    click_coordinates_with_delay(click_coordinates=coordinates)
-    new_screen = get_grayscale_screen()
-    read_current_alliance_information(image=new_screen)
+    new_screen = click_coordinates_with_delay(
+        screen=image, click_coordinates=known_screen_steps[classification.screen]
+    )
+    read_current_alliance_information(
+        image=new_screen, alliance_information=alliance_information
+    )
     click(constants.Coordinates.OPEN_ALLIANCE_RANKINGS)
     return True
 
 
-def search_click_info_button():
+def search_click_info_button(
+    image: ndarray | None = None, fallback: Coordinate | None = None
+):
     """
     Searches for the info button on the screen and clicks it.
     This is done because the position of the button changes at the end of a list,
     and depending on officer permissions.
+
+    Args:
+        image (optional): Image of the current screen. Captured if not given.
+        fallback (optional): Where to click if the button is not found.
+            Defaults to the info button of the first visible entry.
     """
-    image = get_grayscale_screen()
-    info_button = get_on_screen(image=image, path=constants.Images.INFO_BUTTON)
+    if image is None:
+        image = get_grayscale_screen()
+    info_button = get_on_screen(image=image, template=constants.Images.INFO_BUTTON)
     if info_button:
         click(
             Coordinate(
@@ -170,4 +392,4 @@ def search_click_info_button():
             )
         )
     else:
-        click(constants.Coordinates.INFO_BUTTON)
+        click(fallback or constants.Coordinates.INFO_BUTTON)
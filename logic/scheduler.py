@@ -0,0 +1,165 @@
+"""
+Crawls several devices at once, each on its own thread.
+Devices in different alliances crawl their own alliance, devices in the same
+alliance split its ranks between them.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import re
+
+from emulator.adb_integration import use_device
+from logic.checkpoint import Checkpoint
+from logic.checkpoint import CheckpointJournal
+from logic.crawl import crawl_profiles
+from logic.crawl import open_rankings_interface
+from logic.crawl import read_own_position
+from logic.session import DeviceSession
+from readers.ocr_service import OcrService
+
+
+def get_journal(session: DeviceSession) -> CheckpointJournal:
+    """
+    Get the checkpoint journal of a device.
+
+    Args:
+        session: The session of the device.
+
+    Returns:
+        The journal, named after the device.
+    """
+    device_name = re.sub(r"[^\w.-]", "-", session.name)
+    return CheckpointJournal(f"crawl_checkpoint_{device_name}.jsonl")
+
+
+def split_ranks(member_count: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Splits the ranks of an alliance into ranges of about the same size.
+
+    Args:
+        member_count: The amount of members in the alliance.
+        parts: The amount of ranges.
+
+    Returns:
+        The first and last rank of every range, in order.
+    """
+    bounds = [1 + member_count * part // parts for part in range(parts + 1)]
+    return [(bounds[part], bounds[part + 1] - 1) for part in range(parts)]
+
+
+def crawl_devices(
+    sessions: list[DeviceSession],
+    resume: bool = False,
+    ocr_service: OcrService | None = None,
+) -> dict[str, dict[int, dict[str, int | str]]]:
+    """
+    Opens the rankings on all devices and crawls them at the same time.
+
+    Args:
+        sessions: The sessions of the devices to crawl with.
+        resume: Whether to continue the interrupted crawls of the devices
+            from their checkpoint journals.
+        ocr_service (optional): Reads the profiles of all devices on its processes.
+            Defaults to OCR threads per device.
+
+    Returns:
+        The name, power and merit of every member by lord ID, by alliance name.
+    """
+    with ThreadPoolExecutor(
+        max_workers=len(sessions), thread_name_prefix="device"
+    ) as executor:
+        opened = list(executor.map(_open_rankings_interface, sessions))
+        sessions_by_alliance: dict[str, list[DeviceSession]] = {}
+        for session, is_open in zip(sessions, opened):
+            if not is_open:
+                print(
+                    f"{session.name}: You are not on a screen the program supports "
+                    "yet. Please try starting from somewhere else "
+                    "(Base, Alliance Overview, ...)"
+                )
+                continue
+
+            alliance = session.alliance
+            print(
+                f"{session.name}: Reading rankings leaderboard of "
+                f"[{alliance.alliance_tag}] {alliance.alliance_name} (Members: "
+                f"{alliance.current_members}/{alliance.max_members})"
+            )
+            sessions_by_alliance.setdefault(alliance.alliance_name, []).append(session)
+
+        futures = {}
+        for alliance_name, alliance_sessions in sessions_by_alliance.items():
+            rank_ranges = split_ranks(
+                alliance_sessions[0].alliance.current_members, len(alliance_sessions)
+            )
+            for session, (first_rank, last_rank) in zip(alliance_sessions, rank_ranges):
+                journal = get_journal(session)
+                checkpoint = journal.load(alliance=alliance_name) if resume else None
+                if resume and not checkpoint:
+                    print(
+                        f"{session.name}: There is no interrupted crawl, starting over."
+                    )
+                # Read here, as only the main thread may ask for it on stdin.
+                own_position = 0 if checkpoint else _read_own_position(session)
+                futures[session.name] = (
+                    alliance_name,
+                    executor.submit(
+                        _crawl_profiles,
+                        session,
+                        journal,
+                        checkpoint,
+                        first_rank,
+                        last_rank,
+                        own_position,
+                        ocr_service,
+                    ),
+                )
+
+        results: dict[str, dict[int, dict[str, int | str]]] = {}
+        for device_name, (alliance_name, future) in futures.items():
+            try:
+                results.setdefault(alliance_name, {}).update(future.result())
+            except Exception as error:
+                print(f"{device_name}: The crawl failed: {error}")
+        return results
+
+
+def _open_rankings_interface(session: DeviceSession) -> bool:
+    with use_device(session.device):
+        return open_rankings_interface(session)
+
+
+def _read_own_position(session: DeviceSession) -> int:
+    """
+    Reads the rank of a device's account, asking for it if it can not be read.
+    Runs on the main thread, so the devices ask one after another.
+    """
+    with use_device(session.device):
+        own_position = read_own_position(ask=False)
+    if not own_position:
+        own_position = int(
+            input(
+                f"{session.name}: Could not read the current rank of the account. "
+                "Please enter it: "
+            )
+        )
+    return own_position
+
+
+def _crawl_profiles(
+    session: DeviceSession,
+    journal: CheckpointJournal,
+    checkpoint: Checkpoint | None,
+    first_rank: int,
+    last_rank: int,
+    own_position: int,
+    ocr_service: OcrService | None,
+) -> dict[int, dict[str, int | str]]:
+    with use_device(session.device):
+        return crawl_profiles(
+            session=session,
+            journal=journal,
+            checkpoint=checkpoint,
+            first_rank=first_rank,
+            last_rank=last_rank,
+            ocr_service=ocr_service,
+            own_position=own_position,
+        )
@@ -0,0 +1,76 @@
+"""
+Everything a crawl keeps per device, so several devices can be crawled at once.
+"""
+from dataclasses import dataclass
+from dataclasses import field
+
+import constants
+from emulator.adb_integration import AdbDevice
+from logic.list_tracker import ListTracker
+from logic.logic import AllianceInformation
+from readers.screen import Coordinate
+
+
+@dataclass
+class ListEntryCoordinates:
+    """
+    The positions of the rankings list entry the crawl is at.
+    They start at the first visible entry and move down to skip the own entry
+    and to reach the entries at the bottom of the list.
+    """
+
+    list_entry: Coordinate = field(
+        default_factory=lambda: constants.Coordinates.LIST_ENTRY.clone()
+    )
+    info_button: Coordinate = field(
+        default_factory=lambda: constants.Coordinates.INFO_BUTTON.clone()
+    )
+    list_entry_middle: Coordinate = field(
+        default_factory=lambda: constants.Coordinates.LIST_ENTRY_MIDDLE.clone()
+    )
+    list_entry_middle_up: Coordinate = field(
+        default_factory=lambda: constants.Coordinates.LIST_ENTRY_MIDDLE_UP.clone()
+    )
+
+    def increase_by_one_entry(self) -> None:
+        """
+        Moves all positions down by one entry.
+        """
+        for coordinate in vars(self).values():
+            coordinate.y += constants.Offsets.ENTRY_DISTANCE
+
+    def to_dict(self) -> dict[str, tuple[int, int]]:
+        """
+        Returns:
+            The positions by name.
+        """
+        return {name: (value.x, value.y) for name, value in vars(self).items()}
+
+    @classmethod
+    def from_dict(cls, positions: dict[str, tuple[int, int]]) -> "ListEntryCoordinates":
+        """
+        Args:
+            positions: The positions by name, as returned by to_dict().
+
+        Returns:
+            The coordinates at the given positions.
+        """
+        return cls(**{name: Coordinate(x, y) for name, (x, y) in positions.items()})
+
+
+@dataclass
+class DeviceSession:
+    """
+    A device together with the state of the crawl running on it.
+    """
+
+    device: AdbDevice
+    alliance: AllianceInformation = field(default_factory=AllianceInformation)
+    coordinates: ListEntryCoordinates = field(default_factory=ListEntryCoordinates)
+    tracker: ListTracker = field(default_factory=ListTracker)
+    # The error of every rank whose profile could not be read, by rank.
+    failed_ranks: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.device.device_name
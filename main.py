@@ -1,162 +1,295 @@
+import argparse
+from datetime import datetime
+import logging
 import os
-from time import sleep
 
 import dotenv
 from pytesseract import pytesseract
 
 import constants
-from emulator.adb_integration import ADB
-from emulator.adb_integration import click
-from emulator.adb_integration import get_clipboard
-from emulator.adb_integration import get_grayscale_screen
-from emulator.adb_integration import go_back
-from emulator.adb_integration import scroll_low_level
+from emulator.adb_integration import AdbDevice
+from emulator.adb_integration import AdbTransport
+from emulator.adb_integration import CaptureMode
+from emulator.adb_integration import use_device
+from emulator.recording import get_device_directory
+from emulator.recording import SessionRecorder
+from emulator.recording import SessionReplay
+from emulator.waiting import WAIT_STATISTICS
 from exporters import get_exporter
-from logic.logic import ALLIANCE_INFORMATION
-from logic.logic import go_to_rankings_interface_from_known_screens
-from logic.logic import leave_rankings_interface_return_current_screen
-from logic.logic import search_click_info_button
-from readers.screen import get_on_screen
-from readers.screen import read_numbers_at_bounding_box
-
-
-def main():
-    data = {}
-
-    image = get_grayscale_screen()
-
-    image = leave_rankings_interface_return_current_screen(image=image)
-    if not go_to_rankings_interface_from_known_screens(image=image):
+from instrumentation import PROFILER
+from logic.crawl import open_rankings_interface
+from logic.crawl import read_own_position
+from logic.identity_store import IdentityStore
+from logic.list_scan import ListScanStatistics
+from logic.list_scan import scan_rankings_list
+from logic.logic import CLASSIFICATION_SCALE
+from logic.logic import NAME_STATISTICS
+from logic.scheduler import crawl_devices
+from logic.session import DeviceSession
+from readers.digits import DigitReader
+from readers.digits import GlyphAtlas
+from readers.frame_cache import FRAME_CACHE
+from readers.ocr import get_ocr_engine
+from readers.ocr import OCR
+from readers.ocr import OcrEngineType
+from readers.ocr_service import OcrService
+from readers.templates import TEMPLATES
+
+
+def read_rankings_list(
+    session: DeviceSession, refresh: bool, delta: bool
+) -> dict[int, dict[str, int | str]] | None:
+    """
+    Navigates to the alliance rankings and reads the members from the list.
+
+    Args:
+        session: The session of the current device.
+        refresh: Whether to open the profiles of known members.
+        delta: Whether to only open the profiles of members whose row changed
+            since the last scan of the alliance.
+
+    Returns:
+        The name, power and merit of every member by lord ID,
+        or None if the rankings could not be opened.
+    """
+    if not open_rankings_interface(session):
         print(
             "You are not on a screen the program supports yet. "
             "Please try starting from somewhere else (Base, Alliance Overview, ...)"
         )
-        return
-
-    sleep(0.5)
+        return None
 
+    alliance = session.alliance
     print(
         "Reading rankings leaderboard of "
-        f"[{ALLIANCE_INFORMATION.alliance_tag}] "
-        f"{ALLIANCE_INFORMATION.alliance_name} (Members: "
-        f"{ALLIANCE_INFORMATION.current_members}/{ALLIANCE_INFORMATION.max_members})"
+        f"[{alliance.alliance_tag}] "
+        f"{alliance.alliance_name} (Members: "
+        f"{alliance.current_members}/{alliance.max_members})"
     )
 
-    image = get_grayscale_screen()
-    own_position = 0
-    own_entry_coordinates = get_on_screen(
-        image=image, path=constants.Images.OWN_POSITION
+    statistics = ListScanStatistics()
+    identity_store = IdentityStore(force_refresh=refresh)
+    result = scan_rankings_list(
+        member_count=alliance.current_members,
+        identity_store=identity_store,
+        previous_snapshot=(
+            identity_store.get_snapshot(alliance.alliance_name)
+            if delta and not refresh
+            else None
+        ),
+        statistics=statistics,
+        tracker=session.tracker,
+        own_position=read_own_position(),
     )
-    if own_entry_coordinates:
-        constants.BoundingBoxes.OWN_POSITION.min_x += own_entry_coordinates.x
-        constants.BoundingBoxes.OWN_POSITION.max_x += own_entry_coordinates.x
-        constants.BoundingBoxes.OWN_POSITION.min_y += own_entry_coordinates.y
-        constants.BoundingBoxes.OWN_POSITION.max_y += own_entry_coordinates.y
-        own_position = read_numbers_at_bounding_box(
-            image=image, bounding_box=constants.BoundingBoxes.OWN_POSITION
+    # A partial snapshot would make the next delta scan miss or depart members.
+    if result.complete:
+        identity_store.save_snapshot(alliance.alliance_name, result.snapshot)
+        identity_store.mark_departed(alliance.alliance_name, result.departed)
+    identity_store.close()
+    print(
+        f"Read {statistics.rows} members on {statistics.pages} pages, "
+        f"opened {statistics.profiles_opened} profiles "
+        f"and avoided {statistics.profiles_avoided} profile visits."
+    )
+    if not result.complete:
+        print(
+            f"{len(result.missing_ranks)} ranks could not be read, so the previous "
+            "snapshot is kept and no members are marked as departed: "
+            f"{', '.join(str(rank) for rank in result.missing_ranks)}"
         )
-        print(f"Position in the rankings of the current account is {own_position}.")
-
-    if own_position == 0:
-        own_position = int(
-            input("Could not read the current rank of the account. Please enter it: ")
+    if result.departed:
+        print(
+            f"{len(result.departed)} members left since the last scan: "
+            f"{', '.join(str(lord_id) for lord_id in result.departed)}"
         )
+    return result.members
+
+
+def main(
+    sessions: list[DeviceSession],
+    list_scan: bool = False,
+    refresh: bool = False,
+    delta: bool = False,
+    resume: bool = False,
+    ocr_processes: int = 0,
+    profile: bool = False,
+):
+    """
+    Navigates to the alliance rankings, reads all members and exports them.
+
+    Args:
+        sessions: The devices to read with. Profile crawls run on all of them
+            at once, list scans only on the first one.
+        list_scan: Whether to read the members from the rankings list
+            instead of opening every profile.
+        refresh: Whether to open the profiles of known members in the list scan.
+        delta: Whether the list scan should only open the profiles of members
+            whose row changed since the last scan of the alliance.
+        resume: Whether to continue the interrupted profile crawls of the devices
+            from their checkpoint journals.
+        ocr_processes: Reads profiles on this many processes instead of threads
+            of this process, if set.
+        profile: Whether to time every stage and write a report next to the export.
+    """
+    PROFILER.enabled = profile
+    TEMPLATES.preload(
+        (template.path for template in constants.Images.get_all()),
+        scales=(1.0, CLASSIFICATION_SCALE),
+    )
 
-    last = own_position >= ALLIANCE_INFORMATION.current_members - 5
-
-    repeated_fail_count = 0
-    current_rank = 1
-    while current_rank <= ALLIANCE_INFORMATION.current_members:
-        bottom_of_list = current_rank >= ALLIANCE_INFORMATION.current_members - (
-            3 if last else 4
+    if list_scan or delta:
+        session = sessions[0]
+        with use_device(session.device):
+            data = read_rankings_list(session=session, refresh=refresh, delta=delta)
+        results = {session.alliance.alliance_name: data} if data is not None else {}
+    else:
+        ocr_service = (
+            OcrService(
+                workers=ocr_processes,
+                engine_type=OcrEngineType(os.getenv("OCR_ENGINE") or "pytesseract"),
+                tessdata_path=os.getenv("TESSDATA_PATH") or None,
+                digit_atlas_path=os.getenv("DIGIT_ATLAS") or None,
+            )
+            if ocr_processes
+            else None
         )
+        results = crawl_devices(sessions, resume=resume, ocr_service=ocr_service)
+        if ocr_service:
+            ocr_service.close()
 
-        if current_rank == own_position:
-            current_rank += 1
-            constants.increase_list_entry_constants_by_one_entry()
-            continue
-
-        if bottom_of_list and repeated_fail_count == 0:
-            constants.increase_list_entry_constants_by_one_entry()
-
-        click(constants.Coordinates.LIST_ENTRY)
-        sleep(1)
-
-        if bottom_of_list:
-            search_click_info_button()
-        else:
-            click(constants.Coordinates.INFO_BUTTON)
-        sleep(1)
-
-        image = get_grayscale_screen()
-
-        copy_name_position = get_on_screen(image, path=constants.Images.COPY_NAME)
-        if not copy_name_position:
-            # TODO Make more effort to re-jump into the rankings,
-            #   depending on INFO button or profile on screen.
-            if repeated_fail_count == 5:
-                print(f"Failed to read rank {current_rank} 5 times, exiting.")
-                break
-
+    # TODO Add a way to configure the exporter outside of changing code
+    for alliance_name, data in results.items():
+        get_exporter().export(user_data=data, alliance_name=alliance_name)
+    print(f"Template cache: {TEMPLATES}")
+    print(f"Frame cache: {FRAME_CACHE}")
+    for session in sessions:
+        print(f"{session.name}: Scrolled {session.tracker}")
+        if session.failed_ranks:
             print(
-                f"Could not read the name of the user at rank {current_rank}. Retrying."
-            )
-            repeated_fail_count += 1
-            continue
-
-        repeated_fail_count = 0
-        click(copy_name_position.get_middle())
-        sleep(0.5)
-        name = get_clipboard()
-
-        power = read_numbers_at_bounding_box(image, constants.BoundingBoxes.POWER)
-        # merit = read_numbers_at_bounding_box(image, constants.BoundingBoxes.MERIT)
-        merit = 0
-        lord_id = read_numbers_at_bounding_box(image, constants.BoundingBoxes.LORD_ID)
-
-        go_back()
-        data[lord_id] = {"name": name, "power": power, "merit": merit}
-        sleep(0.1)
-
-        if bottom_of_list:
-            current_rank += 1
-            continue
-
-        # It seems that the scrolling gets put off slowly over time.
-        # Adding 1 from LIST_ENTRY_MIDDLE_UP did not fix it, so we "add" 0.1.
-        if current_rank % 100 == 0:
-            scroll_low_level(
-                constants.Coordinates.LIST_ENTRY_MIDDLE,
-                constants.Coordinates.LIST_ENTRY_MIDDLE_UP.clone().add(0, 10),
+                f"{session.name}: {len(session.failed_ranks)} profiles could not be "
+                "read and are missing from the export:"
             )
-            current_rank += 1
-            continue
-
-        scroll_low_level(
-            constants.Coordinates.LIST_ENTRY_MIDDLE,
-            constants.Coordinates.LIST_ENTRY_MIDDLE_UP,
+            for rank, error in sorted(session.failed_ranks.items()):
+                print(f"  rank {rank}: {error}")
+    if profile:
+        report_path = f"{datetime.now().strftime('%Y-%m-%d_%H-%M')}_profile"
+        PROFILER.write_report(report_path)
+        print(
+            f"Wrote the stage timings to {report_path}.json "
+            f"and the flame graph stacks to {report_path}.folded."
+        )
+    print(
+        f"Waited {WAIT_STATISTICS.time_waited:.1f}s in {WAIT_STATISTICS.waits} waits "
+        f"for the screen, {WAIT_STATISTICS.time_saved:.1f}s less than fixed sleeps."
+    )
+    if OCR.name_engine:
+        print(
+            f"Read {NAME_STATISTICS.read} names from profiles, "
+            f"copied {NAME_STATISTICS.copied} the OCR was unsure about."
         )
-        current_rank += 1
-
-    # TODO Add a way to configure the exporter outside of changing code
-    get_exporter().export(user_data=data)
 
 
 if __name__ == "__main__":
     dotenv.load_dotenv(".env")
+    logging.basicConfig(level=os.getenv("LOG_LEVEL") or logging.WARNING)
 
     pytesseract.tesseract_cmd = os.getenv("TESSERACT_BINARY")
+    OCR.engine = get_ocr_engine(
+        OcrEngineType(os.getenv("OCR_ENGINE") or OcrEngineType.PYTESSERACT),
+        tessdata_path=os.getenv("TESSDATA_PATH") or None,
+    )
+    if digit_atlas_path := os.getenv("DIGIT_ATLAS"):
+        OCR.digit_reader = DigitReader(GlyphAtlas.load(digit_atlas_path))
+    # Crops are prepared for the engines unless turned off with 0.
+    OCR.preprocess = os.getenv("OCR_PREPROCESSING") != "0"
+    # Names are read from the profile with these languages instead of being copied.
+    if name_languages := os.getenv("OCR_NAME_LANGUAGES"):
+        OCR.name_engine = get_ocr_engine(
+            OcrEngineType(os.getenv("OCR_ENGINE") or OcrEngineType.PYTESSERACT),
+            tessdata_path=os.getenv("TESSDATA_PATH") or None,
+            language=name_languages,
+        )
 
-    ADB.adb_path = os.getenv("ADB_BINARY")
-    ADB.device_name = os.getenv("ADB_DEVICE_NAME", "emulator-5554")
-    ADB.shell = f"{ADB.adb_path} -s {ADB.device_name} shell"
+    adb_path = os.getenv("ADB_BINARY")
+    transport = AdbTransport(os.getenv("ADB_TRANSPORT") or AdbTransport.EXECUTABLE)
+    # Sessions are recorded to this folder, or replayed from it by the replay
+    # transport, in a subfolder per device.
+    recording = os.getenv("ADB_RECORDING")
+    if transport == AdbTransport.REPLAY and not recording:
+        print("The replay transport needs ADB_RECORDING to be set. Exiting.")
+        exit(0)
+
+    # Several devices are crawled at once if their names are separated by commas.
+    device_sessions = [
+        DeviceSession(
+            AdbDevice(
+                adb_path=adb_path,
+                device_name=device_name,
+                shell=f"{adb_path} -s {device_name} shell",
+                capture_mode=CaptureMode(
+                    os.getenv("ADB_CAPTURE_MODE") or CaptureMode.PNG
+                ),
+                transport=transport,
+                recorder=(
+                    SessionRecorder(get_device_directory(recording, device_name))
+                    if recording and transport != AdbTransport.REPLAY
+                    else None
+                ),
+                replay=(
+                    SessionReplay(get_device_directory(recording, device_name))
+                    if transport == AdbTransport.REPLAY
+                    else None
+                ),
+            )
+        )
+        for device_name in (
+            name.strip()
+            for name in (os.getenv("ADB_DEVICE_NAME") or "emulator-5554").split(",")
+        )
+    ]
 
     if not os.path.isfile(pytesseract.tesseract_cmd):
         print("The environment variable TESSERACT_BINARY is not valid. Exiting.")
         exit(0)
 
-    if not os.path.isfile(ADB.adb_path):
+    if transport != AdbTransport.REPLAY and not os.path.isfile(adb_path):
         print("The environment variable ADB_BINARY is not valid. Exiting.")
         exit(0)
 
-    main()
+    parser = argparse.ArgumentParser(description="Reads an alliance's members.")
+    parser.add_argument(
+        "--list-scan",
+        action="store_true",
+        help="Read the members from the rankings list, a page at a time.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Open the profiles of members already known from previous list scans.",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="List scan that only opens profiles of new or changed rows.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue interrupted profile crawls from their checkpoint journals.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time every stage and write a report next to the export.",
+    )
+    arguments = parser.parse_args()
+
+    main(
+        sessions=device_sessions,
+        list_scan=arguments.list_scan,
+        refresh=arguments.refresh,
+        delta=arguments.delta,
+        resume=arguments.resume,
+        ocr_processes=int(os.getenv("OCR_PROCESSES") or 0),
+        profile=arguments.profile,
+    )
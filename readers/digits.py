@@ -0,0 +1,268 @@
+"""
+A fast reader for numbers rendered in the game's fixed font.
+Glyphs are cut apart by their column projection and matched against an atlas of
+known glyphs, which is built from labelled crops:
+    python -m readers.digits <crops folder> <atlas path>
+A crop is labelled by its file name, e.g. "123456.png" or "123456-2.png",
+with "x" standing in for "/", e.g. "187x200.png".
+"""
+from pathlib import Path
+import sys
+
+import cv2
+import numpy
+from numpy import ndarray
+
+from readers.image_hash import get_exact_hash
+
+GLYPH_WIDTH = 12
+GLYPH_HEIGHT = 20
+# Blobs smaller than this share of the crop's height are treated as noise.
+MIN_GLYPH_HEIGHT_RATIO = 0.3
+
+
+def binarize(image: ndarray) -> ndarray:
+    """
+    Splits a grayscale crop into text and background with Otsu's threshold.
+    The text is assumed to cover less of the crop than the background.
+
+    Args:
+        image: The grayscale crop.
+
+    Returns:
+        A boolean mask, True where the text is.
+    """
+    _, thresholded = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = thresholded > 0
+    if mask.mean() > 0.5:
+        mask = ~mask
+    return mask
+
+
+def segment_glyphs(mask: ndarray) -> list[ndarray]:
+    """
+    Cuts a text mask into glyphs at the columns that contain no text.
+
+    Args:
+        mask: The boolean text mask of a crop.
+
+    Returns:
+        The masks of the glyphs from left to right, trimmed to their rows.
+    """
+    columns = numpy.concatenate(([0], mask.any(axis=0).view(numpy.int8), [0]))
+    edges = numpy.flatnonzero(numpy.diff(columns))
+    glyphs = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        glyph = mask[:, start:end]
+        rows = numpy.flatnonzero(glyph.any(axis=1))
+        if rows[-1] - rows[0] + 1 < mask.shape[0] * MIN_GLYPH_HEIGHT_RATIO:
+            continue
+        glyphs.append(glyph[rows[0] : rows[-1] + 1])
+    return glyphs
+
+
+def normalize_glyphs(glyphs: list[ndarray]) -> ndarray:
+    """
+    Scales glyph masks to the atlas size.
+
+    Args:
+        glyphs: The boolean glyph masks.
+
+    Returns:
+        A float32 matrix with one flattened glyph per row, values from 0 to 1.
+    """
+    normalized = numpy.empty((len(glyphs), GLYPH_HEIGHT * GLYPH_WIDTH), numpy.float32)
+    for index, glyph in enumerate(glyphs):
+        normalized[index] = cv2.resize(
+            glyph.astype(numpy.float32),
+            (GLYPH_WIDTH, GLYPH_HEIGHT),
+            interpolation=cv2.INTER_AREA,
+        ).ravel()
+    return normalized
+
+
+class GlyphAtlas:
+    """
+    Labelled glyph samples, matched against by nearest neighbour.
+    """
+
+    def __init__(self, labels: ndarray, glyphs: ndarray):
+        """
+        Args:
+            labels: The character of every sample.
+            glyphs: The normalized samples, one per row.
+        """
+        self.labels = labels
+        self.glyphs = glyphs
+
+    @classmethod
+    def load(cls, path: str | Path) -> "GlyphAtlas":
+        """
+        Loads an atlas saved with save().
+
+        Args:
+            path: The path to the .npz file.
+
+        Returns:
+            The loaded atlas.
+        """
+        with numpy.load(path) as atlas:
+            return cls(labels=atlas["labels"], glyphs=atlas["glyphs"])
+
+    def save(self, path: str | Path) -> None:
+        """
+        Saves the atlas as .npz file.
+
+        Args:
+            path: The path to save to.
+        """
+        numpy.savez_compressed(path, labels=self.labels, glyphs=self.glyphs)
+
+    def get_characters(self) -> set[str]:
+        """
+        Get the characters the atlas knows.
+
+        Returns:
+            The set of known characters.
+        """
+        return set(self.labels.tolist())
+
+    def classify(self, glyphs: ndarray) -> tuple[ndarray, ndarray]:
+        """
+        Finds the closest sample of every glyph.
+
+        Args:
+            glyphs: The normalized glyphs, one per row.
+
+        Returns:
+            The characters and their confidence, 1 minus the mean squared pixel
+            difference to the closest sample.
+        """
+        distances = numpy.square(glyphs[:, None, :] - self.glyphs[None, :, :]).mean(
+            axis=2
+        )
+        closest = distances.argmin(axis=1)
+        return (
+            self.labels[closest],
+            1 - distances[numpy.arange(len(glyphs)), closest],
+        )
+
+
+def build_glyph_atlas(crops_directory: str | Path) -> GlyphAtlas:
+    """
+    Builds an atlas from labelled crops.
+    Crops whose glyph count does not match their label are skipped.
+
+    Args:
+        crops_directory: The folder containing the labelled crops as PNG.
+
+    Returns:
+        The built atlas.
+    """
+    labels = []
+    glyphs = []
+    for path in sorted(Path(crops_directory).glob("*.png")):
+        label = path.stem.split("-")[0].replace("x", "/")
+        crop = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        crop_glyphs = segment_glyphs(binarize(crop))
+        if len(crop_glyphs) != len(label):
+            print(
+                f"Skipping {path.name}, found {len(crop_glyphs)} glyphs "
+                f"for {len(label)} characters."
+            )
+            continue
+
+        labels.extend(label)
+        glyphs.append(normalize_glyphs(crop_glyphs))
+
+    return GlyphAtlas(
+        labels=numpy.array(labels),
+        glyphs=(
+            numpy.concatenate(glyphs)
+            if glyphs
+            else numpy.empty((0, GLYPH_HEIGHT * GLYPH_WIDTH), numpy.float32)
+        ),
+    )
+
+
+class DigitReader:
+    """
+    Reads numbers with a glyph atlas instead of Tesseract.
+    """
+
+    def __init__(self, atlas: GlyphAtlas, min_confidence: float = 0.85):
+        """
+        Args:
+            atlas: The atlas to match glyphs against.
+            min_confidence: The confidence every glyph of a read needs,
+                below it the read should be done by Tesseract instead.
+        """
+        self.atlas = atlas
+        self.characters = atlas.get_characters()
+        self.min_confidence = min_confidence
+        # The atlas decides the reads, not the object holding it.
+        self.cache_key = (
+            get_exact_hash(atlas.labels),
+            get_exact_hash(atlas.glyphs),
+            min_confidence,
+        )
+
+    def can_read(self, character_whitelist: str | None) -> bool:
+        """
+        Check if the reader knows all characters that are allowed.
+
+        Args:
+            character_whitelist (optional): The chars allowed to be recognized.
+
+        Returns:
+            Whether the reader can be used for the whitelist.
+        """
+        return bool(character_whitelist) and set(character_whitelist).issubset(
+            self.characters
+        )
+
+    def read(self, image: ndarray) -> tuple[str, float]:
+        """
+        Reads the glyphs on a crop.
+
+        Args:
+            image: The grayscale crop.
+
+        Returns:
+            The text and the confidence of its least confident glyph,
+            or an empty text with 0 confidence if there are no glyphs.
+        """
+        glyphs = segment_glyphs(binarize(image))
+        if not glyphs or not len(self.atlas.labels):
+            return "", 0.0
+
+        characters, confidences = self.atlas.classify(normalize_glyphs(glyphs))
+        return "".join(characters.tolist()), float(confidences.min())
+
+    def read_confident(self, image: ndarray) -> str | None:
+        """
+        Reads the glyphs on a crop, if the read is confident enough.
+
+        Args:
+            image: The grayscale crop.
+
+        Returns:
+            The text or None if the read was not confident enough.
+        """
+        text, confidence = self.read(image)
+        if confidence < self.min_confidence:
+            return None
+        return text
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m readers.digits <crops folder> <atlas path>")
+        exit(1)
+
+    glyph_atlas = build_glyph_atlas(sys.argv[1])
+    glyph_atlas.save(sys.argv[2])
+    print(
+        f"Saved {len(glyph_atlas.labels)} glyphs of "
+        f"{''.join(sorted(glyph_atlas.get_characters()))} to {sys.argv[2]}."
+    )
@@ -0,0 +1,152 @@
+"""
+Remembers what was read in an area of the screen, so an area which did not change
+since, e.g. on a retry, costs a hash instead of template matching or OCR.
+"""
+from collections import OrderedDict
+import threading
+from typing import Any, Callable, Hashable
+
+from numpy import ndarray
+
+from instrumentation import PROFILER
+from readers.image_hash import get_difference_hash
+from readers.image_hash import get_exact_hash
+
+
+class FrameCache:
+    """
+    A bounded LRU of results by the exact content of the area they were read from
+    and what was read, e.g. a template or the OCR settings.
+    Areas are keyed by a cryptographic hash of their pixels, so a result is only
+    reused for identical pixels. The downscaled difference hash of an area is kept
+    as well, to count the misses on areas that only look alike, e.g. because
+    of an animation, which the exact key cannot reuse.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Args:
+            max_entries: How many results are kept, the least recently used
+                are dropped first.
+        """
+        self.max_entries = max_entries
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+        self._entries: OrderedDict[
+            tuple[Hashable, bytes], tuple[int, Any]
+        ] = OrderedDict()
+        # The latest exact hash by field and difference hash.
+        self._similar: dict[tuple[Hashable, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    def get_or_read(
+        self, area: ndarray, field: Hashable, read: Callable[[], Any]
+    ) -> Any:
+        """
+        Get the result for an area, reading it only if the area is new.
+
+        Args:
+            area: The pixels the result is read from.
+            field: What is read, e.g. ("ocr", "0123456789").
+            read: Reads the result if it is not cached.
+
+        Returns:
+            The cached or read result.
+        """
+        if not self.enabled:
+            return read()
+
+        with PROFILER.span("fingerprint"):
+            key = (field, get_exact_hash(area))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        result = read()
+        self.put(area, field, result, exact_hash=key[1])
+        return result
+
+    def get(self, area: ndarray, field: Hashable) -> tuple[bool, Any]:
+        """
+        Looks up the result for an area without reading it.
+
+        Args:
+            area: The pixels the result was read from.
+            field: What was read.
+
+        Returns:
+            Whether the result is cached and the result.
+        """
+        if not self.enabled:
+            return False, None
+
+        with PROFILER.span("fingerprint"):
+            key = (field, get_exact_hash(area))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(
+        self,
+        area: ndarray,
+        field: Hashable,
+        result: Any,
+        exact_hash: bytes | None = None,
+    ) -> None:
+        """
+        Stores the result read from an area, counting it as a miss.
+
+        Args:
+            area: The pixels the result was read from.
+            field: What was read.
+            result: The result, which must not be modified afterwards.
+            exact_hash (optional): The exact hash of the area, if already known.
+        """
+        if not self.enabled:
+            return
+
+        with PROFILER.span("fingerprint"):
+            key = (field, exact_hash or get_exact_hash(area))
+            similar_key = (field, get_difference_hash(area))
+        with self._lock:
+            self.misses += 1
+            if similar_key in self._similar:
+                self.near_misses += 1
+            self._similar[similar_key] = key[1]
+            self._entries[key] = (similar_key[1], result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                (old_field, old_hash), (old_similar, _) = self._entries.popitem(
+                    last=False
+                )
+                if self._similar.get((old_field, old_similar)) == old_hash:
+                    del self._similar[(old_field, old_similar)]
+
+    def clear(self) -> None:
+        """
+        Removes all results and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._similar.clear()
+            self.hits = self.misses = self.near_misses = 0
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        return (
+            f"{len(self._entries)} results cached, {self.hits} hits, "
+            f"{self.misses} misses ({self.hits / lookups if lookups else 0:.0%} "
+            f"hit rate), {self.near_misses} misses on similar areas"
+        )
+
+
+FRAME_CACHE = FrameCache()
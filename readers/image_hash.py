@@ -0,0 +1,56 @@
+"""
+Hashes of screen areas, to recognize an area again without reading it.
+"""
+import hashlib
+
+import cv2
+import numpy
+from numpy import ndarray
+
+
+def get_difference_hash(image: ndarray, hash_size: int = 8) -> int:
+    """
+    Calculates a perceptual hash of an image, which barely changes
+    with small shifts or brightness changes.
+
+    Args:
+        image: The grayscale image to hash.
+        hash_size: The hash has hash_size * hash_size bits. Defaults to 8.
+
+    Returns:
+        The hash as integer.
+    """
+    thumbnail = cv2.resize(
+        image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA
+    )
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+    return int.from_bytes(numpy.packbits(bits).tobytes(), "big")
+
+
+def get_hash_distance(first_hash: int, second_hash: int) -> int:
+    """
+    Counts the bits two hashes differ in.
+
+    Args:
+        first_hash: A hash from get_difference_hash.
+        second_hash: Another hash from get_difference_hash.
+
+    Returns:
+        The hamming distance of the hashes.
+    """
+    return (first_hash ^ second_hash).bit_count()
+
+
+def get_exact_hash(image: ndarray) -> bytes:
+    """
+    Hashes the pixels and the shape of an image.
+
+    Args:
+        image: The image to hash, a view is copied only if it is not contiguous.
+
+    Returns:
+        A 16 byte digest, equal only for identical images.
+    """
+    digest = hashlib.blake2b(repr(image.shape).encode(), digest_size=16)
+    digest.update(image if image.flags.c_contiguous else image.copy())
+    return digest.digest()
@@ -0,0 +1,264 @@
+"""OCR engines which the screen readers hand their crops to."""
+from abc import ABC
+from abc import abstractmethod
+from dataclasses import dataclass
+from dataclasses import field
+from enum import StrEnum
+import threading
+
+import numpy
+from numpy import ndarray
+from pytesseract import pytesseract
+
+from readers.digits import DigitReader
+
+
+@dataclass
+class OcrWord:
+    """
+    A word recognized on an image, with its position on that image.
+    """
+
+    text: str
+    confidence: float
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+class OcrEngineType(StrEnum):
+    PYTESSERACT = "pytesseract"
+    TESSEROCR = "tesserocr"
+
+
+class AbstractOcrEngine(ABC):
+    @abstractmethod
+    def get_cache_key(self) -> tuple:
+        """
+        Get what decides how the engine reads, so cached reads of an engine are
+        only reused by an engine configured the same way.
+
+        Returns:
+            The engine type and its configuration.
+        """
+
+    @abstractmethod
+    def read_line(self, image: ndarray, character_whitelist: str | None) -> str:
+        """
+        Reads an image containing a single line of text.
+
+        Args:
+            image: The grayscale image to read.
+            character_whitelist (optional): The chars allowed to be recognized.
+
+        Returns:
+            The recognized text.
+        """
+
+    @abstractmethod
+    def read_words(
+        self, image: ndarray, character_whitelist: str | None
+    ) -> list[OcrWord]:
+        """
+        Reads an image containing a block of text, word by word.
+
+        Args:
+            image: The grayscale image to read.
+            character_whitelist (optional): The chars allowed to be recognized.
+
+        Returns:
+            The recognized words with their confidence and position.
+        """
+
+
+class PytesseractEngine(AbstractOcrEngine):
+    """
+    Runs the tesseract executable for every read.
+    Needs no extra package, but loads the model on every call.
+    """
+
+    def __init__(self, language: str = "eng"):
+        """
+        Args:
+            language: The Tesseract languages to use, joined by +.
+                Defaults to eng.
+        """
+        self.language = language
+
+    def get_cache_key(self) -> tuple:
+        return OcrEngineType.PYTESSERACT, self.language
+
+    def read_line(self, image: ndarray, character_whitelist: str | None) -> str:
+        return pytesseract.image_to_string(
+            image, config=self._get_config(7, character_whitelist)
+        )
+
+    def read_words(
+        self, image: ndarray, character_whitelist: str | None
+    ) -> list[OcrWord]:
+        data = pytesseract.image_to_data(
+            image,
+            config=self._get_config(6, character_whitelist),
+            output_type=pytesseract.Output.DICT,
+        )
+        return [
+            OcrWord(
+                text=text.strip(),
+                confidence=float(confidence),
+                left=left,
+                top=top,
+                width=width,
+                height=height,
+            )
+            for text, confidence, left, top, width, height in zip(
+                data["text"],
+                data["conf"],
+                data["left"],
+                data["top"],
+                data["width"],
+                data["height"],
+            )
+            if text.strip()
+        ]
+
+    def _get_config(self, page_segmentation_mode: int, character_whitelist: str | None):
+        tesseract_config = (
+            f"-l {self.language} --oem 3 --psm {page_segmentation_mode} "
+            '-c page_separator=""'
+        )
+        if character_whitelist:
+            tesseract_config += f" -c tessedit_char_whitelist={character_whitelist}"
+        return tesseract_config
+
+
+class TesserocrEngine(AbstractOcrEngine):
+    """
+    Keeps one Tesseract instance with the loaded model in the process,
+    through the tesserocr bindings (`pip install tesserocr`).
+    """
+
+    def __init__(self, tessdata_path: str | None = None, language: str = "eng"):
+        """
+        Args:
+            tessdata_path (optional): The folder containing the traineddata files.
+                Defaults to the location tesserocr was built with.
+            language: The Tesseract languages to load, joined by +.
+                Defaults to eng.
+
+        Raises:
+            ImportError: If tesserocr is not installed.
+        """
+        import tesserocr
+
+        self.tessdata_path = tessdata_path
+        self.language = language
+        self._tesserocr = tesserocr
+        if tessdata_path:
+            self._api = tesserocr.PyTessBaseAPI(path=tessdata_path, lang=language)
+        else:
+            self._api = tesserocr.PyTessBaseAPI(lang=language)
+        # One instance can only read one image at a time.
+        self._lock = threading.Lock()
+
+    def get_cache_key(self) -> tuple:
+        return OcrEngineType.TESSEROCR, self.tessdata_path, self.language
+
+    def read_line(self, image: ndarray, character_whitelist: str | None) -> str:
+        with self._lock:
+            self._set_image(image, self._tesserocr.PSM.SINGLE_LINE, character_whitelist)
+            return self._api.GetUTF8Text()
+
+    def read_words(
+        self, image: ndarray, character_whitelist: str | None
+    ) -> list[OcrWord]:
+        words = []
+        with self._lock:
+            self._set_image(
+                image, self._tesserocr.PSM.SINGLE_BLOCK, character_whitelist
+            )
+            self._api.Recognize()
+            level = self._tesserocr.RIL.WORD
+            for result in self._tesserocr.iterate_level(self._api.GetIterator(), level):
+                text = (result.GetUTF8Text(level) or "").strip()
+                if not text:
+                    continue
+                min_x, min_y, max_x, max_y = result.BoundingBox(level)
+                words.append(
+                    OcrWord(
+                        text=text,
+                        confidence=result.Confidence(level),
+                        left=min_x,
+                        top=min_y,
+                        width=max_x - min_x,
+                        height=max_y - min_y,
+                    )
+                )
+        return words
+
+    def _set_image(
+        self,
+        image: ndarray,
+        page_segmentation_mode: int,
+        character_whitelist: str | None,
+    ) -> None:
+        image = numpy.ascontiguousarray(image)
+        self._api.SetPageSegMode(page_segmentation_mode)
+        self._api.SetVariable("tessedit_char_whitelist", character_whitelist or "")
+        self._api.SetImageBytes(
+            image.tobytes(), image.shape[1], image.shape[0], 1, image.shape[1]
+        )
+
+
+def get_ocr_engine(
+    engine_type: OcrEngineType = OcrEngineType.PYTESSERACT,
+    tessdata_path: str | None = None,
+    language: str = "eng",
+) -> AbstractOcrEngine:
+    """
+    Creates an OCR engine, falling back to pytesseract if tesserocr can not load
+    its model.
+
+    Args:
+        engine_type: The engine to create. Defaults to pytesseract.
+        tessdata_path (optional): The folder containing the traineddata files.
+        language: The Tesseract languages to load, joined by +, e.g.
+            "eng+chi_sim+jpn+kor+rus" for names in any of these scripts.
+            Defaults to eng.
+
+    Raises:
+        ImportError: If tesserocr was chosen but is not installed.
+
+    Returns:
+        The created engine.
+    """
+    match engine_type:
+        case OcrEngineType.TESSEROCR:
+            try:
+                return TesserocrEngine(tessdata_path=tessdata_path, language=language)
+            except ImportError as error:
+                raise ImportError(
+                    "The tesserocr engine needs the tesserocr package, install it "
+                    "with `poetry install --extras tesserocr` or "
+                    "`pip install tesserocr`, or set OCR_ENGINE=pytesseract."
+                ) from error
+            except RuntimeError as error:
+                print(f"Could not load tesserocr ({error}), using pytesseract.")
+                return PytesseractEngine(language=language)
+        case _:
+            return PytesseractEngine(language=language)
+
+
+@dataclass
+class OcrSettings:
+    engine: AbstractOcrEngine = field(default_factory=PytesseractEngine)
+    # Reads number fields before the engine is used, if an atlas was configured.
+    digit_reader: DigitReader | None = None
+    # Reads the names on profiles, which may be in any script, if configured.
+    # Without it, names are copied to the clipboard.
+    name_engine: AbstractOcrEngine | None = None
+    # Prepares crops for the engines with the profile of their bounding box.
+    preprocess: bool = True
+
+
+OCR = OcrSettings()
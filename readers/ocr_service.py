@@ -0,0 +1,182 @@
+"""Reads screens on a pool of processes, to use more than one core for OCR."""
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+import os
+from typing import Any, Callable, TypeVar
+
+import numpy
+from numpy import ndarray
+from pytesseract import pytesseract
+
+from readers.digits import DigitReader
+from readers.digits import GlyphAtlas
+from readers.ocr import get_ocr_engine
+from readers.ocr import OCR
+from readers.ocr import OcrEngineType
+from readers.screen import BoundingBox
+from readers.screen import read_at_bounding_box
+from readers.screen import read_numbers_at_bounding_box
+
+T = TypeVar("T")
+
+
+@dataclass
+class SharedFrame:
+    """
+    A reference to a frame in shared memory, which is cheap to send to a process.
+    """
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+def _initialize_worker(
+    engine_type: OcrEngineType,
+    tessdata_path: str | None,
+    tesseract_cmd: str | None,
+    digit_atlas_path: str | None,
+    preprocess: bool,
+) -> None:
+    """
+    Loads the OCR engine of a worker process once, before its first read.
+    """
+    OCR.preprocess = preprocess
+    if tesseract_cmd:
+        pytesseract.tesseract_cmd = tesseract_cmd
+    OCR.engine = get_ocr_engine(engine_type, tessdata_path=tessdata_path)
+    if digit_atlas_path:
+        OCR.digit_reader = DigitReader(GlyphAtlas.load(digit_atlas_path))
+
+
+def _read_shared_frame(
+    frame: SharedFrame, read: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    """
+    Runs a read on a frame in shared memory, inside a worker process.
+    """
+    # The workers are forked, see OcrService, so attaching registers the frame
+    # with the resource tracker of the main process, which unlinks it.
+    memory = shared_memory.SharedMemory(name=frame.name)
+    try:
+        image = numpy.ndarray(frame.shape, dtype=frame.dtype, buffer=memory.buf)
+        result = read(image, *args, **kwargs)
+        del image
+        return result
+    finally:
+        memory.close()
+
+
+class OcrService:
+    """
+    A pool of OCR processes, each with its own warm OCR engine.
+    Frames are copied into shared memory once and only their name is sent to the
+    workers, instead of pickling the whole ndarray per read.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        engine_type: OcrEngineType = OcrEngineType.PYTESSERACT,
+        tessdata_path: str | None = None,
+        digit_atlas_path: str | None = None,
+    ):
+        """
+        Args:
+            workers (optional): The amount of processes. Defaults to the CPU count.
+            engine_type: The OCR engine every process loads.
+            tessdata_path (optional): The folder containing the traineddata files.
+            digit_atlas_path (optional): The glyph atlas for the digit reader.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        # Forked workers share the resource tracker of this process, spawned ones
+        # may start their own, which would unlink the frames they attach to.
+        # Windows has no fork, but tracks no shared memory either.
+        start_method = (
+            "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        )
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_initialize_worker,
+            initargs=(
+                engine_type,
+                tessdata_path,
+                pytesseract.tesseract_cmd,
+                digit_atlas_path,
+                OCR.preprocess,
+            ),
+        )
+        # Forked workers all start on the first read. Starting them now, before
+        # the crawl's threads run, keeps them from inheriting a held lock.
+        # The tracker has to run before, or every worker starts its own.
+        resource_tracker.ensure_running()
+        self._executor.submit(os.getpid).result()
+
+    def read(
+        self, image: ndarray, read: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> Future[T]:
+        """
+        Runs a read on a worker process.
+
+        Args:
+            image: The image to read, it is copied to shared memory.
+            read: A module level function taking the image as first argument.
+            *args: Further arguments for the function.
+            **kwargs: Further keyword arguments for the function.
+
+        Returns:
+            The future of the function's result.
+        """
+        memory = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+        numpy.ndarray(image.shape, dtype=image.dtype, buffer=memory.buf)[:] = image
+        frame = SharedFrame(name=memory.name, shape=image.shape, dtype=image.dtype.str)
+
+        future = self._executor.submit(_read_shared_frame, frame, read, *args, **kwargs)
+        future.add_done_callback(lambda _: self._release(memory))
+        return future
+
+    def read_at_bounding_box(
+        self,
+        image: ndarray,
+        bounding_box: BoundingBox,
+        character_whitelist: str | None,
+    ) -> Future[str | None]:
+        """
+        Runs read_at_bounding_box on a worker process.
+
+        Returns:
+            The future of the string contained in the bounding box.
+        """
+        return self.read(
+            image,
+            read_at_bounding_box,
+            bounding_box=bounding_box,
+            character_whitelist=character_whitelist,
+        )
+
+    def read_numbers_at_bounding_box(
+        self, image: ndarray, bounding_box: BoundingBox
+    ) -> Future[int]:
+        """
+        Runs read_numbers_at_bounding_box on a worker process.
+
+        Returns:
+            The future of the number contained in the bounding box.
+        """
+        return self.read(image, read_numbers_at_bounding_box, bounding_box=bounding_box)
+
+    def close(self) -> None:
+        """
+        Waits for all reads and stops the worker processes.
+        """
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _release(memory: shared_memory.SharedMemory) -> None:
+        memory.close()
+        memory.unlink()
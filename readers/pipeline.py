@@ -0,0 +1,113 @@
+"""Reads captured screens on worker threads while the crawl goes on."""
+import logging
+from queue import Queue
+import threading
+from typing import Any, Callable
+
+from numpy import ndarray
+
+from instrumentation import PROFILER
+
+logger = logging.getLogger(__name__)
+
+# How often a screen is read before its rank counts as failed.
+READ_ATTEMPTS = 2
+
+
+class OcrPipeline:
+    """
+    Hands captured screens through a bounded queue to OCR worker threads.
+    The crawl only blocks on submit() if the workers fall behind by more than the
+    queue size, the results are collected by rank when the pipeline is closed.
+    A screen that can not be read is tried once more, then its rank and the error
+    are kept in `failures`.
+    """
+
+    def __init__(
+        self,
+        read_screen: Callable[[ndarray], dict[str, Any]],
+        workers: int = 2,
+        queue_size: int = 8,
+        on_result: Callable[[int, dict[str, Any]], None] | None = None,
+    ):
+        """
+        Args:
+            read_screen: Reads the fields of one screen.
+            workers: The amount of worker threads.
+            queue_size: How many screens may wait for a worker.
+            on_result (optional): Called on the worker with the rank and its
+                fields as soon as a screen is read.
+        """
+        self.read_screen = read_screen
+        self.on_result = on_result
+        self._queue: Queue[tuple[int, ndarray, dict[str, Any]] | None] = Queue(
+            maxsize=queue_size
+        )
+        self._results: dict[int, dict[str, Any]] = {}
+        # The error of every rank whose screen could not be read.
+        self.failures: dict[int, str] = {}
+        self._results_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"ocr-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, rank: int, image: ndarray, **known_fields: Any) -> None:
+        """
+        Queues a screen to be read.
+
+        Args:
+            rank: The rank the screen belongs to, results are collected by it.
+            image: The captured screen. It must not be modified afterwards.
+            **known_fields: Fields which are already known and added to the result.
+        """
+        self._queue.put((rank, image, known_fields))
+
+    def close(self) -> dict[int, dict[str, Any]]:
+        """
+        Waits until all queued screens are read and stops the workers.
+
+        Returns:
+            The fields read per rank, merged with the known fields.
+            Ranks that could not be read are in `failures` instead.
+        """
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        return dict(sorted(self._results.items()))
+
+    def _work(self) -> None:
+        while (item := self._queue.get()) is not None:
+            rank, image, known_fields = item
+            fields = self._read(rank, image)
+            if fields is None:
+                continue
+
+            result = {**known_fields, **fields}
+            with self._results_lock:
+                self._results[rank] = result
+            if self.on_result:
+                self.on_result(rank, result)
+
+    def _read(self, rank: int, image: ndarray) -> dict[str, Any] | None:
+        for attempt in range(1, READ_ATTEMPTS + 1):
+            try:
+                with PROFILER.rank(rank):
+                    return self.read_screen(image)
+            except Exception as error:
+                if attempt < READ_ATTEMPTS:
+                    logger.warning(
+                        "Could not read the screen of rank %d, retrying: %s",
+                        rank,
+                        error,
+                    )
+                    continue
+                logger.error(
+                    "Could not read the screen of rank %d", rank, exc_info=error
+                )
+                with self._results_lock:
+                    self.failures[rank] = f"{type(error).__name__}: {error}"
+        return None
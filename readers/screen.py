@@ -2,21 +2,31 @@
 from dataclasses import dataclass
 
 import cv2
+import numpy
 from numpy import ndarray
-from pytesseract import pytesseract
+
+from instrumentation import PROFILER
+from readers.frame_cache import FRAME_CACHE
+from readers.ocr import AbstractOcrEngine
+from readers.ocr import OCR
+from readers.preprocessing import preprocess
+from readers.preprocessing import PreprocessingProfile
+from readers.templates import TEMPLATES
 
 
 @dataclass
 class BoundingBox:
     """
     A dataclass holding information about a bounding box,
-    a rectangle of two coordinate sets.
+    a rectangle of two coordinate sets,
+    optionally with how its crop is prepared for OCR.
     """
 
     min_x: int
     min_y: int
     max_x: int
     max_y: int
+    preprocessing: PreprocessingProfile | None = None
 
     def to_tuple(self) -> tuple[int, int, int, int]:
         """
@@ -46,6 +56,34 @@ class BoundingBox:
         """
         return self.max_y - self.min_y
 
+    def clone(self):
+        """
+        Get a clone of the bounding box, safe for modification.
+
+        Returns:
+            The cloned bounding box.
+        """
+        return BoundingBox(
+            min_x=self.min_x,
+            min_y=self.min_y,
+            max_x=self.max_x,
+            max_y=self.max_y,
+            preprocessing=self.preprocessing,
+        )
+
+    def add(self, x: int, y: int):
+        """
+        Move the bounding box by the given values.
+
+        Returns:
+             The modified bounding box object.
+        """
+        self.min_x += x
+        self.max_x += x
+        self.min_y += y
+        self.max_y += y
+        return self
+
 
 @dataclass
 class Coordinate:
@@ -90,42 +128,200 @@ class ImageSearchResult(Coordinate):
         return Coordinate(self.x + (self.width // 2), self.y + (self.height // 2))
 
 
+@dataclass
+class Template:
+    """
+    An image to be searched on screen,
+    optionally with the area of the screen it can appear in.
+    """
+
+    path: str
+    search_region: BoundingBox | None = None
+    padding: int = 0
+
+    def get_search_area(
+        self, width: int, height: int, scale: float = 1.0
+    ) -> BoundingBox | None:
+        """
+        Get the padded search region, limited to the screen.
+
+        Args:
+            width: The width of the screen.
+            height: The height of the screen.
+            scale: The factor to resize the region by. Defaults to 1.0.
+
+        Returns:
+            The area to search in or None if the whole screen has to be searched.
+        """
+        if self.search_region is None:
+            return None
+
+        return BoundingBox(
+            min_x=max(0, int((self.search_region.min_x - self.padding) * scale)),
+            min_y=max(0, int((self.search_region.min_y - self.padding) * scale)),
+            max_x=min(width, int((self.search_region.max_x + self.padding) * scale)),
+            max_y=min(height, int((self.search_region.max_y + self.padding) * scale)),
+        )
+
+
 def get_on_screen(
-    image: ndarray, path: str, precision: float = 0.9
+    image: ndarray, template: Template, precision: float = 0.9, scale: float = 1.0
 ) -> ImageSearchResult | None:
     """
     Check if a given image is detected on screen in a specific window's area.
+    Only the template's search area is matched against, if it has one.
 
     Args:
         image: The image we should look at.
-        path: The relative or absolute path to the image to be found.
+        template: The image to be found.
         precision: The precision to be used when matching the image. Defaults to 0.9.
+        scale: The factor to resize the image to be found by,
+            for screens that are not 1280 x 720. Defaults to 1.0.
 
     Returns:
         The position of the image and it's width and height or None if it wasn't found
     """
-    image_to_find = cv2.imread(path, 0)
+    match = match_template(image=image, template=template, scale=scale)
+    if not match or match[0] < precision:
+        return None
+    return match[1]
+
+
+def match_template(
+    image: ndarray, template: Template, scale: float = 1.0
+) -> tuple[float, ImageSearchResult] | None:
+    """
+    Finds the best match of a template on an image, however good it is.
+
+    Args:
+        image: The image we should look at.
+        template: The image to be found.
+        scale: The factor to resize the image to be found by. Defaults to 1.0.
+
+    Returns:
+        The precision and position of the best match
+        or None if the template could not be matched at all.
+    """
+    image_to_find = TEMPLATES.get(template.path, scale=scale)
     if image_to_find is None:
         print(
-            f"The image {path} does not exist on the system "
+            f"The image {template.path} does not exist on the system "
             f"or we do not have permission to read it."
         )
         return None
 
-    search_result = cv2.matchTemplate(image, image_to_find, cv2.TM_CCOEFF_NORMED)
-
-    _, max_precision, _, max_location = cv2.minMaxLoc(search_result)
-    if max_precision < precision:
-        return None
-
-    return ImageSearchResult(
-        x=max_location[0],
-        y=max_location[1],
+    search_area = template.get_search_area(
+        width=image.shape[1], height=image.shape[0], scale=scale
+    )
+    offset_x = offset_y = 0
+    if search_area:
+        if (
+            search_area.get_width() < image_to_find.shape[1]
+            or search_area.get_height() < image_to_find.shape[0]
+        ):
+            return None
+
+        # Slicing creates a view, the screen is not copied.
+        image = image[
+            search_area.min_y : search_area.max_y,
+            search_area.min_x : search_area.max_x,
+        ]
+        offset_x, offset_y = search_area.min_x, search_area.min_y
+
+    def match() -> tuple[float, tuple[int, int]]:
+        with PROFILER.span("match_template"):
+            search_result = cv2.matchTemplate(
+                image, image_to_find, cv2.TM_CCOEFF_NORMED
+            )
+            _, precision, _, location = cv2.minMaxLoc(search_result)
+        return precision, location
+
+    # The location is relative to the searched area, so it is cached by its pixels.
+    max_precision, max_location = FRAME_CACHE.get_or_read(
+        image, ("match_template", template.path, scale), match
+    )
+    return max_precision, ImageSearchResult(
+        x=max_location[0] + offset_x,
+        y=max_location[1] + offset_y,
         height=image_to_find.shape[0],
         width=image_to_find.shape[1],
     )
 
 
+def crop(image: ndarray, bounding_box: BoundingBox) -> ndarray:
+    """
+    Get the part of an image inside a bounding box, as view on the image.
+
+    Args:
+        image: The image to crop.
+        bounding_box: The bounding box to crop the image down to.
+
+    Returns:
+        The cropped image, sharing the memory of the original image.
+    """
+    return image[
+        bounding_box.min_y : bounding_box.max_y, bounding_box.min_x : bounding_box.max_x
+    ]
+
+
+def get_preprocessing(bounding_box: BoundingBox) -> PreprocessingProfile | None:
+    """
+    Get how the crop of a bounding box is prepared for the OCR engine.
+
+    Args:
+        bounding_box: The bounding box to read.
+
+    Returns:
+        The profile of the bounding box, None if it has none or preprocessing
+        is turned off in OCR.
+    """
+    return bounding_box.preprocessing if OCR.preprocess else None
+
+
+def prepare_for_ocr(cropped_image: ndarray, bounding_box: BoundingBox) -> ndarray:
+    """
+    Prepares the crop of a bounding box for the OCR engine, see get_preprocessing.
+
+    Args:
+        cropped_image: The crop of the bounding box.
+        bounding_box: The bounding box the crop was taken from.
+
+    Returns:
+        The prepared crop, or the crop itself without a profile.
+    """
+    profile = get_preprocessing(bounding_box)
+    if profile is None:
+        return cropped_image
+    with PROFILER.span("preprocess"):
+        return preprocess(cropped_image, profile)
+
+
+def get_ocr_field(
+    kind: str,
+    character_whitelist: str | None,
+    preprocessing: PreprocessingProfile | None = None,
+) -> tuple:
+    """
+    Get the key of an OCR read in the frame cache, which differs per engine
+    configuration and preprocessing, as they may read the same pixels differently.
+
+    Args:
+        kind: How the area is read, e.g. "line".
+        character_whitelist (optional): The chars that are allowed to be recognized.
+        preprocessing (optional): How the area is prepared for the engine.
+
+    Returns:
+        The field of the read for FRAME_CACHE.
+    """
+    return (
+        kind,
+        character_whitelist,
+        preprocessing,
+        OCR.engine.get_cache_key(),
+        OCR.digit_reader.cache_key if OCR.digit_reader else None,
+    )
+
+
 def read_at_bounding_box(
     image: ndarray,
     bounding_box: BoundingBox,
@@ -133,6 +329,7 @@ def read_at_bounding_box(
 ) -> str | None:
     """
     Read numbers off an image, in a certain boundary box on the image.
+    If the same pixels were read before, the text is taken from FRAME_CACHE.
 
     Args:
         image: The image to look at.
@@ -145,14 +342,29 @@ def read_at_bounding_box(
         The string contained in the bounding box or None.
 
     """
-    tesseract_config = '--oem 3 --psm 7 -c page_separator=""'
-    if character_whitelist:
-        tesseract_config += f" -c tessedit_char_whitelist={character_whitelist}"
-
     cropped_image = image[
         bounding_box.min_y : bounding_box.max_y, bounding_box.min_x : bounding_box.max_x
     ]
-    return pytesseract.image_to_string(cropped_image, config=tesseract_config)
+
+    def read() -> str | None:
+        if OCR.digit_reader and OCR.digit_reader.can_read(character_whitelist):
+            with PROFILER.span("digit_reader"):
+                text = OCR.digit_reader.read_confident(cropped_image)
+            if text is not None:
+                return text
+
+        # The digit reader binarizes on its own, only the engine gets the prepared crop.
+        prepared_image = prepare_for_ocr(cropped_image, bounding_box)
+        with PROFILER.span("ocr_engine"):
+            return OCR.engine.read_line(
+                prepared_image, character_whitelist=character_whitelist
+            )
+
+    return FRAME_CACHE.get_or_read(
+        cropped_image,
+        get_ocr_field("line", character_whitelist, get_preprocessing(bounding_box)),
+        read,
+    )
 
 
 def read_numbers_at_bounding_box(image: ndarray, bounding_box: BoundingBox) -> int:
@@ -174,3 +386,201 @@ def read_numbers_at_bounding_box(image: ndarray, bounding_box: BoundingBox) -> i
         )
         or 0
     )
+
+
+def read_text_with_confidence(
+    image: ndarray, bounding_box: BoundingBox, engine: AbstractOcrEngine
+) -> tuple[str, float]:
+    """
+    Read a line of text in any characters off an image, with how sure the engine is.
+
+    Args:
+        image: The image to look at.
+        bounding_box: The bounding box to crop the image down to.
+        engine: The engine to read with, e.g. one with a multi-script model.
+
+    Returns:
+        The text and the lowest confidence of its words from 0 to 100,
+        0 if nothing was recognized.
+    """
+    cropped_image = crop(image, bounding_box)
+
+    def read() -> tuple[str, float]:
+        prepared_image = prepare_for_ocr(cropped_image, bounding_box)
+        with PROFILER.span("ocr_engine"):
+            words = engine.read_words(prepared_image, character_whitelist=None)
+        if not words:
+            return "", 0.0
+        return (
+            " ".join(word.text for word in words),
+            min(word.confidence for word in words),
+        )
+
+    return FRAME_CACHE.get_or_read(
+        cropped_image,
+        ("confident", engine.get_cache_key(), get_preprocessing(bounding_box)),
+        read,
+    )
+
+
+# Rows of background between two stitched crops, so Tesseract sees separate lines.
+STITCH_GAP = 20
+
+
+def read_at_bounding_boxes(
+    image: ndarray,
+    bounding_boxes: dict[str, BoundingBox],
+    character_whitelist: str | None,
+) -> dict[str, str]:
+    """
+    Read text off an image in several bounding boxes with a single OCR call.
+    The crops are scaled to the same height and stacked below each other, and every
+    recognized word is assigned back to the crop it overlaps most. Crops no word
+    was assigned to are read again on their own. Crops the digit reader reads
+    confidently and crops whose pixels were read before, see FRAME_CACHE, are left
+    out of the OCR call.
+
+    Args:
+        image: The image to look at.
+        bounding_boxes: The bounding boxes to read, by a name of your choice.
+        character_whitelist (optional): The chars that are allowed to be recognized.
+
+    Returns:
+        The text read in every bounding box, by the given names.
+    """
+    fields = {
+        name: get_ocr_field(
+            "words", character_whitelist, get_preprocessing(bounding_box)
+        )
+        for name, bounding_box in bounding_boxes.items()
+    }
+    texts = {}
+    uncached = {}
+    for name, bounding_box in bounding_boxes.items():
+        cached, text = FRAME_CACHE.get(crop(image, bounding_box), fields[name])
+        if cached:
+            texts[name] = text
+        else:
+            uncached[name] = bounding_box
+    if not uncached:
+        return texts
+
+    read_texts = _read_at_bounding_boxes(image, uncached, character_whitelist)
+    for name, text in read_texts.items():
+        FRAME_CACHE.put(crop(image, uncached[name]), fields[name], text)
+    texts.update(read_texts)
+    return texts
+
+
+def _read_at_bounding_boxes(
+    image: ndarray,
+    bounding_boxes: dict[str, BoundingBox],
+    character_whitelist: str | None,
+) -> dict[str, str]:
+    texts = {}
+    if OCR.digit_reader and OCR.digit_reader.can_read(character_whitelist):
+        with PROFILER.span("digit_reader"):
+            for name, bounding_box in bounding_boxes.items():
+                text = OCR.digit_reader.read_confident(
+                    image[
+                        bounding_box.min_y : bounding_box.max_y,
+                        bounding_box.min_x : bounding_box.max_x,
+                    ]
+                )
+                if text is not None:
+                    texts[name] = text
+        bounding_boxes = {
+            name: bounding_box
+            for name, bounding_box in bounding_boxes.items()
+            if name not in texts
+        }
+        if not bounding_boxes:
+            return texts
+
+    # Prepared crops may be larger than their bounding box, e.g. when upscaled.
+    # They are scaled to one height, as Tesseract reads a block of rows best
+    # if the rows have the same text size and spacing.
+    cropped_images = {
+        name: prepare_for_ocr(crop(image, bounding_box), bounding_box)
+        for name, bounding_box in bounding_boxes.items()
+    }
+    height = max(cropped_image.shape[0] for cropped_image in cropped_images.values())
+    for name, cropped_image in cropped_images.items():
+        if cropped_image.shape[0] != height:
+            scale = height / cropped_image.shape[0]
+            cropped_images[name] = cv2.resize(
+                cropped_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC
+            )
+    max_width = max(cropped_image.shape[1] for cropped_image in cropped_images.values())
+    strips = []
+    strip_ranges = {}
+    top = 0
+    for name, cropped_image in cropped_images.items():
+        background = int(
+            numpy.median(numpy.concatenate((cropped_image[0], cropped_image[-1])))
+        )
+        strips.append(
+            cv2.copyMakeBorder(
+                cropped_image,
+                top=0,
+                bottom=STITCH_GAP,
+                left=0,
+                right=max_width - cropped_image.shape[1],
+                borderType=cv2.BORDER_CONSTANT,
+                value=background,
+            )
+        )
+        strip_ranges[name] = (top, top + height)
+        top += height + STITCH_GAP
+
+    with PROFILER.span("ocr_engine"):
+        words = OCR.engine.read_words(
+            numpy.vstack(strips), character_whitelist=character_whitelist
+        )
+
+    strip_words = {name: [] for name in bounding_boxes}
+    for word in words:
+        # A word in a gap or across two strips belongs to the one it overlaps most.
+        name, overlap = max(
+            (
+                (
+                    name,
+                    min(word.top + word.height, strip_bottom)
+                    - max(word.top, strip_top),
+                )
+                for name, (strip_top, strip_bottom) in strip_ranges.items()
+            ),
+            key=lambda item: item[1],
+        )
+        if overlap > 0:
+            strip_words[name].append(word.text)
+
+    for name, found in strip_words.items():
+        if found:
+            texts[name] = " ".join(found)
+            continue
+        # Nothing was assigned to the crop, so it is read as a single line instead.
+        with PROFILER.span("ocr_engine"):
+            texts[name] = OCR.engine.read_line(
+                cropped_images[name], character_whitelist=character_whitelist
+            ).strip()
+    return texts
+
+
+def read_numbers_at_bounding_boxes(
+    image: ndarray, bounding_boxes: dict[str, BoundingBox]
+) -> dict[str, int]:
+    """
+    Read numbers off an image in several bounding boxes with a single OCR call.
+
+    Args:
+        image: The image to look at.
+        bounding_boxes: The bounding boxes to read, by a name of your choice.
+
+    Returns:
+        The number contained in every bounding box or 0, by the given names.
+    """
+    texts = read_at_bounding_boxes(
+        image=image, bounding_boxes=bounding_boxes, character_whitelist="0123456789"
+    )
+    return {name: int(text.replace(" ", "") or 0) for name, text in texts.items()}
@@ -0,0 +1,101 @@
+"""A cache for the images searched on screen, so they are read from disk only once."""
+from typing import Iterable
+
+import cv2
+import numpy
+from numpy import ndarray
+
+
+class TemplateCache:
+    """
+    Holds grayscale template images by path and scale.
+    Every template is stored as a C-contiguous array, which is what
+    cv2.matchTemplate works on without converting.
+    """
+
+    def __init__(self):
+        self._templates: dict[tuple[str, float], ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def preload(self, paths: Iterable[str], scales: Iterable[float] = (1.0,)) -> None:
+        """
+        Reads the given templates and computes their scaled variants.
+
+        Args:
+            paths: The relative or absolute paths to the images.
+            scales: The scales to keep a variant of, e.g. 1.5 for a 1920x1080 screen.
+        """
+        scales = tuple(scales)
+        for path in paths:
+            for scale in scales:
+                self._load(path, scale)
+
+    def get(self, path: str, scale: float = 1.0) -> ndarray | None:
+        """
+        Get a template, reading it from disk if it was not loaded before.
+
+        Args:
+            path: The relative or absolute path to the image.
+            scale: The factor the image should be resized by.
+
+        Returns:
+            The grayscale template or None if the image could not be read.
+        """
+        template = self._templates.get((path, scale))
+        if template is not None:
+            self.hits += 1
+            return template
+
+        self.misses += 1
+        return self._load(path, scale)
+
+    def clear(self) -> None:
+        """
+        Removes all templates and resets the counters.
+        """
+        self._templates.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, path: str, scale: float) -> ndarray | None:
+        """
+        Reads and scales a template and stores it.
+
+        Args:
+            path: The relative or absolute path to the image.
+            scale: The factor the image should be resized by.
+
+        Returns:
+            The grayscale template or None if the image could not be read.
+        """
+        template = self._templates.get((path, 1.0))
+        if template is None:
+            template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if template is None:
+                return None
+            template = numpy.ascontiguousarray(template)
+            self._templates[(path, 1.0)] = template
+
+        if scale != 1.0:
+            template = numpy.ascontiguousarray(
+                cv2.resize(
+                    template,
+                    None,
+                    fx=scale,
+                    fy=scale,
+                    interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR,
+                )
+            )
+            self._templates[(path, scale)] = template
+
+        return template
+
+    def __str__(self):
+        return (
+            f"{len(self._templates)} templates cached, "
+            f"{self.hits} hits, {self.misses} misses"
+        )
+
+
+TEMPLATES = TemplateCache()
@@ -0,0 +1,215 @@
+"""Drives AdbClient against a fake adb server, which runs a local `sh` as shell."""
+import socket
+import socketserver
+import struct
+import subprocess
+import threading
+from typing import Iterator
+
+import pytest
+
+from emulator.adb_client import AdbClient
+from emulator.adb_client import AdbProtocolError
+
+SERIAL = "emulator-5554"
+EXEC_OUTPUTS = {
+    "echo binary": b"\x00\x01\r\n\xff",
+    "screencap": b"\x02\x00\x00\x00\x01\x00\x00\x00\x01\x00\x00\x00" + bytes(8),
+}
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # The files of the device by path, as mode, modification time and content.
+    files: dict[str, tuple[int, int, bytes]]
+    # The sizes of the DATA chunks of every pushed file by path.
+    pushed_chunks: dict[str, list[int]]
+
+
+class FakeAdbHandler(socketserver.BaseRequestHandler):
+    """
+    Answers the host protocol for one device. exec: services answer with a canned
+    output, the shell service pipes the connection through `sh` and the sync service
+    serves the server's files.
+    """
+
+    def handle(self) -> None:
+        request = self.read_request()
+        if request == "host:version":
+            self.request.sendall(b"OKAY00040029")
+            return
+        if request != f"host:transport:{SERIAL}":
+            self.fail(f"device '{request.split(':')[-1]}' not found")
+            return
+        self.request.sendall(b"OKAY")
+
+        service = self.read_request()
+        if service.startswith("exec:") and service[5:] in EXEC_OUTPUTS:
+            self.request.sendall(b"OKAY" + EXEC_OUTPUTS[service[5:]])
+        elif service == "shell,raw:":
+            self.request.sendall(b"OKAY")
+            subprocess.run(
+                ["sh"], stdin=self.request.fileno(), stdout=self.request.fileno()
+            )
+        elif service == "sync:":
+            self.request.sendall(b"OKAY")
+            self.handle_sync()
+        else:
+            self.fail(f"unknown service {service}")
+
+    def handle_sync(self) -> None:
+        while True:
+            request_id, length = self.read_sync_header()
+            if request_id == b"QUIT":
+                return
+            path = self.read_exactly(length).decode("UTF-8")
+            if request_id == b"STAT":
+                mode, mtime, data = self.server.files.get(path, (0, 0, b""))
+                self.request.sendall(
+                    b"STAT" + struct.pack("<3I", mode, len(data), mtime)
+                )
+            elif request_id == b"RECV":
+                if path not in self.server.files:
+                    self.fail_sync(f"remote object '{path}' does not exist")
+                    return
+                data = self.server.files[path][2]
+                # Smaller chunks than adb sends, so a file of a test spans several.
+                for offset in range(0, len(data), 1000):
+                    chunk = data[offset : offset + 1000]
+                    self.request.sendall(
+                        b"DATA" + struct.pack("<I", len(chunk)) + chunk
+                    )
+                self.request.sendall(b"DONE" + struct.pack("<I", 0))
+            elif request_id == b"SEND":
+                path, mode = path.rsplit(",", 1)
+                chunks = []
+                while (header := self.read_sync_header())[0] == b"DATA":
+                    chunks.append(self.read_exactly(header[1]))
+                if path.startswith("/system/"):
+                    self.fail_sync("Read-only file system")
+                    return
+                data = b"".join(chunks)
+                self.server.files[path] = (int(mode), header[1], data)
+                self.server.pushed_chunks[path] = [len(chunk) for chunk in chunks]
+                self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+
+    def read_sync_header(self) -> tuple[bytes, int]:
+        header = self.read_exactly(8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    def fail_sync(self, message: str) -> None:
+        """Answers with FAIL, after which adbd ends the sync service."""
+        data = message.encode("UTF-8")
+        self.request.sendall(b"FAIL" + struct.pack("<I", len(data)) + data)
+
+    def read_request(self) -> str:
+        return self.read_exactly(int(self.read_exactly(4), 16)).decode("UTF-8")
+
+    def read_exactly(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def fail(self, message: str) -> None:
+        data = message.encode("UTF-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+
+@pytest.fixture
+def server() -> Iterator[FakeAdbServer]:
+    fake_server = FakeAdbServer(("127.0.0.1", 0), FakeAdbHandler)
+    fake_server.files = {}
+    fake_server.pushed_chunks = {}
+    threading.Thread(target=fake_server.serve_forever, daemon=True).start()
+    yield fake_server
+    fake_server.shutdown()
+    fake_server.server_close()
+
+
+@pytest.fixture
+def client(server: FakeAdbServer) -> Iterator[AdbClient]:
+    adb_client = AdbClient(port=server.server_address[1], timeout=2)
+    yield adb_client
+    adb_client.close()
+
+
+def test_host_command(client: AdbClient):
+    assert client.host_command("host:version") == "0029"
+
+
+def test_exec_out_is_binary_safe(client: AdbClient):
+    assert client.exec_out(SERIAL, "echo binary") == EXEC_OUTPUTS["echo binary"]
+
+
+def test_read_raw_screen(client: AdbClient):
+    screen = client.read_raw_screen(SERIAL)
+    assert bytes(screen) == EXEC_OUTPUTS["screencap"]
+    screen.release()
+
+
+def test_unknown_device_fails(client: AdbClient):
+    with pytest.raises(AdbProtocolError, match="not found"):
+        client.exec_out("emulator-5556", "echo binary")
+
+
+def test_shell(client: AdbClient):
+    assert client.shell(SERIAL, "echo one; echo two >&2") == "one\ntwo"
+    with pytest.raises(subprocess.CalledProcessError):
+        client.shell(SERIAL, "false")
+    assert client.shell(SERIAL, "echo ok") == "ok"
+
+
+def test_hung_shell_times_out(client: AdbClient):
+    client.timeout = 0.5
+    with pytest.raises(subprocess.TimeoutExpired):
+        client.shell(SERIAL, "sleep 5")
+    client.timeout = 2
+    assert client.shell(SERIAL, "echo ok") == "ok"
+
+
+def test_dead_server_times_out():
+    # A listening socket that never answers.
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        adb_client = AdbClient(port=server.getsockname()[1], timeout=0.5)
+        with pytest.raises(TimeoutError):
+            adb_client.exec_out(SERIAL, "echo binary")
+
+
+def test_sync_stat(client: AdbClient, server: FakeAdbServer):
+    server.files["/sdcard/names.txt"] = (0o100644, 1700000000, b"Anna\nBert\n")
+
+    sync = client.get_sync(SERIAL)
+    assert sync.stat("/sdcard/names.txt") == (0o100644, 10, 1700000000)
+    assert sync.stat("/sdcard/missing.txt") == (0, 0, 0)
+
+
+def test_sync_pull_of_several_chunks(client: AdbClient, server: FakeAdbServer):
+    data = bytes(range(256)) * 10
+    server.files["/sdcard/screen.raw"] = (0o100644, 0, data)
+
+    assert client.get_sync(SERIAL).pull("/sdcard/screen.raw") == data
+
+
+def test_sync_push_of_several_chunks(client: AdbClient, server: FakeAdbServer):
+    data = bytes(range(256)) * 600
+
+    client.get_sync(SERIAL).push(data, "/sdcard/atlas.npz", mtime=1700000000)
+
+    assert server.files["/sdcard/atlas.npz"] == (0o644, 1700000000, data)
+    assert server.pushed_chunks["/sdcard/atlas.npz"] == [65536, 65536, 22528]
+
+
+def test_sync_failures(client: AdbClient):
+    with pytest.raises(AdbProtocolError, match="does not exist"):
+        client.get_sync(SERIAL).pull("/sdcard/missing.txt")
+    # The failed connection is replaced by a new one.
+    with pytest.raises(AdbProtocolError, match="Read-only"):
+        client.get_sync(SERIAL).push(b"data", "/system/names.txt")
+    assert client.get_sync(SERIAL).stat("/sdcard/missing.txt") == (0, 0, 0)
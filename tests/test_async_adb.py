@@ -0,0 +1,105 @@
+"""Drives the asyncio device helpers over every transport, with fake devices."""
+import asyncio
+from pathlib import Path
+import subprocess
+import threading
+from typing import Iterator
+
+import numpy
+import pytest
+
+from emulator import adb_integration
+from emulator import async_adb
+from emulator.adb_client import AdbClient
+from emulator.adb_integration import AdbDevice
+from emulator.adb_integration import AdbTransport
+from emulator.recording import load_events
+from emulator.recording import SessionRecorder
+from emulator.recording import SessionReplay
+from tests.test_adb_client import FakeAdbHandler
+from tests.test_adb_client import FakeAdbServer
+from tests.test_adb_client import SERIAL
+from tests.test_shell_session import write_fake_adb
+
+
+@pytest.fixture
+def device(tmp_path: Path) -> AdbDevice:
+    return AdbDevice(adb_path=write_fake_adb(tmp_path), device_name="fake")
+
+
+def test_session_per_event_loop(device: AdbDevice):
+    async def run_and_close(command: str) -> str:
+        try:
+            return await async_adb.run_shell(command, device)
+        finally:
+            await async_adb.close_shell_session(device)
+
+    async def run_and_keep(command: str) -> str:
+        return await async_adb.run_shell(command, device)
+
+    assert async_adb.run_sync(run_and_keep("echo one")) == "one"
+    assert asyncio.run(run_and_close("echo two")) == "two"
+    assert async_adb.run_sync(run_and_keep("echo three")) == "three"
+    assert len(device.async_sessions) == 1
+
+    async_adb.run_sync(async_adb.close_shell_session(device))
+
+
+def test_commands_are_recorded(device: AdbDevice, tmp_path: Path):
+    device.recorder = SessionRecorder(tmp_path / "recording")
+
+    async def run() -> None:
+        assert await async_adb.run_shell("echo one", device) == "one"
+        with pytest.raises(subprocess.CalledProcessError):
+            await async_adb.run_shell("echo failed; false", device)
+        await async_adb.close_shell_session(device)
+
+    asyncio.run(run())
+    device.recorder.close()
+
+    events = load_events(tmp_path / "recording")
+    assert [(event["command"], event["status"]) for event in events] == [
+        ("echo one", 0),
+        ("echo failed; false", 1),
+    ]
+
+
+def test_replay_transport(tmp_path: Path):
+    recorder = SessionRecorder(tmp_path)
+    recorder.record_frame(numpy.full((3, 4), 10, numpy.uint8), 0)
+    recorder.record_command("input keyevent KEYCODE_BACK", "", 0, 0)
+    recorder.close()
+    device = AdbDevice(transport=AdbTransport.REPLAY, replay=SessionReplay(tmp_path))
+
+    async def run() -> None:
+        assert (await async_adb.get_grayscale_screen(device) == 10).all()
+        await async_adb.go_back(device)
+        with pytest.raises(ValueError):
+            await async_adb.read_raw_screen(device)
+        with pytest.raises(ValueError):
+            await async_adb.get_shell_session(device)
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def socket_device(monkeypatch: pytest.MonkeyPatch) -> Iterator[AdbDevice]:
+    server = FakeAdbServer(("127.0.0.1", 0), FakeAdbHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = AdbClient(port=server.server_address[1], timeout=2)
+    monkeypatch.setattr(adb_integration, "_ADB_CLIENT", client)
+    yield AdbDevice(device_name=SERIAL, transport=AdbTransport.SOCKET)
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_socket_transport(socket_device: AdbDevice):
+    async def run() -> None:
+        assert await async_adb.run_shell("echo one", socket_device) == "one"
+        raw_screen = await async_adb.read_raw_screen(socket_device)
+        assert isinstance(raw_screen, bytes)
+        assert raw_screen[:4] == b"\x02\x00\x00\x00"
+
+    asyncio.run(run())
+    assert not socket_device.async_sessions
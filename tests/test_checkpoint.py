@@ -0,0 +1,152 @@
+"""Resumes crawls from hand-written journals."""
+import json
+from pathlib import Path
+
+from logic.checkpoint import CheckpointJournal
+from logic.checkpoint import CrawlPosition
+
+START = {"type": "start", "alliance": "Dragons", "own_position": 3, "last_rank": 6}
+
+
+def position(rank: int, scrolls: int, y: int) -> dict:
+    return {
+        "type": "position",
+        "rank": rank,
+        "scrolls": scrolls,
+        "coordinates": {"list_entry": [540, y]},
+    }
+
+
+def row(rank: int) -> dict:
+    return {"type": "row", "rank": rank, "row": {"name": f"Member {rank}"}}
+
+
+def write_journal(path: Path, *records: dict | str) -> CheckpointJournal:
+    """Writes records as JSON lines, strings as they are, e.g. a cut-off line."""
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(record if isinstance(record, str) else json.dumps(record) + "\n")
+    return CheckpointJournal(str(path))
+
+
+def test_resumes_at_the_first_rank_without_a_row(tmp_path: Path):
+    journal = write_journal(
+        tmp_path / "journal.jsonl",
+        START,
+        position(1, 0, 300),
+        position(2, 1, 300),
+        row(2),
+        position(4, 2, 300),
+        row(1),
+        row(4),
+        position(5, 3, 300),
+    )
+
+    checkpoint = journal.load("Dragons")
+
+    assert checkpoint.own_position == 3
+    assert checkpoint.last_rank == 6
+    assert checkpoint.position == CrawlPosition(
+        rank=5, scrolls=3, coordinates={"list_entry": (540, 300)}
+    )
+    assert sorted(checkpoint.rows) == [1, 2, 4]
+
+
+def test_rows_read_after_a_gap_do_not_move_the_resume_position(tmp_path: Path):
+    # Rank 2 is still on a worker, while 4 was read already.
+    journal = write_journal(
+        tmp_path / "journal.jsonl",
+        START,
+        position(1, 0, 300),
+        row(1),
+        position(2, 1, 300),
+        position(4, 2, 300),
+        row(4),
+    )
+
+    assert journal.load("Dragons").position.rank == 2
+
+
+def test_a_retried_rank_keeps_its_first_position(tmp_path: Path):
+    journal = write_journal(
+        tmp_path / "journal.jsonl",
+        START,
+        position(1, 0, 300),
+        row(1),
+        position(2, 1, 300),
+        # The retry moved the entry coordinates.
+        position(2, 1, 375),
+    )
+
+    checkpoint = journal.load("Dragons")
+
+    assert checkpoint.position.rank == 2
+    assert checkpoint.position.coordinates == {"list_entry": (540, 300)}
+
+
+def test_resumes_at_the_last_rank_if_every_rank_has_a_row(tmp_path: Path):
+    journal = write_journal(
+        tmp_path / "journal.jsonl",
+        START,
+        position(1, 0, 300),
+        row(1),
+        position(2, 1, 300),
+        row(2),
+    )
+
+    assert journal.load("Dragons").position.rank == 2
+
+
+def test_a_cut_off_line_is_skipped(tmp_path: Path):
+    journal = write_journal(
+        tmp_path / "journal.jsonl",
+        START,
+        position(1, 0, 300),
+        row(1),
+        position(2, 1, 300),
+        '{"type": "row", "rank": 2, "row": {"na',
+    )
+
+    checkpoint = journal.load("Dragons")
+
+    assert checkpoint.position.rank == 2
+    assert sorted(checkpoint.rows) == [1]
+
+
+def test_resuming_appends_after_a_cut_off_line(tmp_path: Path):
+    path = tmp_path / "journal.jsonl"
+    journal = write_journal(
+        path,
+        START,
+        position(1, 0, 300),
+        '{"type": "row", "rank": 1, "row": {"na',
+    )
+    journal.start("Dragons", own_position=3, last_rank=6, resume=True)
+    journal.record_row(1, {"name": "Member 1"})
+    journal.record_position(
+        CrawlPosition(rank=2, scrolls=1, coordinates={"list_entry": (540, 300)})
+    )
+    journal.close()
+
+    checkpoint = CheckpointJournal(str(path)).load("Dragons")
+
+    assert checkpoint.rows == {1: {"name": "Member 1"}}
+    assert checkpoint.position.rank == 2
+
+
+def test_nothing_to_resume(tmp_path: Path):
+    path = tmp_path / "journal.jsonl"
+    assert CheckpointJournal(str(path)).load("Dragons") is None
+
+    journal = write_journal(path, START, position(1, 0, 300), row(1))
+    assert journal.load("Giants") is None
+
+    journal = write_journal(path, START, position(1, 0, 300), {"type": "complete"})
+    assert journal.load("Dragons") is None
+
+    journal = write_journal(path, START)
+    assert journal.load("Dragons") is None
+
+    # The start record was cut off.
+    journal = write_journal(path, '{"type": "sta\n', position(1, 0, 300))
+    assert journal.load("Dragons") is None
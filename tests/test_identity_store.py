@@ -0,0 +1,57 @@
+"""Matches list rows to known members in a temporary identity store."""
+from pathlib import Path
+import sqlite3
+
+from logic.identity_store import IdentityStore
+
+
+def test_equal_name_hashes_do_not_match_other_names(tmp_path: Path):
+    store = IdentityStore(str(tmp_path / "identities.sqlite3"))
+    # Short names like these hash alike.
+    store.remember(lord_id=1, name="Bob", rank=1, power=10, name_hash=0xABC)
+    store.remember(lord_id=2, name="Tim", rank=2, power=20, name_hash=0xABC)
+
+    assert store.find(name="Max", name_hash=0xABC) is None
+    assert store.find(name="", name_hash=0xABC) is None
+    assert store.find(name="Tim", name_hash=0xABC).lord_id == 2
+    store.close()
+
+
+def test_name_hash_tells_apart_equal_names(tmp_path: Path):
+    store = IdentityStore(str(tmp_path / "identities.sqlite3"))
+    store.remember(lord_id=1, name="Bob", rank=1, power=10, name_hash=0x0F)
+    store.remember(lord_id=2, name="Bob", rank=2, power=20, name_hash=0xF0F0)
+
+    assert store.find(name="Bob", name_hash=0xF0F0).lord_id == 2
+    assert store.find(name="Bob", name_hash=0xFFFFFF) is None
+    store.close()
+
+
+def test_name_as_read_from_the_list_matches(tmp_path: Path):
+    path = str(tmp_path / "identities.sqlite3")
+    store = IdentityStore(path)
+    store.remember(
+        lord_id=1, name="Björn", rank=1, power=10, name_hash=0, list_name="Bjorn"
+    )
+    store.close()
+
+    store = IdentityStore(path)
+    assert store.find(name="Bjorn", name_hash=0xFFFF).lord_id == 1
+    store.close()
+
+
+def test_store_without_list_names_is_migrated(tmp_path: Path):
+    path = str(tmp_path / "identities.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE identities (lord_id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+        "rank INTEGER NOT NULL, power INTEGER NOT NULL, name_hash TEXT NOT NULL, "
+        "last_seen REAL NOT NULL)"
+    )
+    connection.execute("INSERT INTO identities VALUES (1, 'Bob', 1, 10, 'abc', 1e12)")
+    connection.commit()
+    connection.close()
+
+    store = IdentityStore(path)
+    assert store.find(name="Bob", name_hash=0).lord_id == 1
+    store.close()
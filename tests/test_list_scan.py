@@ -0,0 +1,132 @@
+"""Scans a fake rankings list, whose rows and profiles are given by the tests."""
+from pathlib import Path
+
+import numpy
+import pytest
+
+from logic import list_scan
+from logic.identity_store import IdentityStore
+from logic.identity_store import SnapshotRow
+from logic.list_scan import ListRow
+from logic.list_scan import ListScanStatistics
+from logic.list_scan import scan_rankings_list
+
+FRAME = numpy.zeros((720, 1280), numpy.uint8)
+
+
+class FakeTracker:
+    offset = 0
+
+    def scroll(self, rows: int) -> numpy.ndarray:
+        return FRAME
+
+
+@pytest.fixture
+def opened_ranks(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    opened = []
+
+    def open_profile(row: ListRow, previous_name: str | None):
+        opened.append(row.rank)
+        profile = {"lord_id": 100 + row.rank, "name": row.name, "power": row.power}
+        return {**profile, "merit": 0}, previous_name
+
+    monkeypatch.setattr(list_scan, "get_grayscale_screen", lambda: FRAME)
+    monkeypatch.setattr(list_scan, "open_profile", open_profile)
+    return opened
+
+
+def show_rows(monkeypatch: pytest.MonkeyPatch, rows: list[tuple[str, int]]) -> None:
+    list_rows = [
+        ListRow(
+            rank=index + 1,
+            name=name,
+            power=power,
+            index=index,
+            name_hash=len(name),
+            row_hash=power,
+        )
+        for index, (name, power) in enumerate(rows)
+    ]
+    monkeypatch.setattr(list_scan, "read_visible_rows", lambda *_, **__: list_rows)
+
+
+def test_delta_scan_looks_up_rows_moved_by_another_member(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, opened_ranks: list[int]
+):
+    store = IdentityStore(str(tmp_path / "identities.sqlite3"))
+    members = [("Anna", 100), ("Bert", 90), ("Carl", 80), ("Dora", 70)]
+    show_rows(monkeypatch, members)
+    first = scan_rankings_list(
+        member_count=4, identity_store=store, tracker=FakeTracker()
+    )
+    assert opened_ranks == [1, 2, 3, 4]
+
+    # Dora gained power, so everyone below her moved down a rank.
+    show_rows(monkeypatch, [("Anna", 100), ("Dora", 95), ("Bert", 90), ("Carl", 80)])
+    statistics = ListScanStatistics()
+    second = scan_rankings_list(
+        member_count=4,
+        identity_store=store,
+        previous_snapshot=first.snapshot,
+        statistics=statistics,
+        tracker=FakeTracker(),
+    )
+
+    assert opened_ranks == [1, 2, 3, 4]
+    assert statistics.profiles_opened == 0
+    assert second.snapshot[2] == SnapshotRow(
+        rank=2, lord_id=104, name="Dora", power=95, row_hash=95
+    )
+    assert second.complete and not second.departed
+    store.close()
+
+
+def test_delta_scan_opens_unknown_members(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, opened_ranks: list[int]
+):
+    store = IdentityStore(str(tmp_path / "identities.sqlite3"))
+    previous_snapshot = {
+        1: SnapshotRow(rank=1, lord_id=101, name="Anna", power=100, row_hash=100)
+    }
+    show_rows(monkeypatch, [("Anna", 100), ("Erik", 50)])
+    scan_rankings_list(
+        member_count=2,
+        identity_store=store,
+        previous_snapshot=previous_snapshot,
+        tracker=FakeTracker(),
+    )
+    assert opened_ranks == [2]
+    store.close()
+
+
+def test_back_is_pressed_until_the_list_is_shown(monkeypatch: pytest.MonkeyPatch):
+    screens = ["popup", "profile", "list"]
+    presses = []
+    monkeypatch.setattr(list_scan, "is_rankings_list", lambda image: image == "list")
+    monkeypatch.setattr(list_scan, "go_back", lambda: presses.append(screens.pop(0)))
+    monkeypatch.setattr(
+        list_scan, "wait_for_screen_settled", lambda *_, **__: screens[0]
+    )
+
+    assert list_scan.return_to_rankings_list("popup") == "list"
+    assert presses == ["popup", "profile"]
+
+    monkeypatch.setattr(list_scan, "go_back", lambda: presses.append("popup"))
+    monkeypatch.setattr(list_scan, "wait_for_screen_settled", lambda *_, **__: "popup")
+    with pytest.raises(list_scan.ListLostError):
+        list_scan.return_to_rankings_list("popup")
+
+
+def test_scan_stops_when_the_list_is_lost(
+    monkeypatch: pytest.MonkeyPatch, opened_ranks: list[int]
+):
+    def open_profile(row: ListRow, previous_name: str | None):
+        opened_ranks.append(row.rank)
+        raise list_scan.ListLostError("The list is gone.")
+
+    monkeypatch.setattr(list_scan, "open_profile", open_profile)
+    show_rows(monkeypatch, [("Anna", 100), ("Bert", 90)])
+    result = scan_rankings_list(member_count=2, tracker=FakeTracker())
+
+    assert opened_ranks == [1]
+    assert result.missing_ranks == [1, 2]
@@ -0,0 +1,78 @@
+"""Measures scrolls of a synthetic rankings list, rows of separators and text."""
+import numpy
+import pytest
+
+import constants
+from logic import list_tracker
+from logic.list_tracker import ListTracker
+from logic.list_tracker import measure_scroll
+
+LIST_TOP = constants.BoundingBoxes.LIST.min_y
+ROWS = 12
+
+
+def draw_list(rows: int = ROWS) -> numpy.ndarray:
+    """Draws the content of a list with a separator and random text blocks per row."""
+    rng = numpy.random.default_rng(7)
+    distance = constants.Offsets.ENTRY_DISTANCE
+    content = numpy.full((rows * distance, 1280), 200, numpy.uint8)
+    for row in range(rows):
+        top = row * distance
+        content[top : top + 2, 150:1080] = 120
+        for left in range(160, 1000, 60):
+            if rng.random() < 0.6:
+                text_top = top + rng.integers(15, 40)
+                width = rng.integers(10, 50)
+                content[
+                    text_top : text_top + rng.integers(10, 25), left : left + width
+                ] = 40
+    return content
+
+
+def get_frame(content: numpy.ndarray, scrolled: int) -> numpy.ndarray:
+    """The screen with the list scrolled up, its end not above the bottom."""
+    scrolled = min(scrolled, len(content) - (720 - LIST_TOP))
+    frame = numpy.full((720, 1280), 200, numpy.uint8)
+    frame[LIST_TOP:] = content[scrolled : scrolled + 720 - LIST_TOP]
+    return frame
+
+
+@pytest.mark.parametrize("moved", [300, 290, 318])
+def test_full_scroll(moved: int):
+    content = draw_list()
+    moved_by, confidence = measure_scroll(
+        get_frame(content, 0), get_frame(content, moved), expected=300
+    )
+    assert moved_by == moved
+    assert confidence > 0.99
+
+
+def test_partial_scroll_at_the_end_of_the_list():
+    content = draw_list()
+    # Only 120 of the 300 pixels are left to scroll.
+    before = get_frame(content, len(content) - (720 - LIST_TOP) - 120)
+    after = get_frame(content, len(content))
+
+    # Near the expected displacement, the repeating rows match roughly.
+    assert measure_scroll(before, after, expected=300)[1] < 0.99
+    moved_by, confidence = measure_scroll(before, after, expected=300, lowest=0)
+    assert moved_by == 120
+    assert confidence > 0.99
+
+
+def test_tracker_measures_the_last_scroll(monkeypatch: pytest.MonkeyPatch):
+    content = draw_list()
+    end = len(content) - (720 - LIST_TOP)
+    frames = iter([get_frame(content, end - 120), get_frame(content, end)])
+    monkeypatch.setattr(list_tracker, "get_grayscale_screen", lambda: next(frames))
+    monkeypatch.setattr(list_tracker, "scroll_low_level", lambda *_, **__: None)
+    monkeypatch.setattr(
+        list_tracker, "wait_for_screen_settled", lambda capture, **_: capture()
+    )
+    tracker = ListTracker(slop=10)
+
+    tracker.scroll(rows=4)
+
+    assert tracker.offset == 120 - 4 * constants.Offsets.ENTRY_DISTANCE
+    assert tracker.unmeasured == 0
+    assert tracker.slop == 10
@@ -0,0 +1,66 @@
+"""Reads frames in shared memory on worker processes."""
+import multiprocessing
+from pathlib import Path
+import subprocess
+import sys
+
+import numpy
+from numpy import ndarray
+import pytest
+
+from readers.ocr_service import OcrService
+
+
+def sum_image(image: ndarray, offset: int = 0) -> int:
+    return int(image.sum()) + offset
+
+
+@pytest.fixture
+def service():
+    ocr_service = OcrService(workers=2)
+    yield ocr_service
+    ocr_service.close()
+
+
+def test_reads_frames_in_shared_memory(service: OcrService):
+    images = [numpy.full((720, 1280), value, numpy.uint8) for value in range(5)]
+    futures = [service.read(image, sum_image, offset=1) for image in images]
+
+    assert [future.result() for future in futures] == [
+        value * 720 * 1280 + 1 for value in range(5)
+    ]
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="Windows spawns"
+)
+def test_workers_are_forked(service: OcrService):
+    assert service._executor._mp_context.get_start_method() == "fork"
+    # All workers were started before the first read.
+    assert len(service._executor._processes) == 2
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="Windows spawns"
+)
+def test_workers_do_not_track_the_frames():
+    # The resource tracker only reports leaked or lost frames when its process ends.
+    script = (
+        "import numpy\n"
+        "from readers.ocr_service import OcrService\n"
+        "from tests.test_ocr_service import sum_image\n"
+        "service = OcrService(workers=2)\n"
+        "for value in range(5):\n"
+        "    service.read(numpy.full((4, 4), value, numpy.uint8), sum_image).result()\n"
+        "service.close()\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "resource_tracker" not in result.stderr
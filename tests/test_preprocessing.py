@@ -0,0 +1,33 @@
+import numpy
+import pytest
+
+from readers.preprocessing import preprocess
+from readers.preprocessing import PreprocessingProfile
+from readers.preprocessing import Threshold
+
+
+def draw_text(text_value: int, background_value: int) -> numpy.ndarray:
+    """Draws three 6 pixel wide strokes, standing in for text, on a 60x40 crop."""
+    image = numpy.full((40, 60), background_value, numpy.uint8)
+    for left in (10, 25, 40):
+        image[8:32, left : left + 6] = text_value
+    return image
+
+
+@pytest.mark.parametrize("threshold", [Threshold.OTSU, Threshold.ADAPTIVE])
+@pytest.mark.parametrize("text_value,background_value", [(40, 220), (220, 40)])
+def test_text_comes_out_dark_and_filled(
+    threshold: Threshold, text_value: int, background_value: int
+):
+    profile = PreprocessingProfile(threshold=threshold, padding=0)
+    prepared = preprocess(draw_text(text_value, background_value), profile)
+    # The middle of every stroke, not only its outline.
+    assert (prepared[10:30, [12, 27, 42]] == 0).all()
+    assert (prepared[:4] == 255).all()
+
+
+def test_upscale_and_padding():
+    profile = PreprocessingProfile(upscale=2, padding=10)
+    prepared = preprocess(draw_text(220, 40), profile)
+    assert prepared.shape == (100, 140)
+    assert (prepared[:10] == 255).all()
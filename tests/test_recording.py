@@ -0,0 +1,96 @@
+"""Records a session of a fake device and replays it without one."""
+from pathlib import Path
+import struct
+import subprocess
+
+import pytest
+
+from emulator.adb_integration import AdbDevice
+from emulator.adb_integration import AdbTransport
+from emulator.adb_integration import CaptureMode
+from emulator.adb_integration import get_grayscale_screen
+from emulator.adb_integration import run_shell
+from emulator.adb_integration import use_device
+from emulator.recording import ReplayError
+from emulator.recording import SessionRecorder
+from emulator.recording import SessionReplay
+from tests.test_shell_session import write_fake_adb
+
+
+def write_screen(path: Path, value: int) -> None:
+    """Writes a raw 4x3 RGBA screencap of one gray value."""
+    pixels = bytes([value, value, value, 255]) * 12
+    path.write_bytes(struct.pack("<4I", 4, 3, 1, 0) + pixels)
+
+
+@pytest.fixture
+def recording(tmp_path: Path) -> Path:
+    screen = tmp_path / "screen.raw"
+    # exec-out screencap prints the screen, adb shell runs a local shell.
+    adb_path = write_fake_adb(
+        tmp_path, f'if [ "$3" = exec-out ]; then cat "{screen}"; else exec sh; fi'
+    )
+    directory = tmp_path / "recording"
+    device = AdbDevice(
+        adb_path=adb_path,
+        device_name="fake",
+        capture_mode=CaptureMode.RAW,
+        recorder=SessionRecorder(directory),
+    )
+    with use_device(device):
+        for value in (10, 20):
+            write_screen(screen, value)
+            get_grayscale_screen()
+        assert run_shell("echo first") == "first"
+        write_screen(screen, 30)
+        get_grayscale_screen()
+        with pytest.raises(subprocess.CalledProcessError):
+            run_shell("echo failed; (exit 3)")
+    device.session.close()
+    device.recorder.close()
+    return directory
+
+
+def replay(directory: Path) -> AdbDevice:
+    return AdbDevice(transport=AdbTransport.REPLAY, replay=SessionReplay(directory))
+
+
+def test_replay_returns_frames_and_commands_in_order(recording: Path):
+    with use_device(replay(recording)):
+        assert get_grayscale_screen()[0, 0] == 10
+        assert get_grayscale_screen()[0, 0] == 20
+        # No more frames were recorded before the command, the last one repeats.
+        assert get_grayscale_screen()[0, 0] == 20
+        assert run_shell("echo first") == "first"
+        frame = get_grayscale_screen()
+        assert frame.shape == (3, 4) and (frame == 30).all()
+        assert get_grayscale_screen()[0, 0] == 30
+
+        with pytest.raises(subprocess.CalledProcessError) as error:
+            run_shell("echo failed; (exit 3)")
+        assert error.value.returncode == 3
+        assert error.value.output == "failed"
+
+        with pytest.raises(ReplayError, match="ended"):
+            run_shell("echo after")
+
+
+def test_replay_skips_frames_that_were_not_asked_for(recording: Path):
+    with use_device(replay(recording)):
+        assert run_shell("echo first") == "first"
+        assert get_grayscale_screen()[0, 0] == 30
+
+
+def test_mismatched_command_raises(recording: Path):
+    with use_device(replay(recording)):
+        with pytest.raises(ReplayError, match="echo first"):
+            run_shell("echo second")
+
+
+def test_frame_before_any_was_recorded_raises(tmp_path: Path):
+    recorder = SessionRecorder(tmp_path)
+    recorder.record_command("echo first", "first", 0, 0)
+    recorder.close()
+
+    with pytest.raises(ReplayError, match="No frame"):
+        SessionReplay(tmp_path).capture()
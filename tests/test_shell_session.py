@@ -0,0 +1,83 @@
+"""Drives ShellSession against a local `sh` in place of `adb shell`."""
+import asyncio
+from pathlib import Path
+import subprocess
+
+import pytest
+
+from emulator.shell_session import AsyncShellSession
+from emulator.shell_session import CommandInterruptedError
+from emulator.shell_session import ShellSession
+
+
+def write_fake_adb(directory: Path, script: str = "exec sh") -> str:
+    """
+    Writes an executable which ignores the adb arguments and runs a shell instead.
+    """
+    path = directory / "adb"
+    path.write_text(f"#!/bin/sh\n{script}\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def session(tmp_path: Path):
+    shell = ShellSession(write_fake_adb(tmp_path), "fake", timeout=2)
+    yield shell
+    shell.close()
+
+
+def test_run_returns_output(session: ShellSession):
+    assert session.run("echo one; echo two") == "one\ntwo"
+    assert session.run("true") == ""
+
+
+def test_run_raises_on_exit_status(session: ShellSession):
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        session.run("echo failed; false")
+    assert error.value.output == "failed"
+    # The shell is still usable.
+    assert session.run("echo ok") == "ok"
+
+
+def test_hung_command_times_out(session: ShellSession):
+    session.timeout = 0.5
+    with pytest.raises(subprocess.TimeoutExpired):
+        session.run("sleep 10")
+    session.timeout = 2
+    assert session.run("echo ok") == "ok"
+
+
+def test_interrupted_command_is_not_repeated(session: ShellSession, tmp_path: Path):
+    log = tmp_path / "taps.log"
+    with pytest.raises(CommandInterruptedError):
+        session.run(f"echo tap >> {log}; kill -9 $$")
+    assert log.read_text() == "tap\n"
+    assert session.run("echo ok") == "ok"
+
+
+def test_lost_shell_before_command_is_retried(tmp_path: Path):
+    marker = tmp_path / "started"
+    # The first shell exits before reading any command.
+    adb_path = write_fake_adb(
+        tmp_path, f'[ -e "{marker}" ] || {{ touch "{marker}"; exit 0; }}\nexec sh'
+    )
+    shell = ShellSession(adb_path, "fake", timeout=2)
+    try:
+        assert shell.run("echo ok") == "ok"
+    finally:
+        shell.close()
+
+
+def test_async_session(tmp_path: Path):
+    async def run() -> None:
+        shell = AsyncShellSession(write_fake_adb(tmp_path), "fake", timeout=0.5)
+        try:
+            assert await shell.run("echo ok") == "ok"
+            with pytest.raises(subprocess.TimeoutExpired):
+                await shell.run("sleep 10")
+            assert await shell.run("echo again") == "again"
+        finally:
+            await shell.close()
+
+    asyncio.run(run())